@@ -14,6 +14,8 @@ from .ratings_manager import *
 from .config import ExogenousConfig, UserAnalyzerConfig, ItemAnalyzerConfig, FieldConfig
 from .content_analyzer_main import ContentAnalyzer
 from .exogenous_properties_retrieval import DBPediaMappingTechnique, PropertiesFromDataset, BabelPyEntityLinking
-from .raw_information_source import CSVFile, JSONFile, DATFile, SQLDatabase
+from .raw_information_source import CSVFile, JSONFile, DATFile, SQLDatabase, MaterializedSource
 
 
+from .content_store import ContentStore, ContentStoreWriter
+from .json_exporter import JsonLinesExporter, iter_json_lines
@@ -218,8 +218,8 @@ class ContentAnalyzerConfig(ABC):
             (e.g. `{'plot': FieldConfig(SkLearnTfIdf(), 'genres': FieldConfig(WhooshTfIdf()))}`)
         exogenous_representation_list: List of `ExogenousTechnique` objects that will be used to expand each contents
             with data from external sources
-        export_json: If set to True, contents complexly represented will be serialized in a human readable JSON, other
-            than in a proprietary format of the framework
+        export_json: If set to True, contents complexly represented will also be exported in a human readable JSON Lines
+            file (`contents.jsonl`, see `JsonLinesExporter`), other than in the format of the framework
     """
 
     def __init__(self, source: RawInformationSource,
@@ -1,22 +1,31 @@
 from __future__ import annotations
+import copy
 import gc
+import hashlib
+from collections import deque
 import json
-import pickle
-import re
-import lzma
+import math
 import os
 import shutil
+import tempfile
 
-from typing import List, Dict, TYPE_CHECKING
+from typing import List, Dict, Tuple, Optional, Hashable, Iterator, TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from clayrs.content_analyzer.config import ContentAnalyzerConfig
+    from clayrs.content_analyzer.config import ContentAnalyzerConfig, FieldConfig
     from clayrs.content_analyzer.memory_interfaces.memory_interfaces import InformationInterface
 
-from clayrs.content_analyzer.content_representation.content import Content, IndexField, ContentEncoder
+from clayrs.content_analyzer.content_representation.content import Content, IndexField
+from clayrs.content_analyzer.content_store import ContentStore, ContentStoreWriter
+from clayrs.content_analyzer.json_exporter import JsonLinesExporter
+from clayrs.content_analyzer.raw_information_source import RawInformationSource, MaterializedSource
+from clayrs.content_analyzer.embeddings.embedding_learner.embedding_learner import EmbeddingLearner
+from clayrs.content_analyzer.field_content_production_techniques.field_content_production_technique import \
+    SingleContentTechnique, OriginalData, CollectionBasedTechnique
+from clayrs.content_analyzer.field_content_production_techniques.tf_idf import WhooshTfIdf
 from clayrs.utils.const import logger
-from clayrs.utils.context_managers import get_progbar
-from clayrs.content_analyzer.utils.id_merger import id_merger
+from clayrs.utils.context_managers import get_iterator_parallel, get_progbar
+from clayrs.content_analyzer.utils.id_merger import id_values_merger
 
 
 class ContentAnalyzer:
@@ -30,17 +39,41 @@ class ContentAnalyzer:
             the possibility of customizing the way in which the input data is processed.
     """
 
+    FINGERPRINTS = 'fingerprints.json'
+
     def __init__(self, config: ContentAnalyzerConfig):
         self._config: ContentAnalyzerConfig = config
 
     def set_config(self, config: ContentAnalyzerConfig):
         self._config = config
 
-    def fit(self):
+    def fit(self, num_cpus: int = 1, codec: str = 'none', compression_level: int = None, chunk_size: int = None,
+            incremental: bool = False):
         """
         Processes the creation of the contents and serializes the contents. This method starts the content production
         process and initializes everything that will be used to create said contents, their fields and their
-        representations
+        representations. Contents are serialized in the output directory as a `ContentStore`
+
+        With `chunk_size`, contents are produced and serialized chunk by chunk (see `ContentsProducer.iter_contents()`),
+        so that the contents of a single chunk are kept in memory instead of all of them. In this case configs run one
+        after the other, `num_cpus` is only the number of threads serializing the contents
+
+        With `incremental=True` the output directory is not deleted: the contents created by the previous incremental
+        run are updated, producing only the representations of new or changed contents and configs (see
+        `ContentsProducer.update_contents()`). The fingerprints of the run are saved in the output directory
+        (`fingerprints.json`) for the next one. The first incremental run creates every content
+
+        Args:
+            num_cpus: number of processes used to run independent field configs and exogenous configs concurrently,
+                and number of threads serializing the contents. Default is 1, meaning that configs run one after the
+                other. 0 means that the number of cpus will be automatically detected
+            codec: codec with which serialized contents are compressed: 'none' (default), 'lz4', 'zstd' or 'lzma'.
+                See `ContentStore.write()`
+            compression_level: level of the codec, None to use its default level
+            chunk_size: number of contents produced and serialized at a time. Default is None, meaning that all the
+                contents are produced before being serialized
+            incremental: if True, contents of the previous incremental run are updated instead of being created from
+                scratch. It can't be used with chunk_size
         """
         # before starting the process, the content analyzer manin checks that there are no duplicate id cases
         # both in the field dictionary and in the exogenous representation list
@@ -49,41 +82,68 @@ class ContentAnalyzer:
         try:
             self.__check_field_dict()
             self.__check_exogenous_representation_list()
+            ContentStore.check_codec(codec)
+            if incremental and chunk_size is not None:
+                raise ValueError("Contents can't be updated incrementally in chunks, set either incremental or "
+                                 "chunk_size")
         except ValueError as e:
             raise e
 
-        # creates the directory where the data will be serialized and overwrites it if it already exists
         output_path = self._config.output_directory
-        if os.path.exists(output_path):
-            shutil.rmtree(output_path)
-        os.makedirs(output_path)
-
         contents_producer = ContentsProducer.get_instance()
         contents_producer.set_config(self._config)
-        created_contents = contents_producer.create_contents()
-
-        if self._config.export_json:
-            json_path = os.path.join(self._config.output_directory, 'contents.json')
-            with open(json_path, "w") as data:
-                json.dump(created_contents, data, cls=ContentEncoder, indent=4)
-
-        with get_progbar(created_contents) as pbar:
-            pbar.set_description("Serializing contents")
-
-            for content in pbar:
-                self.__serialize_content(content)
-
-    def __serialize_content(self, content: Content):
-        """
-        This method serializes a specific content in the output directory defined by the content analyzer config
-        Args:
-            content (Content): content instance that will be serialized
-        """
 
-        file_name = re.sub(r'[^\w\s]', '', content.content_id)
-        path = os.path.join(self._config.output_directory, file_name + '.xz')
-        with lzma.open(path, 'wb') as f:
-            pickle.dump(content, f, protocol=4)
+        fingerprints = None
+        if incremental:
+            fingerprints_path = os.path.join(output_path, self.FINGERPRINTS)
+            previous = ContentStore(output_path) if ContentStore.is_store(output_path) else None
+            previous_fingerprints = None
+            if previous is not None and os.path.isfile(fingerprints_path):
+                with open(fingerprints_path) as f:
+                    previous_fingerprints = json.load(f)
+
+            # every representation is loaded from the previous store before it's replaced
+            created_contents, fingerprints = contents_producer.update_contents(previous, previous_fingerprints,
+                                                                               num_cpus)
+            del previous
+
+            # the fingerprints go with the store they describe
+            os.makedirs(output_path, exist_ok=True)
+            if os.path.isfile(fingerprints_path):
+                os.remove(fingerprints_path)
+            ContentStore.delete(output_path)
+            chunks = [created_contents]
+        else:
+            # creates the directory where the data will be serialized and overwrites it if it already exists
+            if os.path.exists(output_path):
+                shutil.rmtree(output_path)
+            os.makedirs(output_path)
+
+            if chunk_size is None:
+                chunks = [contents_producer.create_contents(num_cpus)]
+            else:
+                chunks = contents_producer.iter_contents(chunk_size)
+
+        writer = ContentStoreWriter(output_path, codec, compression_level, num_workers=num_cpus)
+        exporter = JsonLinesExporter(os.path.join(output_path, 'contents.jsonl')) if self._config.export_json else None
+        try:
+            for created_contents in chunks:
+                if exporter is not None:
+                    exporter.write(created_contents)
+
+                writer.append(created_contents)
+                del created_contents
+        finally:
+            if exporter is not None:
+                exporter.close()
+
+        stats = writer.close()
+        if fingerprints is not None:
+            with open(os.path.join(output_path, self.FINGERPRINTS), 'w') as f:
+                json.dump(fingerprints, f)
+        logger.info(f"Serialized {stats['n_contents']} contents in {stats['seconds']:.2f}s "
+                    f"({stats['contents_per_s']:.0f} contents/s, {stats['mb_per_s']:.1f} MB/s): "
+                    f"{stats['raw_mb']:.1f} MB, {stats['disk_mb']:.1f} MB on disk with codec {stats['codec']}")
 
     def __check_field_dict(self):
         """
@@ -117,6 +177,51 @@ class ContentAnalyzer:
         return f'ContentAnalyzer(config={self._config})'
 
 
+def _fingerprint(*parts) -> str:
+    """
+    Fingerprint of a config: hash of the repr of its parts (technique, preprocessing, ...)
+    """
+    return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _row_fingerprint(row: dict) -> str:
+    """
+    Hash of the raw values of a content, whatever the order of its fields
+    """
+    return hashlib.blake2b(json.dumps(row, sort_keys=True, default=str, ensure_ascii=False).encode('utf-8'),
+                           digest_size=16).hexdigest()
+
+
+def _depends_on_collection(technique) -> bool:
+    """
+    True if the representation a technique produces for a content depends on the other contents of the source
+    """
+    if isinstance(technique, CollectionBasedTechnique):
+        return True
+
+    # an embedding model still to be trained is trained on the whole source
+    embedding_source = getattr(technique, 'embedding_source', None)
+    return isinstance(embedding_source, EmbeddingLearner) and embedding_source.model is None
+
+
+def _shared_resource(field_name: Optional[str], technique) -> Hashable:
+    """
+    Key of the expensive resource a technique needs: configs whose techniques have the same key run in the same
+    process, one after the other
+    """
+    # the same embedding model (loaded, or trained on the source by an EmbeddingLearner) is loaded by one process only
+    embedding_source = getattr(technique, 'embedding_source', None)
+    if embedding_source is not None and embedding_source.reference is not None:
+        return 'embedding_source', type(embedding_source).__name__, embedding_source.reference
+
+    # whoosh writes its index in a directory named after the field
+    if isinstance(technique, WhooshTfIdf):
+        return 'whoosh', field_name
+
+    # a technique object used in more than one config keeps its state between them
+    return 'technique', id(technique)
+
+
 class ContentsProducer:
     """
     Singleton class which encapsulates the creation process of the items,
@@ -152,9 +257,20 @@ class ContentsProducer:
     def set_config(self, config: ContentAnalyzerConfig):
         self.__config = config
 
-    def create_contents(self) -> List[Content]:
+    def create_contents(self, num_cpus: int = 1) -> List[Content]:
         """
         Creates the contents based on the information defined in the Content Analyzer's config
+
+        Field configs and exogenous configs are independent from each other, so with `num_cpus > 1` they run
+        concurrently in a pool of processes. Configs sharing an expensive resource (e.g. the same embedding model) run
+        one after the other in the same process. Results are added to the contents in the order of the config,
+        whatever the order in which they are completed. If all configs share the same resource, techniques processing
+        each content on its own (e.g. embedding techniques) split the contents among the processes instead
+
+        Args:
+            num_cpus: number of processes used to run the configs. 0 means that the number of cpus will be
+                automatically detected
+
         Returns:
             contents_list (List[Content]): list of contents created by the method
         """
@@ -164,17 +280,141 @@ class ContentsProducer:
         # will store the contents and is the variable that will be returned by the method
         contents_list = []
 
-        for raw_content in self.__config.source:
-            # construct id from the list of the fields that compound id
-            content_id = id_merger(raw_content, self.__config.id)
-            contents_list.append(Content(content_id))
+        source = self.__get_source()
+
+        # only the fields that compound the id are read, in column batches
+        for chunk in source.iter_chunks(columns=self.__config.id):
+            for id_values in zip(*(chunk[field_name] for field_name in self.__config.id)):
+                # construct id from the list of the fields that compound id
+                content_id = id_values_merger(list(id_values))
+                contents_list.append(Content(content_id))
+
+        field_configs = [(field_name, repr_number, field_config)
+                         for field_name in self.__config.get_field_name_list()
+                         for repr_number, field_config in enumerate(self.__config.get_configs_list(field_name))]
+        # results of the exogenous configs first, then of the field configs, in the order of the config
+        results = self.__run_configs([source] * (len(self.__config.exogenous_representation_list) + len(field_configs)),
+                                     field_configs, num_cpus)
+
+        return self.__assemble_contents(contents_list, field_configs, results)
+
+    def update_contents(self, previous: Optional[ContentStore], fingerprints: Optional[dict],
+                        num_cpus: int = 1) -> Tuple[List[Content], dict]:
+        """
+        Creates the contents like `create_contents()`, reusing the representations created by a previous run which are
+        still valid. The fingerprints of a run are a hash of the raw row of each content and a fingerprint of each
+        config (the repr of its technique, preprocessing, memory interface and id). For each config:
+
+            * if its fingerprint changed, or it's a new config, representations are produced for all the contents
+            * configs with a memory interface produce all the representations again, their index is written from
+                scratch. So do techniques needing the whole collection (e.g. tf-idf, an embedding model trained on the
+                source) if any content was added, changed or removed
+            * otherwise representations are produced only for new contents and contents whose raw row changed, the
+                ones of the other contents are loaded from the previous store
+
+        Contents whose id is not in the source anymore are dropped
+
+        Args:
+            previous: contents created by the previous run, None if there's none
+            fingerprints: fingerprints of the previous run as returned by this method, None if there are none (every
+                representation is produced)
+            num_cpus: number of processes used to run the configs (see `create_contents()`)
+
+        Returns:
+            contents_list (List[Content]): list of contents created by the method
+            fingerprints (dict): fingerprints of this run, to pass to the next update
+        """
+        if self.__config is None:
+            raise Exception("You must set a config with set_config()")
+
+        source = self.__get_source()
+
+        contents_list = []
+        row_hashes = []
+        for row in source:
+            contents_list.append(Content(id_values_merger([row[field_name] for field_name in self.__config.id])))
+            row_hashes.append(_row_fingerprint(row))
+
+        field_configs = [(field_name, repr_number, field_config)
+                         for field_name in self.__config.get_field_name_list()
+                         for repr_number, field_config in enumerate(self.__config.get_configs_list(field_name))]
+
+        config_fingerprints = {'exogenous': [_fingerprint(ex_config.id, ex_config.exogenous_technique)
+                                             for ex_config in self.__config.exogenous_representation_list],
+                               'fields': {}}
+        for field_name, _, field_config in field_configs:
+            config_fingerprints['fields'].setdefault(field_name, []).append(
+                _fingerprint(field_config.id, field_config.content_technique, field_config.preprocessing,
+                             field_config.memory_interface))
+
+        new_fingerprints = {'version': 1, 'id': list(self.__config.id), 'configs': config_fingerprints,
+                            'contents': {content.content_id: row_hash
+                                         for content, row_hash in zip(contents_list, row_hashes)}}
+
+        if previous is None or fingerprints is None or fingerprints['id'] != new_fingerprints['id']:
+            fingerprints = {'configs': {'exogenous': [], 'fields': {}}, 'contents': {}}
+        previous_contents = fingerprints['contents']
+
+        changed_rows = [row for row, (content, row_hash) in enumerate(zip(contents_list, row_hashes))
+                        if previous_contents.get(content.content_id) != row_hash]
+        n_new = sum(1 for content in contents_list if content.content_id not in previous_contents)
+        n_removed = len(previous_contents.keys() - new_fingerprints['contents'].keys())
+        collection_changed = len(changed_rows) != 0 or n_removed != 0
+
+        # (field name or None for exogenous configs, position, fingerprint, field config)
+        jobs = [(None, position, fingerprint, None)
+                for position, fingerprint in enumerate(config_fingerprints['exogenous'])]
+        jobs += [(field_name, repr_number, config_fingerprints['fields'][field_name][repr_number], field_config)
+                 for field_name, repr_number, field_config in field_configs]
+
+        # source each config reads: all the rows, only the changed ones, or None if nothing has to be produced
+        changed_source = source.take(changed_rows) if isinstance(source, MaterializedSource) else None
+        job_sources = []
+        for field_name, position, fingerprint, field_config in jobs:
+            previous_configs = fingerprints['configs']['exogenous'] if field_name is None \
+                else fingerprints['configs']['fields'].get(field_name, [])
+            reusable = position < len(previous_configs) and previous_configs[position] == fingerprint
+            whole_collection = field_config is not None and _depends_on_collection(field_config.content_technique)
+
+            if not reusable or (field_config is not None and field_config.memory_interface is not None) \
+                    or (whole_collection and collection_changed):
+                job_sources.append(source)
+            elif len(changed_rows) == 0 or whole_collection:
+                job_sources.append(None)
+            else:
+                job_sources.append(changed_source)
+
+        logger.info(f"Incremental update: {n_new} new, {len(changed_rows) - n_new} changed and {n_removed} removed "
+                    f"contents. Configs: {sum(job_source is source for job_source in job_sources)} run on all the "
+                    f"contents, {sum(job_source is changed_source for job_source in job_sources)} on the new and "
+                    f"changed ones, {sum(job_source is None for job_source in job_sources)} reused")
+
+        results = self.__run_configs(job_sources, field_configs, num_cpus)
+
+        changed_positions = {row: i for i, row in enumerate(changed_rows)}
+        for i, ((field_name, position, _, _), job_source) in enumerate(zip(jobs, job_sources)):
+            if job_source is not source:
+                partial_result = results[i]
+                results[i] = [partial_result[changed_positions[row]] if row in changed_positions
+                              else previous.load_representation(content.content_id, field_name, position)
+                              for row, content in enumerate(contents_list)]
+
+        return self.__assemble_contents(contents_list, field_configs, results), new_fingerprints
+
+    def __assemble_contents(self, contents_list: List[Content], field_configs: List[Tuple[str, int, FieldConfig]],
+                            results: list) -> List[Content]:
+        """
+        Adds the results of the configs (exogenous configs first, then field configs, in the order of the config) to
+        the contents, and writes the representations to index in the memory interfaces
+        """
+        results = deque(results)
 
         # two lists are instantiated, one for the configuration names (given by the user) and one for the exogenous
         # properties representations. These lists will maintain the data for the content creation. This is done
         # because otherwise it would be necessary to append directly to the content. But in the Content class
         # the representations are kept as dataframes and appending to dataframes is computationally heavy
         for ex_config in self.__config.exogenous_representation_list:
-            lod_properties = ex_config.exogenous_technique.get_properties(self.__config.source)
+            lod_properties = results.popleft()
 
             for i in range(len(contents_list)):
                 contents_list[i].append_exogenous_representation(lod_properties[i], ex_config.id)
@@ -186,48 +426,27 @@ class ContentsProducer:
         # since it's possible to store multiple Plot fields in the index
         index_representations_dict = {}
 
-        for field_name in self.__config.get_field_name_list():
-            logger.info(f"   Processing field: {field_name}   ".center(50, '*'))
-
-            for repr_number, field_config in enumerate(self.__config.get_configs_list(field_name)):
-
-                # technique_result is a list of field representation produced by the content technique
-                # each field repr in the list will refer to a content
-                # technique_result[0] -> contents_list[0]
-                technique_result = field_config.content_technique.produce_content(
-                    field_name, field_config.preprocessing, self.__config.source)
-
-                if field_config.memory_interface is not None:
-                    memory_interface = field_config.memory_interface
-                    # if the index for the directory in the config hasn't been defined yet in the contents producer,
-                    # the index associated to the field config that is being processed is added to the
-                    # contents producer's memory interfaces list, and will be used for the future field configs with
-                    # an assigned memory interface that has the same directory.
-                    # This means that only the index defined in the first FieldConfig that has one will actually be used
-                    if memory_interface not in self.__memory_interfaces.values():
-                        self.__memory_interfaces[memory_interface.directory] = memory_interface
-                        index_representations_dict[memory_interface] = {}
-                    else:
-                        memory_interface = self.__memory_interfaces[memory_interface.directory]
-
-                    if field_config.id is not None:
-                        index_field_name = "{}#{}#{}".format(field_name, str(repr_number), field_config.id)
-                    else:
-                        index_field_name = "{}#{}".format(field_name, str(repr_number))
-
-                    index_representations_dict[memory_interface][index_field_name] = technique_result
-
-                    # in order to refer to the representation that will be stored in the index, an IndexField repr will
-                    # be added to each content (and it will contain all the necessary information to retrieve the data
-                    # from the index)
-                    technique_result = [IndexField(index_field_name, i, memory_interface)
-                                        for i in range(len(self.__config.source))]
-
-                for i in range(len(contents_list)):
-                    contents_list[i].append_field_representation(field_name, technique_result[i], field_config.id)
-
-                del technique_result
-                gc.collect()
+        for field_name, repr_number, field_config in field_configs:
+            # technique_result is a list of field representation produced by the content technique
+            # each field repr in the list will refer to a content
+            # technique_result[0] -> contents_list[0]
+            technique_result = results.popleft()
+
+            if field_config.memory_interface is not None:
+                memory_interface, index_field_name = self.__index_field(field_name, repr_number, field_config)
+                index_representations_dict.setdefault(memory_interface, {})[index_field_name] = technique_result
+
+                # in order to refer to the representation that will be stored in the index, an IndexField repr will
+                # be added to each content (and it will contain all the necessary information to retrieve the data
+                # from the index)
+                technique_result = [IndexField(index_field_name, i, memory_interface)
+                                    for i in range(len(contents_list))]
+
+            for i in range(len(contents_list)):
+                contents_list[i].append_field_representation(field_name, technique_result[i], field_config.id)
+
+            del technique_result
+            gc.collect()
 
         # after the contents creation process, the data to be indexed will be serialized inside of the memory interfaces
         # for each created content, a new entry in each index will be created
@@ -235,18 +454,224 @@ class ContentsProducer:
         if len(self.__memory_interfaces) != 0:
             for memory_interface in self.__memory_interfaces.values():
                 memory_interface.init_writing(True)
-                for i in range(0, len(contents_list)):
-                    memory_interface.new_content()
-                    memory_interface.new_field("content_id", contents_list[i].content_id)
-                    for field_name in index_representations_dict[memory_interface].keys():
-                        memory_interface.new_field(
-                            field_name, str(index_representations_dict[memory_interface][field_name][i].value))
-                    memory_interface.serialize_content()
+                self.__index_contents(memory_interface, contents_list, index_representations_dict[memory_interface])
                 memory_interface.stop_writing()
             self.__memory_interfaces.clear()
 
         return contents_list
 
+    def iter_contents(self, chunk_size: int = 10000) -> Iterator[List[Content]]:
+        """
+        Creates the contents like `create_contents()`, but chunk by chunk: the representations of chunk_size
+        consecutive rows of the source are produced, written in the memory interfaces and yielded as a list of contents,
+        and the next chunk is produced only when it's requested. The contents of a chunk can be released once they have
+        been consumed (e.g. serialized with a `ContentStoreWriter`), so that memory doesn't grow with the number of
+        contents
+
+        Techniques needing the whole collection (e.g. tf-idf, or an embedding model still to be trained) make a first
+        pass on the source before the first chunk (see `FieldContentProductionTechnique.init_streaming()`), while
+        exogenous techniques retrieve the properties of the contents of each chunk. Unless it's already a
+        MaterializedSource, the raw source is materialized in a temporary directory and memory-mapped. Configs run one
+        after the other in this process
+
+        Args:
+            chunk_size: number of contents of each chunk
+
+        Yields:
+            contents of each chunk, in the order of the source
+        """
+        if self.__config is None:
+            raise Exception("You must set a config with set_config()")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        field_configs = [(field_name, repr_number, field_config)
+                         for field_name in self.__config.get_field_name_list()
+                         for repr_number, field_config in enumerate(self.__config.get_configs_list(field_name))]
+
+        # a technique object used in more than one config keeps its state between them: here the state of every config
+        # is kept until the last chunk, so each config gets its own copy
+        techniques = []
+        for _, _, field_config in field_configs:
+            technique = field_config.content_technique
+            techniques.append(copy.copy(technique) if any(technique is other for other in techniques) else technique)
+
+        source_directory = tempfile.mkdtemp(prefix='clayrs_source_')
+        streaming = []
+        writing = []
+        try:
+            index_fields = [self.__index_field(field_name, repr_number, field_config)
+                            if field_config.memory_interface is not None else None
+                            for field_name, repr_number, field_config in field_configs]
+
+            source = self.__get_source(source_directory)
+
+            for (field_name, _, field_config), technique in zip(field_configs, techniques):
+                logger.info(f"   Preparing field: {field_name}   ".center(50, '*'))
+                technique.init_streaming(field_name, field_config.preprocessing, source)
+                streaming.append(technique)
+
+            for memory_interface in self.__memory_interfaces.values():
+                memory_interface.init_writing(True)
+                writing.append(memory_interface)
+
+            start = 0
+            with get_progbar(source.iter_chunks(columns=self.__config.id, chunk_size=chunk_size),
+                             total=math.ceil(len(source) / chunk_size)) as pbar:
+                pbar.set_description("Producing contents in chunks")
+
+                for id_chunk in pbar:
+                    contents_list = [Content(id_values_merger(list(id_values)))
+                                     for id_values in zip(*(id_chunk[field_name] for field_name in self.__config.id))]
+                    # a source that is not materialized is only read for the ids, when there are no configs
+                    chunk_source = source.slice(start, start + len(contents_list)) \
+                        if isinstance(source, MaterializedSource) else None
+
+                    for ex_config in self.__config.exogenous_representation_list:
+                        lod_properties = ex_config.exogenous_technique.get_properties(chunk_source)
+                        for content, properties in zip(contents_list, lod_properties):
+                            content.append_exogenous_representation(properties, ex_config.id)
+
+                    index_representations_dict = {}
+                    for (field_name, _, field_config), technique, index_field in zip(field_configs, techniques,
+                                                                                     index_fields):
+                        technique_result = technique.produce_chunk(field_name, field_config.preprocessing,
+                                                                   chunk_source, start)
+
+                        if index_field is not None:
+                            memory_interface, index_field_name = index_field
+                            index_representations_dict.setdefault(memory_interface, {})[index_field_name] = \
+                                technique_result
+                            # contents refer to their position in the whole index
+                            technique_result = [IndexField(index_field_name, start + i, memory_interface)
+                                                for i in range(len(contents_list))]
+
+                        for content, representation in zip(contents_list, technique_result):
+                            content.append_field_representation(field_name, representation, field_config.id)
+
+                    for memory_interface, index_representations in index_representations_dict.items():
+                        self.__index_contents(memory_interface, contents_list, index_representations)
+
+                    start += len(contents_list)
+                    yield contents_list
+
+        finally:
+            for memory_interface in writing:
+                memory_interface.stop_writing()
+            self.__memory_interfaces.clear()
+
+            for technique in streaming:
+                technique.stop_streaming()
+
+            shutil.rmtree(source_directory, ignore_errors=True)
+
+    def __index_field(self, field_name: str, repr_number: int,
+                      field_config: FieldConfig) -> Tuple[InformationInterface, str]:
+        """
+        Memory interface where the representations of a field config are indexed, and name of their field in the index
+        """
+        memory_interface = field_config.memory_interface
+        # if the index for the directory in the config hasn't been defined yet in the contents producer,
+        # the index associated to the field config that is being processed is added to the
+        # contents producer's memory interfaces list, and will be used for the future field configs with
+        # an assigned memory interface that has the same directory.
+        # This means that only the index defined in the first FieldConfig that has one will actually be used
+        if memory_interface not in self.__memory_interfaces.values():
+            self.__memory_interfaces[memory_interface.directory] = memory_interface
+        else:
+            memory_interface = self.__memory_interfaces[memory_interface.directory]
+
+        if field_config.id is not None:
+            index_field_name = "{}#{}#{}".format(field_name, str(repr_number), field_config.id)
+        else:
+            index_field_name = "{}#{}".format(field_name, str(repr_number))
+
+        return memory_interface, index_field_name
+
+    @staticmethod
+    def __index_contents(memory_interface: InformationInterface, contents_list: List[Content],
+                         index_representations: Dict[str, list]):
+        """
+        Adds an entry for each content to memory_interface, in the form
+        {"content_id": id, "Plot_0": "...", "Plot_1": "...", ...}
+        """
+        for i in range(0, len(contents_list)):
+            memory_interface.new_content()
+            memory_interface.new_field("content_id", contents_list[i].content_id)
+            for field_name, representations in index_representations.items():
+                memory_interface.new_field(field_name, str(representations[i].value))
+            memory_interface.serialize_content()
+
+    def __run_configs(self, job_sources: List[Optional[RawInformationSource]],
+                      field_configs: List[Tuple[str, int, FieldConfig]], num_cpus: int) -> list:
+        """
+        Runs the exogenous configs and the field configs, grouped by the resource they share, and returns their results
+        in the order of the config (exogenous configs first). Each config reads its own source in job_sources, configs
+        whose source is None are not run and their result is None
+        """
+        # (field name or None for exogenous configs, technique, preprocessing)
+        jobs = [(None, ex_config.exogenous_technique, None)
+                for ex_config in self.__config.exogenous_representation_list]
+        jobs += [(field_name, field_config.content_technique, field_config.preprocessing)
+                 for field_name, _, field_config in field_configs]
+
+        groups = {}
+        for position, (field_name, technique, _) in enumerate(jobs):
+            if job_sources[position] is not None:
+                groups.setdefault(_shared_resource(field_name, technique), []).append(position)
+
+        num_cpus = num_cpus or os.cpu_count() or 1
+        # no more processes than groups. If the groups run one after the other in this process, the techniques which
+        # can split their contents in shards use all the processes instead
+        groups_num_cpus = min(num_cpus, max(len(groups), 1))
+        shards_num_cpus = num_cpus if groups_num_cpus == 1 else 1
+
+        def run_group(positions: List[int]):
+            group_results = []
+            for position in positions:
+                field_name, technique, preprocessing = jobs[position]
+                source = job_sources[position]
+                if field_name is None:
+                    logger.info(f"   Retrieving exogenous properties with {technique}   ".center(50, '*'))
+                    group_results.append((position, technique.get_properties(source)))
+                else:
+                    logger.info(f"   Processing field: {field_name}   ".center(50, '*'))
+                    shards_kwargs = {'num_cpus': shards_num_cpus} \
+                        if shards_num_cpus != 1 and isinstance(technique, (SingleContentTechnique, OriginalData)) \
+                        else {}
+                    group_results.append((position, technique.produce_content(field_name, preprocessing, source,
+                                                                              **shards_kwargs)))
+
+            return group_results
+
+        results = [None] * len(jobs)
+        with get_iterator_parallel(groups_num_cpus, run_group, list(groups.values())) as group_results:
+            for group_result in group_results:
+                for position, result in group_result:
+                    results[position] = result
+
+        return results
+
+    def __get_source(self, directory: str = None) -> RawInformationSource:
+        """
+        Source of the config, materialized when some technique will read it besides the ids so that the raw data is
+        parsed only once (in directory if specified, see `MaterializedSource`). A source that is already a
+        MaterializedSource (e.g. memory-mapped) is used as is
+        """
+        source = self.__config.source
+        n_reads = len(self.__config.exogenous_representation_list) + \
+            sum(len(self.__config.get_configs_list(field_name)) for field_name in self.__config.get_field_name_list())
+
+        if n_reads > 0 and not isinstance(source, MaterializedSource):
+            source = MaterializedSource(source, directory)
+
+        if isinstance(source, MaterializedSource):
+            logger.info(f"Raw source {source.representative_name} parsed once: {len(source)} rows, "
+                        f"{source.bytes_read / 1e6:.1f} MB read in {source.parse_time:.2f}s "
+                        f"({source.nbytes / 1e6:.1f} MB stored)")
+
+        return source
+
     def __str__(self):
         return "ContentsProducer"
 
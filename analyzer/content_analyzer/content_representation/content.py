@@ -64,6 +64,13 @@ class FeaturesBagField(FieldRepresentation):
         """
         return self.__scores
 
+    @property
+    def pos_feature_tuples(self) -> List[Tuple[int, str]]:
+        """
+        Get the (column position, feature) couples of the features with a score
+        """
+        return self.__pos_feature_tuples
+
     def to_json(self):
         tuple_representation = np.array([(coordinates_tuple, self.value[coordinates_tuple])
                                          for coordinates_tuple in zip(*self.value.nonzero())], dtype=object)
@@ -157,6 +164,18 @@ class IndexField(FieldRepresentation):
     def value(self) -> str:
         return self.__index.get_field(self.__field_name, self.__index_id)
 
+    @property
+    def field_name(self) -> str:
+        return self.__field_name
+
+    @property
+    def index_id(self) -> int:
+        return self.__index_id
+
+    @property
+    def index(self) -> InformationInterface:
+        return self.__index
+
     def __str__(self):
         return str(self.value)
 
@@ -0,0 +1,724 @@
+from __future__ import annotations
+import bisect
+import concurrent.futures
+import importlib
+import io
+import itertools
+import json
+import lzma
+import os
+import pickle
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from scipy import sparse
+
+from clayrs.content_analyzer.content_representation.content import Content, EmbeddingField, EntitiesProp, \
+    FeaturesBagField, IndexField, PropertiesDict, SimpleField
+from clayrs.content_analyzer.content_representation.representation_container import RepresentationContainer
+from clayrs.utils.const import logger
+from clayrs.utils.context_managers import get_progbar
+
+
+def content_key(content_id: str) -> str:
+    """
+    Key with which a content can be loaded back from the output directory of the Content Analyzer: its id without
+    punctuation (it used to be the name of the file of the content)
+    """
+    return re.sub(r'[^\w\s]', '', content_id)
+
+
+def _class_path(obj: object) -> str:
+    return f'{type(obj).__module__}:{type(obj).__qualname__}'
+
+
+def _import_class(class_path: str) -> type:
+    module_name, qualname = class_path.split(':')
+    cls = importlib.import_module(module_name)
+    for name in qualname.split('.'):
+        cls = getattr(cls, name)
+    return cls
+
+
+class _Codec:
+    """
+    Codec of the files of a ContentStore. Files written without compression ('none') are memory-mapped when they are
+    read, compressed files are compressed as a whole and decompressed in memory the first time their column is read.
+    The codec also counts the bytes it writes, before and after compression
+    """
+
+    SUFFIXES = {'none': '', 'lz4': '.lz4', 'zstd': '.zst', 'lzma': '.xz'}
+    DEFAULT_LEVELS = {'none': None, 'lz4': 0, 'zstd': 3, 'lzma': 6}
+
+    def __init__(self, name: str = 'none', level: int = None):
+        if name not in self.SUFFIXES:
+            raise ValueError(f"Unknown codec {name!r}, use one of: {', '.join(self.SUFFIXES)}")
+
+        if name == 'lz4':
+            try:
+                import lz4.frame
+            except ImportError:
+                raise ImportError("lz4 must be installed to use the lz4 codec: pip install lz4") from None
+            self.__module = lz4.frame
+        elif name == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("zstandard must be installed to use the zstd codec: pip install zstandard") from None
+            self.__module = zstandard
+
+        self.name = name
+        self.level = level if level is not None else self.DEFAULT_LEVELS[name]
+        self.suffix = self.SUFFIXES[name]
+
+        self.raw_bytes = 0
+        self.disk_bytes = 0
+        self.__lock = threading.Lock()
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'level': self.level}
+
+    def compress(self, data: bytes) -> bytes:
+        # lz4, zstandard and lzma release the GIL while compressing, columns are compressed in parallel by threads
+        if self.name == 'lz4':
+            return self.__module.compress(data, compression_level=self.level)
+        elif self.name == 'zstd':
+            return self.__module.ZstdCompressor(level=self.level).compress(data)
+        elif self.name == 'lzma':
+            return lzma.compress(data, preset=self.level)
+        return bytes(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.name == 'lz4':
+            return self.__module.decompress(data)
+        elif self.name == 'zstd':
+            return self.__module.ZstdDecompressor().decompress(data)
+        elif self.name == 'lzma':
+            return lzma.decompress(data)
+        return data
+
+    def __count(self, raw_bytes: int, disk_bytes: int):
+        with self.__lock:
+            self.raw_bytes += raw_bytes
+            self.disk_bytes += disk_bytes
+
+    def __write(self, path: str, data: bytes):
+        compressed = self.compress(data)
+        with open(path + self.suffix, 'wb') as f:
+            f.write(compressed)
+        self.__count(len(data), len(compressed))
+
+    def __read(self, path: str) -> bytes:
+        with open(path + self.suffix, 'rb') as f:
+            return self.decompress(f.read())
+
+    def save_array(self, path: str, array: np.ndarray):
+        if self.name == 'none':
+            np.save(path, array)
+            self.__count(os.path.getsize(path), os.path.getsize(path))
+        else:
+            buffer = io.BytesIO()
+            np.save(buffer, array)
+            self.__write(path, buffer.getbuffer())
+
+    def load_array(self, path: str) -> np.ndarray:
+        if self.name == 'none':
+            try:
+                return np.load(path, mmap_mode='r')
+            except ValueError:
+                # an empty array can't be memory-mapped
+                return np.load(path)
+
+        return np.load(io.BytesIO(self.__read(path)))
+
+    def save_bytes(self, path: str, values: List[bytes]):
+        if self.name == 'none':
+            with open(path, 'wb') as f:
+                f.writelines(values)
+            self.__count(os.path.getsize(path), os.path.getsize(path))
+        else:
+            self.__write(path, b''.join(values))
+
+    def load_bytes(self, path: str) -> np.ndarray:
+        if self.name == 'none':
+            # a file of 0 bytes can't be memory-mapped
+            return np.memmap(path, dtype=np.uint8, mode='r') if os.path.getsize(path) > 0 \
+                else np.empty(0, dtype=np.uint8)
+
+        return np.frombuffer(self.__read(path), dtype=np.uint8)
+
+
+class _BytesColumn:
+    """
+    Values of a column stored as their encoded bytes one after the other in `<path>.data`, plus the offset where each
+    value starts in `<path>.offsets.npy`. Without compression both files are memory-mapped, so reading a value only
+    reads its bytes
+    """
+
+    def __init__(self, path: str, codec: _Codec):
+        self.offsets = codec.load_array(f'{path}.offsets.npy')
+        self.data = codec.load_bytes(f'{path}.data')
+
+    @staticmethod
+    def write(path: str, values: List[bytes], codec: _Codec):
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in values], out=offsets[1:])
+        codec.save_bytes(f'{path}.data', values)
+        codec.save_array(f'{path}.offsets.npy', offsets)
+
+    def __getitem__(self, row: int) -> bytes:
+        return self.data[self.offsets[row]:self.offsets[row + 1]].tobytes()
+
+
+def _json_encode(values: list) -> Optional[List[bytes]]:
+    """
+    JSON encoding of the values, or None if a value can't be decoded back equal to itself (e.g. numpy numbers, tuples
+    or dicts with keys which are not strings)
+    """
+    encoded = []
+    for value in values:
+        try:
+            text = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return None
+        if json.loads(text) != value:
+            return None
+        encoded.append(text.encode('utf-8'))
+
+    return encoded
+
+
+def _write_column(path: str, representations: list, codec: _Codec) -> dict:
+    """
+    Writes one representation of every content in the files of path (compressed with codec), and returns the description of the column that
+    the manifest of the store keeps. The layout depends on the kind of the representations:
+
+        * 'embedding': the arrays of EmbeddingFields stacked in `<path>.npy`. Arrays of different shapes are flattened
+            one after the other, with the offset where each one starts and its shape
+        * 'sparse': the rows of FeaturesBagFields as a CSR matrix (`<path>.indptr.npy`, `.indices.npy`, `.data.npy`),
+            plus their (position, feature) couples as a JSON column
+        * 'simple' and 'properties': the values of SimpleFields and the dicts of PropertiesDict/EntitiesProp as a JSON
+            column
+        * 'index': the position in the index of IndexFields, the index is the same for all of them
+        * 'pickle': every other representation (or values which are not JSON), pickled one by one
+    """
+    first = representations[0] if len(representations) != 0 else None
+    same_type = all(type(representation) is type(first) for representation in representations)
+
+    if same_type and isinstance(first, EmbeddingField):
+        arrays = [np.asarray(representation.value) for representation in representations]
+        dtype = np.result_type(*{array.dtype for array in arrays})
+        ndim = arrays[0].ndim
+        if np.issubdtype(dtype, np.number) and all(array.ndim == ndim for array in arrays):
+            shapes = np.array([array.shape for array in arrays], dtype=np.int64).reshape(len(arrays), ndim)
+            if (shapes == shapes[0]).all():
+                codec.save_array(f'{path}.npy', np.stack(arrays).astype(dtype, copy=False))
+                return {'kind': 'embedding', 'uniform': True}
+            else:
+                offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+                np.cumsum([array.size for array in arrays], out=offsets[1:])
+                codec.save_array(f'{path}.npy', np.concatenate([array.ravel() for array in arrays]).astype(dtype, copy=False))
+                codec.save_array(f'{path}.offsets.npy', offsets)
+                codec.save_array(f'{path}.shapes.npy', shapes)
+                return {'kind': 'embedding', 'uniform': False}
+
+    elif same_type and isinstance(first, FeaturesBagField):
+        n_columns = first.value.shape[1]
+        if all(representation.value.shape == (1, n_columns) for representation in representations):
+            features = _json_encode([[[int(position), feature] for position, feature in
+                                      representation.pos_feature_tuples] for representation in representations])
+            if features is not None:
+                matrix = sparse.vstack([representation.value for representation in representations], format='csr')
+                codec.save_array(f'{path}.indptr.npy', matrix.indptr.astype(np.int64, copy=False))
+                codec.save_array(f'{path}.indices.npy', matrix.indices)
+                codec.save_array(f'{path}.data.npy', matrix.data)
+                _BytesColumn.write(f'{path}.features', features, codec)
+                return {'kind': 'sparse', 'n_columns': int(n_columns)}
+
+    elif same_type and isinstance(first, SimpleField):
+        values = _json_encode([representation.value for representation in representations])
+        if values is not None:
+            _BytesColumn.write(path, values, codec)
+            return {'kind': 'simple'}
+
+    elif same_type and isinstance(first, (PropertiesDict, EntitiesProp)):
+        values = _json_encode([representation.value for representation in representations])
+        if values is not None:
+            _BytesColumn.write(path, values, codec)
+            return {'kind': 'properties', 'class': _class_path(first)}
+
+    elif same_type and isinstance(first, IndexField):
+        if all(representation.field_name == first.field_name and representation.index is first.index
+               for representation in representations):
+            codec.save_array(f'{path}.npy', np.array([representation.index_id for representation in representations],
+                                                     dtype=np.int64))
+            return {'kind': 'index', 'field_name': first.field_name, 'class': _class_path(first.index),
+                    'directory': first.index.directory}
+
+    _BytesColumn.write(path, [pickle.dumps(representation, protocol=4) for representation in representations], codec)
+    return {'kind': 'pickle'}
+
+
+class _ColumnReader:
+    """
+    Reads back the representations of a column written by `_write_column()`
+    """
+
+    def __init__(self, path: str, description: dict, codec: _Codec):
+        self.kind = description['kind']
+
+        if self.kind == 'embedding':
+            self.array = codec.load_array(f'{path}.npy')
+            self.uniform = description['uniform']
+            if not self.uniform:
+                self.offsets = codec.load_array(f'{path}.offsets.npy')
+                self.shapes = codec.load_array(f'{path}.shapes.npy')
+        elif self.kind == 'sparse':
+            self.n_columns = description['n_columns']
+            self.indptr = codec.load_array(f'{path}.indptr.npy')
+            self.indices = codec.load_array(f'{path}.indices.npy')
+            self.data = codec.load_array(f'{path}.data.npy')
+            self.features = _BytesColumn(f'{path}.features', codec)
+        elif self.kind == 'index':
+            self.ids = codec.load_array(f'{path}.npy')
+            self.field_name = description['field_name']
+            self.index = _import_class(description['class'])(description['directory'])
+        else:
+            self.values = _BytesColumn(path, codec)
+            if self.kind == 'properties':
+                self.representation_class = _import_class(description['class'])
+
+    def __getitem__(self, row: int):
+        if self.kind == 'embedding':
+            # only the row is read from the file, and copied: a technique modifying the array in place (or keeping it
+            # after the store is closed) doesn't depend on the mapping
+            if self.uniform:
+                return EmbeddingField(np.array(self.array[row]))
+            flat = np.array(self.array[self.offsets[row]:self.offsets[row + 1]])
+            return EmbeddingField(flat.reshape(self.shapes[row]))
+
+        elif self.kind == 'sparse':
+            start, stop = self.indptr[row], self.indptr[row + 1]
+            scores = sparse.csr_matrix((np.array(self.data[start:stop]), np.array(self.indices[start:stop]),
+                                        np.array([0, stop - start])), shape=(1, self.n_columns))
+            pos_feature_tuples = [(position, feature) for position, feature in json.loads(self.features[row])]
+            return FeaturesBagField(scores.tocsc(), pos_feature_tuples)
+
+        elif self.kind == 'simple':
+            return SimpleField(json.loads(self.values[row]))
+
+        elif self.kind == 'properties':
+            return self.representation_class(json.loads(self.values[row]))
+
+        elif self.kind == 'index':
+            return IndexField(self.field_name, int(self.ids[row]), self.index)
+
+        return pickle.loads(self.values[row])
+
+
+class ContentStore:
+    """
+    Contents serialized in a directory column by column, rather than one pickled file per content. Each representation
+    of each field (and each exogenous representation) is a column holding the value of every content:
+
+        * dense embeddings are a single memory-mapped float array
+        * sparse features (e.g. tf-idf) are the rows of a memory-mapped CSR matrix
+        * simple fields and exogenous properties are JSON values stored one after the other with their offsets
+
+    The directory also holds the ids of the contents, in the order of the rows, and a manifest (`store.json`)
+    describing fields and columns. Columns are split in blocks of consecutive rows when contents are written in
+    chunks (see `ContentStoreWriter`). Loading a content only reads its row in the columns of the representations
+    requested, nothing is unpickled (except representations of custom classes the store doesn't know how to lay out).
+
+    Files can be compressed with a codec (lz4, zstd or lzma, see `write()`), recorded in the manifest so that the store
+    is read back with the right decoder.
+
+    This is the format in which the `ContentAnalyzer` serializes the contents it creates. Contents can be loaded back
+    with `load()` by id or by key (the id without punctuation, see `content_key()`), and `LoadedContentsDict` and
+    `load_content_instance()` read a store directly
+
+    Examples:
+
+        >>> store = ContentStore('movies_codified')
+        >>> len(store)
+        10000
+        >>> store.load('tt0112281', only_field_representations={'Plot': ['tfidf']})
+
+    Args:
+        directory: Directory where the contents have been written by `ContentStore.write()`
+    """
+
+    MANIFEST = 'store.json'
+    IDS = 'ids.json'
+
+    def __init__(self, directory: str):
+        self.__directory = directory
+
+        with open(os.path.join(directory, self.MANIFEST)) as f:
+            manifest = json.load(f)
+        with open(os.path.join(directory, self.IDS)) as f:
+            ids = json.load(f)
+
+        self.__content_ids: List[str] = ids['content_id']
+        self.__keys: List[str] = ids['key']
+        self.__rows: Dict[str, int] = {content_id: row for row, content_id in enumerate(self.__content_ids)}
+        self.__rows.update((key, row) for row, key in enumerate(self.__keys))
+
+        codec = manifest.get('codec', {'name': 'none'})
+        self.__codec = _Codec(codec['name'], codec.get('level'))
+
+        # columns are opened (and decompressed) block by block, the first time one of their values is loaded. A store
+        # of the first version has a single block per column, described by the column itself
+        self.__fields: Dict[str, List[dict]] = manifest['fields']
+        self.__exogenous: List[dict] = manifest['exogenous']
+        self.__block_starts: List[int] = manifest.get('block_starts', [0])
+        for column in itertools.chain(self.__exogenous, *self.__fields.values()):
+            column.setdefault('blocks', [column])
+        self.__open_columns: Dict[str, _ColumnReader] = {}
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    @property
+    def codec(self) -> str:
+        """
+        Codec with which the files of the store are compressed ('none' if they aren't)
+        """
+        return self.__codec.name
+
+    @property
+    def content_ids(self) -> List[str]:
+        """
+        Ids of the stored contents, in the order of their rows
+        """
+        return self.__content_ids
+
+    @staticmethod
+    def is_store(directory: str) -> bool:
+        """
+        True if directory contains a content store, False if it doesn't (e.g. it contains contents serialized one per
+        file by a previous version)
+        """
+        return os.path.isfile(os.path.join(directory, ContentStore.MANIFEST))
+
+    @staticmethod
+    def delete(directory: str):
+        """
+        Deletes the store in directory (if there's one), leaving any other file of the directory where it is
+        """
+        manifest_path = os.path.join(directory, ContentStore.MANIFEST)
+        if not os.path.isfile(manifest_path):
+            return
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        # the manifest first: a directory without it is not a store
+        os.remove(manifest_path)
+
+        paths = [description['path']
+                 for column in itertools.chain(manifest['exogenous'], *manifest['fields'].values())
+                 for description in column.get('blocks', [column])]
+        for name in os.listdir(directory):
+            if name == ContentStore.IDS or any(name.startswith(f'{path}.') for path in paths):
+                os.remove(os.path.join(directory, name))
+
+    @staticmethod
+    def check_codec(codec: str):
+        """
+        Checks that contents can be written with codec
+
+        Raises:
+            ValueError: if codec is not one of the supported codecs
+            ImportError: if the package of the codec is not installed
+        """
+        _Codec(codec)
+
+    @staticmethod
+    def write(contents: List[Content], directory: str, codec: str = 'none', compression_level: int = None,
+              num_workers: int = 1) -> dict:
+        """
+        Writes contents in directory (created if it doesn't exist). All the contents must have the same fields, with
+        the same representations, and the same exogenous representations, as the contents created by the Content
+        Analyzer do
+
+        The files of the store can be compressed with one of the following codecs, which is recorded in the manifest:
+
+            * 'none': files are not compressed and they are memory-mapped when read (the fastest to write and to read)
+            * 'lz4': very fast compression and decompression, requires the `lz4` package
+            * 'zstd': good compression at a fast speed at the default level (3, levels go up to 22), requires the
+                `zstandard` package
+            * 'lzma': the smallest files and by far the slowest codec (default preset 6, presets go from 0 to 9)
+
+        A compressed column is decompressed in memory the first time one of its values is loaded
+
+        Args:
+            contents: Contents to store, they are written as a single block of rows (see `ContentStoreWriter` to
+                write them in several blocks)
+            directory: Directory where the store will be written
+            codec: Codec used to compress the files of the store, one of 'none', 'lz4', 'zstd' and 'lzma'
+            compression_level: Level (or preset) of the codec, None to use the default level of the codec
+            num_workers: Number of threads writing (and compressing) columns at the same time. 0 means one thread for
+                each cpu
+
+        Returns:
+            Statistics of the serialization: number of contents, seconds, contents per second, MB before and after
+                compression and MB (before compression) per second
+
+        Raises:
+            ValueError: if codec is not one of the supported codecs
+            ImportError: if the package of the codec is not installed
+        """
+        writer = ContentStoreWriter(directory, codec, compression_level, num_workers)
+        writer.append(contents)
+        return writer.close()
+
+    def row(self, content_id: str) -> int:
+        """
+        Row of the content with content_id (either its id or its key)
+
+        Raises:
+            KeyError: if there's no such content in the store
+        """
+        return self.__rows[content_id]
+
+    def load(self, content_id: str, only_field_representations: dict = None) -> Optional[Content]:
+        """
+        Loads a content from the store
+
+        Args:
+            content_id: Either the id of the content or its key (its id without punctuation)
+            only_field_representations: Specify exactly which representation to load for the content
+                (e.g. {'Plot': [0], 'Genres': ['tfidf']}). Exogenous representations are not loaded in this case
+
+        Returns:
+            The content, or None if there's no content with content_id in the store
+        """
+        row = self.__rows.get(content_id)
+        if row is None:
+            return None
+
+        content = Content(self.__content_ids[row])
+        block, row = self.__locate(row)
+
+        if only_field_representations is None:
+            for field_name, columns in self.__fields.items():
+                content.append_field(field_name, RepresentationContainer([self.__column(column, block)[row]
+                                                                          for column in columns],
+                                                                         [column['id'] for column in columns]))
+            for column in self.__exogenous:
+                content.append_exogenous_representation(self.__column(column, block)[row], column['id'])
+        else:
+            for field_name, repr_id_list in only_field_representations.items():
+                columns = self.__fields[field_name]
+                repr_list = [self.__column(self.__find_column(columns, repr_id), block)[row]
+                             for repr_id in repr_id_list]
+                ext_id_list = [repr_id if isinstance(repr_id, str) else None for repr_id in repr_id_list]
+                content.append_field(field_name, RepresentationContainer(repr_list, ext_id_list))
+
+        return content
+
+    def load_representation(self, content_id: str, field_name: Optional[str], repr_id: Union[int, str]):
+        """
+        Loads a single representation of a content
+
+        Args:
+            content_id: Either the id of the content or its key (its id without punctuation)
+            field_name: Field of the representation, None for an exogenous representation
+            repr_id: Internal id (position) or external id of the representation
+
+        Raises:
+            KeyError: if there's no such content, field or representation in the store
+        """
+        block, row = self.__locate(self.__rows[content_id])
+        columns = self.__fields[field_name] if field_name is not None else self.__exogenous
+        return self.__column(self.__find_column(columns, repr_id), block)[row]
+
+    def __locate(self, row: int) -> Tuple[int, int]:
+        # block of the row, and row in the block
+        block = bisect.bisect_right(self.__block_starts, row) - 1
+        return block, row - self.__block_starts[block]
+
+    def __column(self, column: dict, block: int) -> _ColumnReader:
+        description = column['blocks'][block]
+        reader = self.__open_columns.get(description['path'])
+        if reader is None:
+            reader = _ColumnReader(os.path.join(self.__directory, description['path']), description, self.__codec)
+            self.__open_columns[description['path']] = reader
+
+        return reader
+
+    @staticmethod
+    def __find_column(columns: List[dict], repr_id: Union[int, str]) -> dict:
+        if isinstance(repr_id, str):
+            for column in columns:
+                if column['id'] == repr_id:
+                    return column
+            raise KeyError(repr_id)
+
+        return columns[repr_id]
+
+    def __contains__(self, content_id: str) -> bool:
+        return content_id in self.__rows
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Iterates over the keys of the stored contents
+        """
+        yield from self.__keys
+
+    def __len__(self) -> int:
+        return len(self.__content_ids)
+
+    def __str__(self):
+        return f"ContentStore({self.__directory}, {len(self)} contents)"
+
+    def __repr__(self):
+        return str(self)
+
+
+class ContentStoreWriter:
+    """
+    Writes a ContentStore chunk by chunk: each call to `append()` writes the contents it receives as a new block of
+    rows of every column, so that they can be released as soon as they are stored. The ids and the manifest are written
+    by `close()`, which completes the store. The Content Analyzer uses it to serialize contents while they are
+    produced, without holding all of them in memory
+
+    All the contents appended must have the same fields, with the same representations, and the same exogenous
+    representations. Check `ContentStore.write()` for the meaning of the parameters
+
+    Examples:
+
+        >>> writer = ContentStoreWriter('movies_codified', codec='zstd')
+        >>> for chunk in chunks:
+        >>>     writer.append(chunk)
+        >>> writer.close()
+    """
+
+    def __init__(self, directory: str, codec: str = 'none', compression_level: int = None, num_workers: int = 1):
+        self.__directory = directory
+        self.__codec = _Codec(codec, compression_level)
+        self.__num_workers = num_workers or os.cpu_count() or 1
+
+        # defined by the first content appended
+        self.__columns: Optional[List[tuple]] = None
+        self.__field_positions: Dict[str, int] = {}
+        self.__manifest = {'version': 2, 'n_contents': 0, 'codec': self.__codec.to_dict(), 'block_starts': [],
+                           'fields': {}, 'exogenous': []}
+        self.__content_ids: List[str] = []
+        self.__seconds = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def n_contents(self) -> int:
+        """
+        Number of contents appended so far
+        """
+        return len(self.__content_ids)
+
+    def append(self, contents: List[Content]):
+        """
+        Writes contents as a new block of rows, after the rows of the contents already appended
+
+        Raises:
+            ValueError: if contents don't have the same fields and representations of the contents appended before
+        """
+        if len(contents) == 0:
+            return
+
+        start = time.perf_counter()
+        if self.__columns is None:
+            self.__define_columns(contents[0])
+
+        block = len(self.__manifest['block_starts'])
+
+        def write_column(field_name: Optional[str], internal_id: int) -> dict:
+            try:
+                if field_name is not None:
+                    representations = [content.get_field_representation(field_name, internal_id)
+                                       for content in contents]
+                    path = f'field{self.__field_positions[field_name]}_{internal_id}_b{block}'
+                else:
+                    representations = [content.get_exogenous_representation(internal_id) for content in contents]
+                    path = f'exogenous_{internal_id}_b{block}'
+            except KeyError:
+                raise ValueError("All contents must have the same fields and representations to be stored "
+                                 "in a ContentStore") from None
+
+            description = _write_column(os.path.join(self.__directory, path), representations, self.__codec)
+            description.update(path=path, n_rows=len(representations))
+            if description['kind'] == 'pickle' and block == 0:
+                logger.warning(f"Representations of type {type(representations[0]).__name__} have no columnar "
+                               f"layout, they are pickled one by one")
+
+            return description
+
+        with concurrent.futures.ThreadPoolExecutor(self.__num_workers) as pool:
+            futures = [pool.submit(write_column, field_name, internal_id)
+                       for field_name, internal_id, _ in self.__columns]
+
+            with get_progbar(concurrent.futures.as_completed(futures), total=len(futures)) as pbar:
+                pbar.set_description("Serializing contents")
+                for future in pbar:
+                    # raises the exception of a column as soon as it fails
+                    future.result()
+
+        for column, future in zip(self.__manifest_columns(), futures):
+            column['blocks'].append(future.result())
+
+        self.__manifest['block_starts'].append(len(self.__content_ids))
+        self.__content_ids.extend(content.content_id for content in contents)
+        self.__seconds += time.perf_counter() - start
+
+    def close(self) -> dict:
+        """
+        Writes the ids of the contents and the manifest, completing the store
+
+        Returns:
+            Statistics of the serialization (see `ContentStore.write()`), seconds are the ones spent writing
+        """
+        start = time.perf_counter()
+        if self.__columns is None:
+            self.__define_columns(Content(''))
+
+        self.__manifest['n_contents'] = len(self.__content_ids)
+
+        with open(os.path.join(self.__directory, ContentStore.IDS), 'w') as f:
+            json.dump({'content_id': self.__content_ids,
+                       'key': [content_key(content_id) for content_id in self.__content_ids]}, f)
+
+        # the manifest is written last: a directory without it is not a complete store
+        with open(os.path.join(self.__directory, ContentStore.MANIFEST), 'w') as f:
+            json.dump(self.__manifest, f, indent=4)
+
+        self.__seconds += time.perf_counter() - start
+        codec, seconds, n_contents = self.__codec, self.__seconds, len(self.__content_ids)
+        return {'codec': codec.name, 'level': codec.level, 'n_contents': n_contents, 'seconds': seconds,
+                'contents_per_s': n_contents / seconds, 'raw_mb': codec.raw_bytes / 1e6,
+                'disk_mb': codec.disk_bytes / 1e6, 'mb_per_s': codec.raw_bytes / 1e6 / seconds}
+
+    def __define_columns(self, first: Content):
+        self.__columns = [(field_name, internal_id, external_id)
+                          for field_name, container in first.field_dict.items()
+                          for internal_id, external_id in zip(container.get_internal_index(),
+                                                              container.get_external_index())]
+        self.__columns += [(None, internal_id, external_id)
+                           for internal_id, external_id in zip(first.exogenous_rep_container.get_internal_index(),
+                                                               first.exogenous_rep_container.get_external_index())]
+        self.__field_positions = {field_name: i for i, field_name in enumerate(first.field_dict)}
+
+        self.__manifest['fields'] = {field_name: [] for field_name in first.field_dict}
+        for field_name, _, external_id in self.__columns:
+            column = {'id': external_id, 'blocks': []}
+            if field_name is not None:
+                self.__manifest['fields'][field_name].append(column)
+            else:
+                self.__manifest['exogenous'].append(column)
+
+    def __manifest_columns(self) -> List[dict]:
+        # columns of the manifest in the same order of self.__columns
+        return list(itertools.chain(*self.__manifest['fields'].values())) + self.__manifest['exogenous']
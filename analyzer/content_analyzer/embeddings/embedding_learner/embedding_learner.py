@@ -132,7 +132,11 @@ class EmbeddingLearner(EmbeddingSource):
         """
         corpus = []
         # iter the source
-        with get_progbar(list(source)) as pbar:
+        # only the fields in field_list are read from the source
+        docs = (dict(zip(field_list, values))
+                for chunk in source.iter_chunks(columns=field_list)
+                for values in zip(*(chunk[field_name] for field_name in field_list)))
+        with get_progbar(docs, total=len(source)) as pbar:
 
             for doc in pbar:
                 pbar.set_description(f"Preprocessing {', '.join(field_list)} for all contents")
@@ -266,7 +266,7 @@ class DBPediaMappingTechnique(ExogenousPropertiesRetrieval):
         prefixes += "PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#> "
         prefixes += "PREFIX foaf: <http://xmlns.com/foaf/0.1/> "
 
-        all_contents_labels_original = [str(raw_content[self._label_field]) for raw_content in raw_source]
+        all_contents_labels_original = [str(label) for label in raw_source.iter_column(self._label_field)]
 
         select_clause = 'SELECT DISTINCT ?uri ?title '
         where_clause = 'WHERE { ' \
@@ -632,9 +632,9 @@ class BabelPyEntityLinking(EntityLinking):
     def get_properties(self, raw_source: RawInformationSource) -> List[EntitiesProp]:
         properties_list = []
         logger.info("Performing Entity Linking with BabelFy")
-        with get_progbar(list(raw_source)) as pbar:
-            for raw_content in pbar:
-                data_to_disambiguate = check_not_tokenized(raw_content[self.__field_to_link])
+        with get_progbar(raw_source.iter_column(self.__field_to_link), total=len(raw_source)) as pbar:
+            for field_data in pbar:
+                data_to_disambiguate = check_not_tokenized(field_data)
 
                 self.__babel_client.babelfy(data_to_disambiguate)
 
@@ -84,37 +84,71 @@ class EmbeddingTechnique(SingleContentTechnique):
         return self.__embedding_source
 
     def produce_content(self, field_name: str, preprocessor_list: List[InformationProcessor],
-                        source: RawInformationSource) -> List[FieldRepresentation]:
+                        source: RawInformationSource, num_cpus: int = 1) -> List[FieldRepresentation]:
         representation_list: List[FieldRepresentation] = []
 
-        if isinstance(self.__embedding_source, EmbeddingLoader) and self.__embedding_source.model is None:
-            raise FileNotFoundError("The reference %s was not valid for the %s source" %
-                                    (self.__embedding_source.reference, self.__embedding_source))
+        self.__prepare_model(field_name, preprocessor_list, source)
 
-        # if the embedding source is an EmbeddingLearner (meaning it can be trained) and the source has no model
-        # the source is trained
-        if isinstance(self.__embedding_source, EmbeddingLearner) and self.__embedding_source.model is None:
-            logger.warning("The model %s wasn't found, so it will be created and trained now" %
-                           self.__embedding_source.reference)
-            logger.warning("The model will be trained on the %s field "
-                           "and the data will be processed with %s" % (field_name, preprocessor_list))
-            self.__embedding_source.fit(source, [field_name], preprocessor_list)
+        if num_cpus != 1:
+            def produce_single(field_data):
+                return self.produce_single_repr(self.process_data(field_data, preprocessor_list))
+
+            # a model that can be loaded again is loaded once by each process, instead of being sent to them
+            if isinstance(self.__embedding_source, EmbeddingLoader):
+                self.__embedding_source.unload_model()
+
+            representation_list = self._produce_in_shards(
+                produce_single, source.iter_column(field_name), len(source), num_cpus,
+                description=f"Processing and producing contents with {self.__embedding_source}")
+
+            self.embedding_source.unload_model()
+            return representation_list
 
         # it iterates over all contents contained in the source in order to retrieve the raw data
         # the data contained in the field_name is processed using each information processor in the processor_list
         # the data is passed to the method that will create the single representation
-        with get_progbar(list(source)) as pbar:
+        with get_progbar(source.iter_column(field_name), total=len(source)) as pbar:
 
-            for content_data in pbar:
+            for field_data in pbar:
 
                 pbar.set_description(f"Processing and producing contents with {self.__embedding_source}")
 
-                processed_data = self.process_data(content_data[field_name], preprocessor_list)
+                processed_data = self.process_data(field_data, preprocessor_list)
                 representation_list.append(self.produce_single_repr(processed_data))
 
         self.embedding_source.unload_model()
         return representation_list
 
+    def init_streaming(self, field_name: str, preprocessor_list: List[InformationProcessor],
+                       source: RawInformationSource):
+        """
+        A model still to be trained is trained on the whole source, it's kept loaded until `stop_streaming()`
+        """
+        self.__prepare_model(field_name, preprocessor_list, source)
+
+    def produce_chunk(self, field_name: str, preprocessor_list: List[InformationProcessor],
+                      chunk_source: RawInformationSource, start: int) -> List[FieldRepresentation]:
+        return [self.produce_single_repr(self.process_data(field_data, preprocessor_list))
+                for field_data in chunk_source.iter_column(field_name)]
+
+    def stop_streaming(self):
+        self.embedding_source.unload_model()
+
+    def __prepare_model(self, field_name: str, preprocessor_list: List[InformationProcessor],
+                        source: RawInformationSource):
+        if isinstance(self.__embedding_source, EmbeddingLoader) and self.__embedding_source.model is None:
+            raise FileNotFoundError("The reference %s was not valid for the %s source" %
+                                    (self.__embedding_source.reference, self.__embedding_source))
+
+        # if the embedding source is an EmbeddingLearner (meaning it can be trained) and the source has no model
+        # the source is trained
+        if isinstance(self.__embedding_source, EmbeddingLearner) and self.__embedding_source.model is None:
+            logger.warning("The model %s wasn't found, so it will be created and trained now" %
+                           self.__embedding_source.reference)
+            logger.warning("The model will be trained on the %s field "
+                           "and the data will be processed with %s" % (field_name, preprocessor_list))
+            self.__embedding_source.fit(source, [field_name], preprocessor_list)
+
     @abstractmethod
     def produce_single_repr(self, field_data: Union[List[str], str]) -> EmbeddingField:
         """
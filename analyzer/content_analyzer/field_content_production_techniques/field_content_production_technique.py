@@ -1,6 +1,9 @@
 from __future__ import annotations
+import itertools
+import math
+import os
 from abc import ABC, abstractmethod
-from typing import List, Union, Callable, Optional, TYPE_CHECKING
+from typing import List, Union, Callable, Optional, Iterable, TYPE_CHECKING
 
 from scipy.sparse import csr_matrix
 
@@ -11,6 +14,12 @@ from clayrs.content_analyzer.content_representation.content import FeaturesBagFi
 from clayrs.content_analyzer.information_processor.information_processor import InformationProcessor
 from clayrs.content_analyzer.raw_information_source import RawInformationSource
 from clayrs.content_analyzer.utils.check_tokenization import check_not_tokenized
+from clayrs.utils.context_managers import get_iterator_parallel
+
+# shards per process: more shards than processes keep every process busy even if some shards are slower than others
+_SHARDS_PER_CPU = 4
+# starting a process takes seconds (it imports the framework and its dependencies), small sources use fewer processes
+_MIN_CONTENTS_PER_CPU = 500
 
 
 class FieldContentProductionTechnique(ABC):
@@ -42,6 +51,48 @@ class FieldContentProductionTechnique(ABC):
 
         return processed_data
 
+    @staticmethod
+    def _produce_in_shards(produce_single: Callable, field_data: Iterable, n_contents: int, num_cpus: int,
+                           description: str = "Producing contents") -> list:
+        """
+        Calls `produce_single` on the data of every content in a pool of `num_cpus` processes (0 means one for each
+        cpu) and returns the results in the order of `field_data`.
+
+        The contents are split in shards of consecutive rows, a few for each process. `produce_single`, with
+        everything it references (the technique, the preprocessors, the models they load), is sent once to each
+        process, which keeps it for all the shards it processes. Each process gets at least 500 contents, since
+        starting it takes a few seconds: smaller sources are processed by fewer processes, or by this one
+
+        Args:
+            produce_single: function producing the representation of a content from the raw data of its field
+            field_data: raw data of the field for each content
+            n_contents: number of contents in field_data
+            num_cpus: number of processes
+            description: description of the progress bar
+
+        Returns:
+            List with the result of `produce_single` for each content
+        """
+        num_cpus = num_cpus or os.cpu_count() or 1
+        num_cpus = max(1, min(num_cpus, n_contents // _MIN_CONTENTS_PER_CPU))
+        shard_size = max(1, math.ceil(n_contents / (num_cpus * _SHARDS_PER_CPU)))
+
+        field_data = iter(field_data)
+        shards = iter(lambda: list(itertools.islice(field_data, shard_size)), [])
+
+        def produce_shard(shard: list) -> list:
+            return [produce_single(data) for data in shard]
+
+        representation_list = []
+        with get_iterator_parallel(num_cpus, produce_shard, shards,
+                                   progress_bar=True, total=math.ceil(n_contents / shard_size)) as pbar:
+            pbar.set_description(description)
+
+            for shard_representations in pbar:
+                representation_list.extend(shard_representations)
+
+        return representation_list
+
     @abstractmethod
     def produce_content(self, field_name: str, preprocessor_list: List[InformationProcessor],
                         source: RawInformationSource) -> List[FieldRepresentation]:
@@ -86,6 +137,47 @@ class FieldContentProductionTechnique(ABC):
         """
         raise NotImplementedError
 
+    def init_streaming(self, field_name: str, preprocessor_list: List[InformationProcessor],
+                       source: RawInformationSource):
+        """
+        Called before the representations of the contents in source are produced chunk by chunk with
+        `produce_chunk()`: a technique needing the whole collection (e.g. to compute document frequencies or to train a
+        model) makes a first pass on source here. The default implementation does nothing
+
+        Args:
+            field_name (str): name of the contents' field on which the technique will be applied
+            preprocessor_list (List[InformationProcessor]): list of information processors that will pre-process the
+                data contained in the field for each content
+            source (RawInformationSource): source where the raw data of all the contents is stored
+        """
+        pass
+
+    def produce_chunk(self, field_name: str, preprocessor_list: List[InformationProcessor],
+                      chunk_source: RawInformationSource, start: int) -> List[FieldRepresentation]:
+        """
+        Produces the representations of a chunk of consecutive contents, after `init_streaming()` has been called on
+        the source of all the contents. The default implementation calls `produce_content()` on the chunk
+
+        Args:
+            field_name (str): name of the contents' field on which the technique will be applied
+            preprocessor_list (List[InformationProcessor]): list of information processors that will pre-process the
+                data contained in the field for each content
+            chunk_source (RawInformationSource): source with the raw data of the contents of the chunk
+            start (int): position of the first content of the chunk in the source passed to `init_streaming()`
+
+        Returns:
+            representation_list(List[FieldRepresentation]): list containing the representations generated by the
+                technique for each content of the chunk
+        """
+        return self.produce_content(field_name, preprocessor_list, chunk_source)
+
+    def stop_streaming(self):
+        """
+        Called once the representations of all the chunks have been produced, it releases what `init_streaming()`
+        prepared. The default implementation does nothing
+        """
+        pass
+
     @abstractmethod
     def __repr__(self):
         raise NotImplementedError
@@ -99,21 +191,28 @@ class SingleContentTechnique(FieldContentProductionTechnique):
     """
 
     def produce_content(self, field_name: str, preprocessor_list: List[InformationProcessor],
-                        source: RawInformationSource) -> List[FieldRepresentation]:
+                        source: RawInformationSource, num_cpus: int = 1) -> List[FieldRepresentation]:
         """
         This method creates a list of FieldRepresentation objects, where each object is associated to a content
         and a specific field from the ones in said content. In order to do so, a simple preprocessing operation
         is done on the original data of the field (for each content) followed by the creation of the complex
         representation using the processed data. The complex representations are stored in a list and returned.
-        """
-        representation_list: List[FieldRepresentation] = []
 
-        # it iterates over all contents contained in the source in order to retrieve the raw data
+        If `num_cpus` is not 1, the contents are processed in shards of consecutive rows by a pool of processes
+        (see `_produce_in_shards()`)
+        """
         # the data contained in the field_name is processed using each information processor in the processor_list
         # the data is passed to the method that will create the single representation
-        for content_data in source:
-            processed_data = self.process_data(content_data[field_name], preprocessor_list)
-            representation_list.append(self.produce_single_repr(processed_data))
+        def produce_single(field_data):
+            processed_data = self.process_data(field_data, preprocessor_list)
+            return self.produce_single_repr(processed_data)
+
+        if num_cpus != 1:
+            return self._produce_in_shards(produce_single, source.iter_column(field_name), len(source), num_cpus)
+
+        # it iterates over all contents contained in the source in order to retrieve the raw data
+        representation_list: List[FieldRepresentation] = [produce_single(field_data)
+                                                          for field_data in source.iter_column(field_name)]
 
         return representation_list
 
@@ -165,6 +264,21 @@ class CollectionBasedTechnique(FieldContentProductionTechnique):
 
         return representation_list
 
+    def init_streaming(self, field_name: str, preprocessor_list: List[InformationProcessor],
+                       source: RawInformationSource):
+        """
+        The whole collection is refactored, so that the representations of each chunk are retrieved from it by the
+        position of their contents
+        """
+        self.dataset_refactor(source, field_name, preprocessor_list)
+
+    def produce_chunk(self, field_name: str, preprocessor_list: List[InformationProcessor],
+                      chunk_source: RawInformationSource, start: int) -> List[FieldRepresentation]:
+        return [self.produce_single_repr(i) for i in range(start, start + len(chunk_source))]
+
+    def stop_streaming(self):
+        self.delete_refactored()
+
     @abstractmethod
     def produce_single_repr(self, content_position: int) -> FieldRepresentation:
         """
@@ -226,19 +340,25 @@ class OriginalData(FieldContentProductionTechnique):
         self.__dtype = dtype
 
     def produce_content(self, field_name: str, preprocessor_list: List[InformationProcessor],
-                        source: RawInformationSource) -> List[SimpleField]:
+                        source: RawInformationSource, num_cpus: int = 1) -> List[SimpleField]:
         """
         The contents' raw data in the given field_name is extracted and stored in a SimpleField object.
         The SimpleField objects created are stored in a list which is then returned.
         No further operations are done on the data in order to keep it in the original form.
         Because of that the preprocessor_list is ignored and not used by this technique
+
+        If `num_cpus` is not 1, the contents are processed in shards of consecutive rows by a pool of processes
+        (see `_produce_in_shards()`)
         """
+        def produce_single(field_data):
+            processed_data = self.process_data(field_data, preprocessor_list)
+            return SimpleField(self.__dtype(check_not_tokenized(processed_data)))
 
-        representation_list: List[SimpleField] = []
+        if num_cpus != 1:
+            return self._produce_in_shards(produce_single, source.iter_column(field_name), len(source), num_cpus)
 
-        for content_data in source:
-            processed_data = self.process_data(content_data[field_name], preprocessor_list)
-            representation_list.append(SimpleField(self.__dtype(check_not_tokenized(processed_data))))
+        representation_list: List[SimpleField] = [produce_single(field_data)
+                                                  for field_data in source.iter_column(field_name)]
 
         return representation_list
 
@@ -60,10 +60,10 @@ class PyWSDSynsetDocumentFrequency(SynsetDocumentFrequency):
                          preprocessor_list: List[InformationProcessor]):
 
         all_synsets = []
-        with get_progbar(information_source) as pbar:
+        with get_progbar(information_source.iter_column(field_name), total=len(information_source)) as pbar:
             pbar.set_description("Computing synset frequency with wordnet")
-            for raw_content in pbar:
-                processed_field_data = self.process_data(raw_content[field_name], preprocessor_list)
+            for field_data in pbar:
+                processed_field_data = self.process_data(field_data, preprocessor_list)
 
                 processed_field_data = check_not_tokenized(processed_field_data)
 
@@ -96,8 +96,8 @@ class SkLearnTfIdf(TfIdfTechnique):
 
         corpus = []
         logger.info(f"Computing tf-idf with {str(self)}")
-        for raw_content in information_source:
-            processed_field_data = self.process_data(raw_content[field_name], preprocessor_list)
+        for field_data in information_source.iter_column(field_name):
+            processed_field_data = self.process_data(field_data, preprocessor_list)
 
             processed_field_data = check_not_tokenized(processed_field_data)
             corpus.append(processed_field_data)
@@ -141,9 +141,9 @@ class WhooshTfIdf(TfIdfTechnique):
         index = KeywordIndex(f'./tf_idf_{field_name}')
         index.init_writing(True)
         dataset_len = 0
-        for raw_content in information_source:
+        for field_data in information_source.iter_column(field_name):
             index.new_content()
-            processed_field_data = self.process_data(raw_content[field_name], preprocessor_list)
+            processed_field_data = self.process_data(field_data, preprocessor_list)
 
             processed_field_data = check_tokenized(processed_field_data)
             index.new_field(field_name, processed_field_data)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+import base64
+import json
+from typing import Iterable, Iterator
+
+import numpy as np
+from scipy import sparse
+
+from clayrs.content_analyzer.content_representation.content import Content, FeaturesBagField, FieldRepresentation
+
+
+def _encode_array(array: np.ndarray) -> dict:
+    return {'__ndarray__': base64.b64encode(np.ascontiguousarray(array).data).decode('ascii'),
+            'dtype': array.dtype.str, 'shape': list(array.shape)}
+
+
+def _encode_value(obj: object) -> object:
+    """
+    `default` hook of the encoder, called only for the values json can't encode by itself. Arrays are encoded as
+    their raw buffer in base64 (4/3 of their size in bytes) rather than as lists of numbers
+    """
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            return obj.tolist()
+        return _encode_array(obj)
+
+    if sparse.issparse(obj):
+        # the layout with the shorter index pointer: a row of tf-idf scores is a CSC matrix with a pointer for each
+        # column of the vocabulary, but a single one as a CSR matrix
+        matrix = obj.tocsr() if obj.shape[0] <= obj.shape[1] else obj.tocsc()
+        return {'__sparse__': obj.format, 'layout': matrix.format, 'shape': list(matrix.shape),
+                'data': _encode_array(matrix.data), 'indices': _encode_array(matrix.indices),
+                'indptr': _encode_array(matrix.indptr)}
+
+    if isinstance(obj, np.generic):
+        return obj.item()
+
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+
+    # e.g. a custom value of a SimpleField
+    return str(obj)
+
+
+def _decode_value(obj: dict) -> object:
+    """
+    `object_hook` of the decoder, inverse of `_encode_value()` for arrays and sparse matrices
+    """
+    if '__ndarray__' in obj:
+        return np.frombuffer(base64.b64decode(obj['__ndarray__']), dtype=np.dtype(obj['dtype'])) \
+            .reshape(obj['shape']).copy()
+
+    if '__sparse__' in obj:
+        matrix_class = sparse.csc_matrix if obj['layout'] == 'csc' else sparse.csr_matrix
+        matrix = matrix_class((obj['data'], obj['indices'], obj['indptr']), shape=tuple(obj['shape']))
+        return matrix.asformat(obj['__sparse__'])
+
+    return obj
+
+
+def _representation_json(representation: FieldRepresentation) -> object:
+    if isinstance(representation, FeaturesBagField):
+        return {'scores': representation.value, 'pos_feature_tuples': representation.pos_feature_tuples}
+
+    return representation.value
+
+
+def content_to_json(content: Content) -> dict:
+    """
+    Dict with the id of content and its representations, which `JsonLinesExporter` encodes. Keys are the same of the
+    JSON export of previous versions: 'content_id', then 'Exo#<internal id>' for each exogenous representation and
+    '<field name>#<internal id>' for each representation of each field. Values are the values of the representations,
+    arrays and sparse matrices included (tf-idf features are a dict with the 'scores' and the 'pos_feature_tuples')
+    """
+    content_json = {'content_id': content.content_id}
+    for row in content.exogenous_rep_container:
+        content_json[f"Exo#{row['internal_id']}"] = _representation_json(row['representation'])
+
+    for field_name, field_container in content.field_dict.items():
+        for row in field_container:
+            content_json[f"{field_name}#{row['internal_id']}"] = _representation_json(row['representation'])
+
+    return content_json
+
+
+class JsonLinesExporter:
+    """
+    Exports contents to a JSON Lines file, one content per line, while they are produced: contents can come from a
+    generator and nothing but the line being written is kept in memory. This is the format in which the Content
+    Analyzer exports the contents it creates when `export_json` is set in its config (`contents.jsonl`)
+
+    NumPy arrays (e.g. embeddings) are encoded as their raw buffer in base64, with their dtype and shape, and sparse
+    matrices (e.g. tf-idf scores) as the arrays of their CSR (or CSC) layout, so that the export takes about as much
+    space as the binary data and no array is converted to a list of Python numbers. `iter_json_lines()` reads an
+    export back, decoding arrays and sparse matrices
+
+    Examples:
+
+        >>> with JsonLinesExporter('contents.jsonl') as exporter:
+        >>>     for chunk in contents_producer.iter_contents(chunk_size=1000):
+        >>>         exporter.write(chunk)
+        >>> next(iter_json_lines('contents.jsonl'))
+        {'content_id': 'tt0112281', 'Plot#0': array([0.12, ...], dtype=float32)}
+
+    Args:
+        file_path: Path of the file to write (overwritten if it exists)
+        indent: If specified, each content is written as a JSON document indented by `indent` spaces (`indent=0`
+            only puts newlines) instead of on a single line. `iter_json_lines()` reads both layouts
+    """
+
+    def __init__(self, file_path: str, indent: int = None):
+        self.__file_path = file_path
+        self.__indent = indent
+        self.__n_contents = 0
+        self.__file = open(file_path, 'w', encoding='utf-8')
+
+    @property
+    def file_path(self) -> str:
+        return self.__file_path
+
+    @property
+    def n_contents(self) -> int:
+        """
+        Number of contents written so far
+        """
+        return self.__n_contents
+
+    def write(self, contents: Iterable[Content]) -> int:
+        """
+        Writes contents after the ones already written
+
+        Args:
+            contents: Contents to write, any iterable (e.g. a generator)
+
+        Returns:
+            Number of contents written by this call
+        """
+        n_written = 0
+        for content in contents:
+            self.__file.write(json.dumps(content_to_json(content), default=_encode_value, ensure_ascii=False,
+                                         indent=self.__indent))
+            self.__file.write('\n')
+            n_written += 1
+
+        self.__n_contents += n_written
+        return n_written
+
+    def close(self):
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        return "JsonLinesExporter"
+
+    def __repr__(self):
+        return f'JsonLinesExporter(file_path={self.__file_path}, indent={self.__indent})'
+
+
+def iter_json_lines(file_path: str) -> Iterator[dict]:
+    """
+    Reads the contents exported by a `JsonLinesExporter` one at a time, as the dicts of `content_to_json()` with
+    arrays and sparse matrices decoded
+
+    Args:
+        file_path: Path of the exported file
+
+    Returns:
+        Iterator over the exported contents
+    """
+    decoder = json.JSONDecoder(object_hook=_decode_value)
+    with open(file_path, encoding='utf-8') as f:
+        buffer = ''
+        for line in f:
+            buffer += line
+            # a document can only end on a line ending with a brace. With indent=0 nested objects close at the start
+            # of a line too, so the layout can't tell where a document ends: the buffer is decoded to know it
+            if not line.rstrip().endswith('}'):
+                continue
+
+            try:
+                document, end = decoder.raw_decode(buffer, len(buffer) - len(buffer.lstrip()))
+            except json.JSONDecodeError:
+                # the document isn't complete yet
+                continue
+
+            yield document
+            buffer = buffer[end:]
+
+        if buffer.strip():
+            # the file ends in the middle of a document: decoding it reports where
+            decoder.decode(buffer)
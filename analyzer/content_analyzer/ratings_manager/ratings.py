@@ -168,6 +168,10 @@ class Ratings:
         timestamp_column: Name or positional index of the field of the raw source representing *timesamp* column
         score_processor: `ScoreProcessor` object which will process the `score_column` accordingly. Useful if you want
             to perform sentiment analysis on a textual column or you want to normalize all scores in $[0, 1]$ range
+
+    A positional index is resolved once, against the `column_names` of the source, and the same column is then read
+    from every row. For sources without a fixed schema (e.g. a JSON file) the column names are the keys of the first
+    row, so rows whose keys are in a different order are not re-indexed row by row
     """
 
     def __init__(self, source: RawInformationSource,
@@ -237,25 +241,42 @@ class Ratings:
                         score_processor: ScoreProcessor):
         ratings_dict = defaultdict(list)
 
-        with get_progbar(source) as pbar:
+        # columns are resolved once, then the source is read in column batches: only the needed columns are parsed
+        # and no dict is built for each row
+        column_names = source.column_names
+        if len(column_names) == 0:
+            return {}
+
+        user_column = self._get_column_name(user_column, column_names)
+        item_column = self._get_column_name(item_column, column_names)
+        score_column = self._get_column_name(score_column, column_names)
+        columns_to_read = [user_column, item_column, score_column]
+        if timestamp_column is not None:
+            timestamp_column = self._get_column_name(timestamp_column, column_names)
+            columns_to_read.append(timestamp_column)
+
+        with get_progbar(None, total=len(source)) as pbar:
 
             pbar.set_description(desc="Importing ratings")
-            for row in pbar:
+            for chunk in source.iter_chunks(columns=list(dict.fromkeys(columns_to_read))):
 
-                user_id = self._get_field_data(user_column, row)
-                item_id = self._get_field_data(item_column, row)
-                score = self._get_field_data(score_column, row)
-                timestamp = None
+                user_ids = [str(user_id) for user_id in chunk[user_column]]
+                item_ids = [str(item_id) for item_id in chunk[item_column]]
 
                 if score_processor is not None:
-                    score = score_processor.fit(score)
+                    scores = [score_processor.fit(str(score)) for score in chunk[score_column]]
                 else:
-                    score = float(score)
+                    scores = [float(str(score)) for score in chunk[score_column]]
 
                 if timestamp_column is not None:
-                    timestamp = self._get_field_data(timestamp_column, row)
+                    timestamps = [str(timestamp) for timestamp in chunk[timestamp_column]]
+                else:
+                    timestamps = itertools.repeat(None)
 
-                ratings_dict[user_id].append(Interaction(user_id, item_id, score, timestamp))
+                for user_id, item_id, score, timestamp in zip(user_ids, item_ids, scores, timestamps):
+                    ratings_dict[user_id].append(Interaction(user_id, item_id, score, timestamp))
+
+                pbar.update(len(user_ids))
 
         # re-hashing
         return dict(ratings_dict)
@@ -451,21 +472,16 @@ class Ratings:
         frame.to_csv(os.path.join(output_directory, file_name), index=False, header=True)
 
     @staticmethod
-    def _get_field_data(field_name: Union[str, int], row: Dict):
+    def _get_column_name(field_name: Union[str, int], column_names: List[str]) -> str:
+        if isinstance(field_name, str):
+            if field_name not in column_names:
+                raise KeyError("Column {} not found in the raw source".format(field_name))
+            return field_name
+
         try:
-            if isinstance(field_name, str):
-                data = row[field_name]
-            else:
-                row_keys = list(row.keys())
-                key = row_keys[field_name]
-                data = row[key]
-
-        except KeyError:
-            raise KeyError("Column {} not found in the raw source".format(field_name))
+            return column_names[field_name]
         except IndexError:
-            raise IndexError("Column index {} not present in the raw source".format(field_name))
-
-        return str(data)
+            raise IndexError("Column index {} not present in the raw source".format(field_name)) from None
 
     @classmethod
     def from_dataframe(cls, interaction_frame: pd.DataFrame,
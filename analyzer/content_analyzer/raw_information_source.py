@@ -1,11 +1,20 @@
+import codecs
+import contextlib
 import csv
+import itertools
 import os
+import queue
+import sys
+import threading
+import time
 from abc import ABC, abstractmethod
 
 import json
-from typing import Dict, Iterator
+from typing import Dict, Iterator, List, Callable, Optional, Sequence
 
 import mysql.connector
+import numpy as np
+import pandas as pd
 
 
 class RawInformationSource(ABC):
@@ -19,6 +28,7 @@ class RawInformationSource(ABC):
 
     def __init__(self, encoding: str):
         self.__encoding = encoding
+        self.__length_cache = None
 
     @property
     def encoding(self):
@@ -29,6 +39,95 @@ class RawInformationSource(ABC):
     def representative_name(self):
         raise NotImplementedError
 
+    @property
+    def column_names(self) -> List[str]:
+        """
+        Names of the columns of the source in positional order, i.e. the keys of the dicts returned when iterating
+        over the source. By default they are the keys of the first row
+
+        Returns:
+            List of column names, empty if the source has no rows
+        """
+        first_row = next(iter(self), {})
+        return list(first_row.keys())
+
+    def iter_chunks(self, columns: List[str] = None, chunk_size: int = 100000,
+                    dtype: Dict[str, object] = None, as_arrow: bool = False) -> Iterator:
+        """
+        Iter on the source in column batches rather than row by row: each chunk is a dict mapping every column name to
+        a NumPy array with the values of up to `chunk_size` consecutive rows (or a `pyarrow.Table` if `as_arrow=True`).
+
+        This default implementation builds the batches from the rows returned by `__iter__`, sources which can read
+        columns directly (e.g. `CSVFile`, `DATFile`) override it so that no dict is created for each row and only the
+        requested columns are parsed
+
+        Examples:
+
+            >>> file = CSVFile(csv_path)
+            >>> next(file.iter_chunks(columns=['movie_id', 'release_year'], dtype={'release_year': int}))
+            {'movie_id': array(['1', '2'], dtype=object), 'release_year': array([1995, 1995])}
+
+        Args:
+            columns: Names of the columns to read. If None, all columns are read
+            chunk_size: Maximum number of rows in each chunk
+            dtype: Optional mapping column name -> NumPy type the values of the column must be converted to. Columns
+                not specified are arrays of objects with the values "as is"
+            as_arrow: If True, each chunk is returned as a `pyarrow.Table` (pyarrow must be installed)
+
+        Returns:
+            Iterator over the chunks of the source
+        """
+        rows = iter(self)
+        while True:
+            chunk_rows = list(itertools.islice(rows, chunk_size))
+            if len(chunk_rows) == 0:
+                break
+
+            chunk_columns = columns if columns is not None else list(chunk_rows[0].keys())
+            batch = {column: _object_array([row[column] for row in chunk_rows]) for column in chunk_columns}
+
+            yield self._format_chunk(batch, dtype, as_arrow)
+
+    def iter_column(self, column: str) -> Iterator:
+        """
+        Iter on the values of a single column, in row order. Only that column is parsed if the source can read columns
+        directly (see `iter_chunks()`)
+
+        Args:
+            column: Name of the column to read
+
+        Returns:
+            Iterator over the values of the column
+        """
+        for chunk in self.iter_chunks(columns=[column]):
+            yield from chunk[column]
+
+    @staticmethod
+    def _format_chunk(batch: Dict[str, np.ndarray], dtype: Dict[str, object], as_arrow: bool):
+        if dtype is not None:
+            for column, column_type in dtype.items():
+                if column in batch:
+                    batch[column] = batch[column].astype(column_type)
+
+        if as_arrow:
+            try:
+                import pyarrow as pa
+            except ImportError:
+                raise ImportError("pyarrow must be installed to read chunks as Arrow tables: "
+                                  "pip install pyarrow") from None
+            return pa.table({column: pa.array(values) for column, values in batch.items()})
+
+        return batch
+
+    def _cached_length(self, file_path: str, count_rows: Callable[[], int]) -> int:
+        # the number of rows is computed once and computed again only if the file changes on disk
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_mtime_ns, stat.st_size)
+        if self.__length_cache is None or self.__length_cache[0] != key:
+            self.__length_cache = (key, count_rows())
+
+        return self.__length_cache[1]
+
     @abstractmethod
     def __iter__(self) -> Iterator[Dict[str, str]]:
         """
@@ -49,6 +148,28 @@ class RawInformationSource(ABC):
         raise NotImplementedError
 
 
+def _object_array(values: list) -> np.ndarray:
+    # assigned one by one, otherwise NumPy would turn values which are lists (e.g. in JSON sources) into a new dimension
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+
+    return array
+
+
+def _count_lines(file_path: str) -> int:
+    # counts newlines on raw bytes, which is much faster than decoding and splitting the file line by line
+    n_lines = 0
+    last_byte = b'\n'
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            n_lines += block.count(b'\n')
+            last_byte = block[-1:]
+
+    # last line without a trailing newline
+    return n_lines + (last_byte != b'\n')
+
+
 class DATFile(RawInformationSource):
     """
     Wrapper for a DAT file. This class is able to read from a DAT file where each entry is separated by the `::` string.
@@ -94,6 +215,10 @@ class DATFile(RawInformationSource):
 
         return file_name
 
+    @property
+    def file_path(self) -> str:
+        return self.__file_path
+
     def __iter__(self) -> Iterator[Dict[str, str]]:
         with open(self.__file_path, encoding=self.encoding) as f:
             for line in f:
@@ -105,11 +230,45 @@ class DATFile(RawInformationSource):
 
                 yield line_dict
 
-    def __len__(self):
-        with open(self.__file_path, newline='', encoding=self.encoding) as dat_file:
-            total_length = sum(1 for _ in dat_file)
+    @property
+    def column_names(self) -> List[str]:
+        with open(self.__file_path, encoding=self.encoding) as f:
+            first_line = f.readline()
 
-            return total_length
+        return [str(i) for i in range(len(first_line.split('::')))] if first_line else []
+
+    def iter_chunks(self, columns: List[str] = None, chunk_size: int = 100000,
+                    dtype: Dict[str, object] = None, as_arrow: bool = False) -> Iterator:
+        """
+        Iter on the DAT file in column batches. Lines are split and transposed into columns chunk by chunk, so no dict
+        is built for each row. Rows with less entries than others have empty strings for the missing ones.
+
+        Check `RawInformationSource.iter_chunks()` for the meaning of the parameters
+        """
+        with open(self.__file_path, encoding=self.encoding) as f:
+            while True:
+                lines = list(itertools.islice(f, chunk_size))
+                if len(lines) == 0:
+                    break
+
+                entries_by_column = list(itertools.zip_longest(*(line.split('::') for line in lines), fillvalue=''))
+                chunk_columns = columns if columns is not None else [str(i) for i in range(len(entries_by_column))]
+
+                batch = {}
+                for column in chunk_columns:
+                    try:
+                        entries = entries_by_column[int(column)]
+                    except (ValueError, IndexError):
+                        raise KeyError(column) from None
+
+                    values = np.empty(len(lines), dtype=object)
+                    values[:] = [entry.strip("\n\t\r") for entry in entries]
+                    batch[column] = values
+
+                yield self._format_chunk(batch, dtype, as_arrow)
+
+    def __len__(self):
+        return self._cached_length(self.__file_path, lambda: _count_lines(self.__file_path))
 
     def __str__(self):
         return "DATFile"
@@ -121,10 +280,14 @@ class DATFile(RawInformationSource):
 class JSONFile(RawInformationSource):
     """
     Wrapper for a JSON file. This class is able to read from a JSON file where each "row" is a dictionary-like object
-    inside a list
+    inside a list, or from a JSON Lines file where each line is a dictionary-like object
 
     You can iterate over the whole content of the raw source with a simple for loop: each row will be returned as a
-    dictionary
+    dictionary. Rows are parsed one at a time while the file is read, so the whole file is never loaded in memory.
+
+    The first time the length of the source or a row by position is requested (`len(file)`, `file[i]`), the byte
+    offset of each row is indexed in memory (and rebuilt if the JSON file changes): from then on both operations take
+    constant time. With `index_path`, the index is also stored in that file and reused by the following instances
 
     Examples:
         Consider the following JSON file
@@ -138,14 +301,36 @@ class JSONFile(RawInformationSource):
         [{'Title': 'Jumanji', 'Year': '1995'},
          {'Title': 'Toy Story', 'Year': '1995'}]
 
+        The same rows in JSON Lines format
+        ```
+        {"Title":"Jumanji","Year":"1995"}
+        {"Title":"Toy Story","Year":"1995"}
+        ```
+
+        >>> file = JSONFile(jsonl_path, json_lines=True)
+        >>> print(file[1])
+        {'Title': 'Toy Story', 'Year': '1995'}
+
     Args:
         file_path: path of the dat file
         encoding: define the type of encoding of data stored in the source (example: "utf-8")
+        json_lines: If True the file is read as JSON Lines, if False as a JSON list. Default is None, meaning that
+            files with `.jsonl` or `.ndjson` extension are read as JSON Lines
+        index_path: Optional path of the file where the byte offsets of the rows are stored (e.g.
+            `<file_path>.idx.npz`). Default is None, meaning that the offsets are only kept in memory
     """
 
-    def __init__(self, file_path: str, encoding: str = "utf-8"):
+    def __init__(self, file_path: str, encoding: str = "utf-8", json_lines: bool = None, index_path: str = None):
         super().__init__(encoding)
         self.__file_path = file_path
+        self.__index_path = index_path
+
+        if json_lines is None:
+            json_lines = file_path.lower().endswith(('.jsonl', '.ndjson'))
+        self.__json_lines = json_lines
+
+        self.__offsets = None
+        self.__offsets_key = None
 
     @property
     def representative_name(self) -> str:
@@ -162,21 +347,182 @@ class JSONFile(RawInformationSource):
 
         return file_name
 
+    @property
+    def file_path(self) -> str:
+        return self.__file_path
+
+    @property
+    def json_lines(self) -> bool:
+        return self.__json_lines
+
+    @property
+    def index_path(self) -> Optional[str]:
+        """
+        Path of the file storing the byte offset of each row, None if the offsets are only kept in memory
+        """
+        return self.__index_path
+
     def __iter__(self) -> Iterator[Dict[str, str]]:
-        with open(self.__file_path, encoding=self.encoding) as j:
-            all_lines = json.load(j, parse_int=str, parse_float=str)
-            for line in all_lines:
-                yield line
+        for _, row in self._iter_rows():
+            yield row
 
     def __len__(self):
-        with open(self.__file_path, encoding=self.encoding) as j:
-            return len(json.load(j))
+        return len(self._row_offsets())
+
+    def __getitem__(self, position: int) -> Dict[str, str]:
+        offset = self._row_offsets()[position]
+        _, row = next(self._iter_rows(start_offset=int(offset)))
+
+        return row
+
+    def _iter_rows(self, start_offset: int = None, with_offsets: bool = False) -> Iterator:
+        # yields (byte offset of the row, row). Offsets are only computed if with_offsets is True (they are None
+        # otherwise), if start_offset is set rows are read from that byte offset, which must be the start of a row
+        if self.__json_lines:
+            yield from self._iter_json_lines(start_offset)
+        else:
+            yield from self._iter_json_list(start_offset, with_offsets)
+
+    def _iter_json_lines(self, start_offset: int = None) -> Iterator:
+        with open(self.__file_path, 'rb') as f:
+            offset = start_offset or 0
+            f.seek(offset)
+            for line in f:
+                if line.strip():
+                    yield offset, json.loads(line.decode(self.encoding), parse_int=str, parse_float=str)
+                offset += len(line)
+
+    def _iter_json_list(self, start_offset: int = None, with_offsets: bool = False,
+                        block_size: int = 1 << 20) -> Iterator:
+        decoder = json.JSONDecoder(parse_int=str, parse_float=str)
+        text_decoder = codecs.getincrementaldecoder(self.encoding)()
+        # the byte offset of a row is the offset of the last row plus the encoded size of the text in between
+        # (a BOM is skipped by the decoder, so it's the only thing never encoded back)
+        codec_name = codecs.lookup(self.encoding).name
+        encode_codec = 'utf-8' if codec_name == 'utf-8-sig' else codec_name
+
+        with open(self.__file_path, 'rb') as f:
+            if start_offset is not None:
+                f.seek(start_offset)
+            elif codec_name == 'utf-8-sig' and f.read(3) != codecs.BOM_UTF8:
+                f.seek(0)
+            known_offset = f.tell()
+
+            buffer = ''
+            pos = 0
+            known_pos = 0
+            eof = False
+
+            def fill():
+                nonlocal buffer, pos, known_pos, known_offset, eof
+                block = f.read(block_size)
+                eof = len(block) == 0
+                if with_offsets:
+                    known_offset += len(buffer[known_pos:pos].encode(encode_codec))
+                    known_pos = 0
+                buffer = buffer[pos:] + text_decoder.decode(block, final=eof)
+                pos = 0
+
+            def skip_whitespace():
+                nonlocal pos
+                while True:
+                    while pos < len(buffer) and buffer[pos] in ' \t\n\r':
+                        pos += 1
+                    if pos < len(buffer) or eof:
+                        return
+                    fill()
+
+            fill()
+            if start_offset is None:
+                skip_whitespace()
+                if buffer[pos:pos + 1] != '[':
+                    raise ValueError(f"{self.__file_path} is not a list of JSON objects, "
+                                     f"set json_lines=True if it's in JSON Lines format")
+                pos += 1
+
+            while True:
+                skip_whitespace()
+                if pos >= len(buffer) or buffer[pos] == ']':
+                    return
+                if buffer[pos] == ',':
+                    pos += 1
+                    continue
+
+                try:
+                    row, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill()
+                    continue
+
+                # a value ending exactly at the end of the buffer may be truncated (e.g. a number)
+                if end == len(buffer) and not eof:
+                    fill()
+                    continue
+
+                row_offset = None
+                if with_offsets:
+                    known_offset += len(buffer[known_pos:pos].encode(encode_codec))
+                    known_pos = pos
+                    row_offset = known_offset
+
+                yield row_offset, row
+                pos = end
+
+    def _row_offsets(self) -> np.ndarray:
+        stat = os.stat(self.__file_path)
+        key = (stat.st_size, stat.st_mtime_ns)
+        if self.__offsets is not None and self.__offsets_key == key:
+            return self.__offsets
+
+        offsets = None
+        if self.index_path is not None:
+            try:
+                with np.load(self.index_path) as index:
+                    if (int(index['size']), int(index['mtime_ns'])) == key:
+                        offsets = index['offsets']
+            except (OSError, ValueError, KeyError):
+                pass
+
+        if offsets is None:
+            if self.__json_lines:
+                offsets = np.fromiter(self._iter_line_offsets(), dtype=np.int64)
+            else:
+                offsets = np.fromiter((offset for offset, _ in self._iter_json_list(with_offsets=True)),
+                                      dtype=np.int64)
+
+            if self.index_path is not None:
+                # the index file is only an optimization: if it can't be written (e.g. read-only directory) the
+                # offsets are still kept in memory
+                tmp_path = f'{self.index_path}.{os.getpid()}.tmp'
+                try:
+                    with open(tmp_path, 'wb') as f:
+                        np.savez(f, offsets=offsets, size=key[0], mtime_ns=key[1])
+                    os.replace(tmp_path, self.index_path)
+                except OSError:
+                    pass
+
+        self.__offsets = offsets
+        self.__offsets_key = key
+
+        return offsets
+
+    def _iter_line_offsets(self) -> Iterator[int]:
+        # offsets of non blank lines, without parsing them
+        with open(self.__file_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                if line.strip():
+                    yield offset
+                offset += len(line)
 
     def __str__(self):
         return "JSONFile"
 
     def __repr__(self):
-        return f'JSONFile(encoding={self.__encoding}, file_path={self.__file_path})'
+        return f'JSONFile(encoding={self.encoding}, file_path={self.__file_path}, json_lines={self.__json_lines}, ' \
+               f'index_path={self.__index_path})'
 
 
 class CSVFile(RawInformationSource):
@@ -247,6 +593,10 @@ class CSVFile(RawInformationSource):
 
         return file_name
 
+    @property
+    def file_path(self) -> str:
+        return self.__file_path
+
     def __iter__(self) -> Iterator[Dict[str, str]]:
         with open(self.__file_path, newline='', encoding=self.encoding) as csv_file:
             if self.__has_header:
@@ -258,14 +608,60 @@ class CSVFile(RawInformationSource):
 
             yield from reader
 
-    def __len__(self):
+    @property
+    def column_names(self) -> List[str]:
         with open(self.__file_path, newline='', encoding=self.encoding) as csv_file:
-            total_length = sum(1 for _ in csv_file)
+            first_row = next(csv.reader(csv_file, quoting=csv.QUOTE_MINIMAL, delimiter=self.__separator), [])
+
+        return first_row if self.__has_header else [str(i) for i in range(len(first_row))]
+
+    def iter_chunks(self, columns: List[str] = None, chunk_size: int = 100000,
+                    dtype: Dict[str, object] = None, as_arrow: bool = False) -> Iterator:
+        """
+        Iter on the CSV file in column batches, parsed by the C parser of pandas: only the requested columns are
+        parsed, and columns with a type in `dtype` are converted while parsing. As with the row iterator, values are
+        strings (empty entries are empty strings) unless a type is specified for their column.
+
+        Check `RawInformationSource.iter_chunks()` for the meaning of the parameters
+        """
+        column_names = self.column_names
+        if columns is not None:
+            missing = [column for column in columns if column not in column_names]
+            if len(missing) != 0:
+                raise KeyError(missing[0])
+
+        # without header pandas refers to columns by position
+        to_pandas_label = (lambda column: column) if self.__has_header else int
+        read_columns = columns if columns is not None else column_names
+        read_dtype = {to_pandas_label(column): (dtype or {}).get(column, str) for column in read_columns}
+
+        reader = pd.read_csv(self.__file_path,
+                             sep=self.__separator,
+                             header=0 if self.__has_header else None,
+                             usecols=[to_pandas_label(column) for column in read_columns],
+                             dtype=read_dtype,
+                             na_filter=False,
+                             quoting=csv.QUOTE_MINIMAL,
+                             encoding=self.encoding,
+                             engine='c' if len(self.__separator) == 1 else 'python',
+                             chunksize=chunk_size)
+
+        with reader:
+            for frame in reader:
+                batch = {column: frame[to_pandas_label(column)].to_numpy() for column in read_columns}
+
+                yield self._format_chunk(batch, None, as_arrow)
+
+    def __len__(self):
+        def count_rows():
+            total_length = _count_lines(self.__file_path)
             if self.__has_header:
                 total_length -= 1
 
             return total_length
 
+        return self._cached_length(self.__file_path, count_rows)
+
     def __str__(self):
         return "CSVFile"
 
@@ -274,6 +670,49 @@ class CSVFile(RawInformationSource):
                f'encoding={self.encoding})'
 
 
+class _ConnectionPool:
+    """
+    Small pool of database connections: connections are created only when needed, up to `size` at the same time, and
+    are reused by the following queries instead of connecting again each time
+    """
+
+    def __init__(self, connection_factory: Callable, size: int = 5):
+        self.__connection_factory = connection_factory
+        self.__idle_connections = queue.LifoQueue()
+        self.__slots = threading.BoundedSemaphore(size)
+
+    def add(self, connection):
+        self.__idle_connections.put(connection)
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self.__slots:
+            try:
+                connection = self.__idle_connections.get_nowait()
+            except queue.Empty:
+                connection = self.__connection_factory()
+
+            try:
+                yield connection
+            except GeneratorExit:
+                # a caller stopped iterating the rows early: the cursor has been closed, the connection can be reused
+                self.__idle_connections.put(connection)
+                raise
+            except BaseException:
+                # the connection may be in an unknown state, a new one will be created when needed
+                connection.close()
+                raise
+            else:
+                self.__idle_connections.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                self.__idle_connections.get_nowait().close()
+            except queue.Empty:
+                break
+
+
 class SQLDatabase(RawInformationSource):
     """
     Wrapper for a SQL database.
@@ -281,6 +720,11 @@ class SQLDatabase(RawInformationSource):
     You can iterate over the whole content of the raw source with a simple for loop: each row will be returned as a
     dictionary where keys are strings representing the positional indices, values are the entries
 
+    Rows are streamed from the server with an unbuffered cursor and fetched in batches of `batch_size` rows, so the
+    whole table is never held in memory. Only the `columns` specified are selected, and rows can be filtered and
+    sorted by the database with the `where` and `order_by` clauses. Connections are taken from a small pool and
+    reused between queries
+
     Examples:
 
         Consider the following SQL table for the databaase 'movies' in localhost
@@ -299,6 +743,16 @@ class SQLDatabase(RawInformationSource):
         [{'Movie ID': '1', 'Movie Title': 'Jumanji', 'Release Year': '1995'},
         {'Movie ID': '2', 'Movie Title': 'Toy Story', 'Release Year': '1995'}]
 
+        >>> file = SQLDatabase(host='127.0.0.1', username='root', password='root',
+        >>>                    database_name='movies', table_name='movies_table',
+        >>>                    columns=['Movie ID'], where="`Release Year` > 1990", order_by='`Movie ID`')
+
+        Any DB-API connection can be used instead of a MySQL one by passing a `connection_factory`, e.g. a SQLite
+        database
+
+        >>> file = SQLDatabase(host=None, username=None, password=None, database_name=None,
+        >>>                    table_name='movies_table', connection_factory=lambda: sqlite3.connect('movies.db'))
+
     Args:
         host: host ip of the sql server
         username: username for the access
@@ -306,6 +760,14 @@ class SQLDatabase(RawInformationSource):
         database_name: name of database
         table_name: name of the database table where data is stored
         encoding: Define the type of encoding of data stored in the source (example: "utf-8")
+        columns: Columns to select. Default is None, meaning that all columns are selected
+        where: Optional SQL condition (without the `WHERE` keyword) that rows must satisfy
+        order_by: Optional SQL sort key (without the `ORDER BY` keyword) of the rows
+        batch_size: Number of rows fetched from the server at a time
+        pool_size: Maximum number of connections open at the same time
+        connection_factory: Optional function with no arguments returning a new DB-API connection. Default is None,
+            meaning that MySQL connections are created with the `host`, `username`, `password` and `database_name`
+            specified
     """
 
     def __init__(self, host: str,
@@ -313,23 +775,40 @@ class SQLDatabase(RawInformationSource):
                  password: str,
                  database_name: str,
                  table_name: str,
-                 encoding: str = "utf-8"):
+                 encoding: str = "utf-8",
+                 columns: List[str] = None,
+                 where: str = None,
+                 order_by: str = None,
+                 batch_size: int = 1000,
+                 pool_size: int = 5,
+                 connection_factory: Callable = None):
         super().__init__(encoding)
         self.__host: str = host
         self.__username: str = username
         self.__password: str = password
         self.__database_name: str = database_name
         self.__table_name: str = table_name
-
-        conn = mysql.connector.connect(host=self.__host,
+        self.__columns: List[str] = columns
+        self.__where: str = where
+        self.__order_by: str = order_by
+        self.__batch_size: int = batch_size
+
+        if connection_factory is None:
+            connection_factory = self.__connect_mysql
+        self.__pool = _ConnectionPool(connection_factory, pool_size)
+
+        # a first connection is opened right away, so that wrong parameters are reported when the source is created
+        self.__conn = connection_factory()
+        self.__pool.add(self.__conn)
+
+    def __connect_mysql(self):
+        # consume_results: rows not read by an interrupted iteration are discarded before the connection is reused
+        return mysql.connector.connect(host=self.__host,
                                        user=self.__username,
                                        password=self.__password,
-                                       charset=self.encoding)
-        cursor = conn.cursor()
-        query = """USE """ + self.__database_name + """;"""
-        cursor.execute(query)
-        conn.commit()
-        self.__conn = conn
+                                       database=self.__database_name,
+                                       charset=self.encoding,
+                                       consume_results=True)
 
     @property
     def host(self) -> str:
@@ -355,6 +834,18 @@ class SQLDatabase(RawInformationSource):
     def conn(self):
         return self.__conn
 
+    @property
+    def columns(self) -> List[str]:
+        return self.__columns
+
+    @property
+    def where(self) -> str:
+        return self.__where
+
+    @property
+    def order_by(self) -> str:
+        return self.__order_by
+
     @host.setter
     def host(self, host: str):
         self.__host = host
@@ -377,8 +868,23 @@ class SQLDatabase(RawInformationSource):
 
     @conn.setter
     def conn(self, conn):
+        # the connection set replaces the ones in the pool
+        self.__pool.close()
+        self.__pool.add(conn)
         self.__conn = conn
 
+    @columns.setter
+    def columns(self, columns: List[str]):
+        self.__columns = columns
+
+    @where.setter
+    def where(self, where: str):
+        self.__where = where
+
+    @order_by.setter
+    def order_by(self, order_by: str):
+        self.__order_by = order_by
+
     @property
     def representative_name(self) -> str:
         """
@@ -391,20 +897,96 @@ class SQLDatabase(RawInformationSource):
         """
         return f"{self.host}/{self.table_name}"
 
+    @property
+    def column_names(self) -> List[str]:
+        if self.columns is not None:
+            return list(self.columns)
+
+        with self.__pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT * FROM {self._quote_table(self.table_name)} LIMIT 0")
+                cursor.fetchall()
+                return [description[0] for description in cursor.description]
+            finally:
+                cursor.close()
+
+    @staticmethod
+    def _quote(identifier: str) -> str:
+        # backticks are understood both by MySQL and SQLite
+        return '`' + identifier.replace('`', '``') + '`'
+
+    @classmethod
+    def _quote_table(cls, table_name: str) -> str:
+        # a qualified name such as `db.table` is quoted part by part, otherwise it would name a single table
+        return '.'.join(cls._quote(part) for part in table_name.split('.'))
+
+    def _select_query(self, columns: List[str] = None, count: bool = False) -> str:
+        if count:
+            selected = "COUNT(*)"
+        elif columns is not None:
+            selected = ", ".join(self._quote(column) for column in columns)
+        else:
+            selected = "*"
+
+        query = f"SELECT {selected} FROM {self._quote_table(self.table_name)}"
+        if self.where is not None:
+            query += f" WHERE {self.where}"
+        if self.order_by is not None and not count:
+            query += f" ORDER BY {self.order_by}"
+
+        return query + ";"
+
+    def _iter_batches(self, columns: List[str] = None, batch_size: int = None) -> Iterator:
+        # yields (column names, list of row tuples) for each batch fetched from the server
+        with self.__pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._select_query(columns))
+                names = [description[0] for description in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(batch_size or self.__batch_size)
+                    if len(rows) == 0:
+                        break
+                    yield names, rows
+            finally:
+                cursor.close()
+
     def __iter__(self) -> Iterator[Dict[str, str]]:
-        cursor = self.conn.cursor(dictionary=True)
-        query = """SELECT * FROM """ + self.table_name + """;"""
-        cursor.execute(query)
-        for result in cursor:
-            yield result
+        for names, rows in self._iter_batches(self.columns):
+            for row in rows:
+                yield dict(zip(names, row))
 
-    def __len__(self):
-        cursor = self.conn.cursor()
-        query = """SELECT * FROM """ + self.table_name + """;"""
-        cursor.execute(query)
-        cursor.fetchall()
+    def iter_chunks(self, columns: List[str] = None, chunk_size: int = 100000,
+                    dtype: Dict[str, object] = None, as_arrow: bool = False) -> Iterator:
+        """
+        Iter on the table in column batches: only the requested columns are selected by the query, and the rows of
+        each chunk are fetched from the server at once.
+
+        Check `RawInformationSource.iter_chunks()` for the meaning of the parameters
+        """
+        if columns is not None and self.columns is not None:
+            missing = [column for column in columns if column not in self.columns]
+            if len(missing) != 0:
+                raise KeyError(missing[0])
 
-        return cursor.rowcount
+        for names, rows in self._iter_batches(columns if columns is not None else self.columns, chunk_size):
+            batch = {}
+            for name, column_values in zip(names, zip(*rows)):
+                values = np.empty(len(rows), dtype=object)
+                values[:] = column_values
+                batch[name] = values
+
+            yield self._format_chunk(batch, dtype, as_arrow)
+
+    def __len__(self):
+        with self.__pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._select_query(count=True))
+                return cursor.fetchone()[0]
+            finally:
+                cursor.close()
 
     def __str__(self):
         return "SQLDatabase"
@@ -412,4 +994,416 @@ class SQLDatabase(RawInformationSource):
     def __repr__(self):
         return f'SQLDatabase(host={self.__host},' \
                f'username={self.__username}, password={self.__password}, ' \
-               f'database_name={self.__database_name}, table_name={self.__table_name}, encoding={self.encoding})'
+               f'database_name={self.__database_name}, table_name={self.__table_name}, encoding={self.encoding}, ' \
+               f'columns={self.__columns}, where={self.__where}, order_by={self.__order_by})'
+
+
+# value of the columns that a row of a schemaless source (e.g. a JSON file) doesn't have
+_MISSING = object()
+
+
+class _MaterializedColumn:
+    """
+    Values of a column of a MaterializedSource. A column whose values are all strings is stored as the UTF-8 text of
+    its values one after the other plus the byte and character offset where each value starts, in memory or in two
+    files if `path` is specified. A column with other values is an array of objects kept in memory
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.is_text = True
+        self.has_missing = False
+        self.nbytes = 0
+
+        self.data = None
+        self.offsets = None
+        self.objects = None
+
+        self.__parts = []
+        self.__data_file = open(f'{path}.data', 'wb') if path is not None else None
+        self.__byte_lengths = []
+        self.__char_lengths = []
+        self.__object_parts = []
+
+    def append(self, values: np.ndarray):
+        if self.is_text:
+            if all(type(value) is str for value in values):
+                self.__append_text(values)
+                return
+
+            self.__convert_to_objects()
+
+        self.has_missing = self.has_missing or any(value is _MISSING for value in values)
+        self.__object_parts.append(values)
+
+    def __append_text(self, values: np.ndarray):
+        text = ''.join(values)
+        encoded = text.encode('utf-8', 'surrogatepass')
+        char_lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        if len(encoded) == len(text):
+            # ASCII only, one byte per character
+            byte_lengths = char_lengths
+        else:
+            byte_lengths = np.fromiter((len(value.encode('utf-8', 'surrogatepass')) for value in values),
+                                       dtype=np.int64, count=len(values))
+
+        if self.__data_file is not None:
+            self.__data_file.write(encoded)
+        else:
+            self.__parts.append(encoded)
+        self.__byte_lengths.append(byte_lengths)
+        self.__char_lengths.append(char_lengths)
+
+    def __convert_to_objects(self):
+        # the values stored so far are decoded back, from now on the column is an array of objects
+        self.finish()
+        if len(self.offsets[0]) > 1:
+            self.__object_parts.append(self.values(0, len(self.offsets[0]) - 1))
+
+        self.is_text = False
+        self.data = self.offsets = None
+        if self.path is not None:
+            os.remove(f'{self.path}.data')
+            os.remove(f'{self.path}.offsets.npy')
+
+    def finish(self):
+        if not self.is_text:
+            self.objects = np.concatenate(self.__object_parts) if self.__object_parts else np.empty(0, dtype=object)
+            self.__object_parts = []
+            self.nbytes = self.objects.nbytes + sum(sys.getsizeof(value) for value in self.objects)
+            return
+
+        offsets = np.zeros((2, sum(len(lengths) for lengths in self.__byte_lengths) + 1), dtype=np.int64)
+        if self.__byte_lengths:
+            np.cumsum(np.concatenate(self.__byte_lengths), out=offsets[0, 1:])
+            np.cumsum(np.concatenate(self.__char_lengths), out=offsets[1, 1:])
+        self.__byte_lengths, self.__char_lengths = [], []
+
+        if self.path is not None:
+            self.__data_file.close()
+            self.__data_file = None
+            np.save(f'{self.path}.offsets.npy', offsets)
+            self.__map_files()
+        else:
+            self.data = np.frombuffer(b''.join(self.__parts), dtype=np.uint8)
+            self.__parts = []
+            self.offsets = offsets
+
+        self.nbytes = self.data.nbytes + self.offsets.nbytes
+
+    def __map_files(self):
+        self.offsets = np.load(f'{self.path}.offsets.npy', mmap_mode='r')
+        # a file of 0 bytes can't be memory-mapped
+        self.data = np.memmap(f'{self.path}.data', dtype=np.uint8, mode='r') if self.offsets[0, -1] > 0 \
+            else np.empty(0, dtype=np.uint8)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.path is not None and self.is_text:
+            # other processes map the same files instead of receiving a copy of their content
+            state['data'] = state['offsets'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.path is not None and self.is_text:
+            self.__map_files()
+
+    def values(self, start: int, stop: int) -> np.ndarray:
+        if not self.is_text:
+            return self.objects[start:stop].copy()
+
+        # the text of the whole slice is decoded at once, then split at the character offsets
+        text = self.data[self.offsets[0, start]:self.offsets[0, stop]].tobytes().decode('utf-8', 'surrogatepass')
+        char_offsets = (self.offsets[1, start:stop + 1] - self.offsets[1, start]).tolist()
+        return _object_array([text[char_offsets[i]:char_offsets[i + 1]] for i in range(stop - start)])
+
+
+class MaterializedSource(RawInformationSource):
+    """
+    Raw source which parses another raw source once and keeps its values in a compact columnar store. The Content
+    Analyzer goes over the source once to build the ids, once for each exogenous config and once for each field config:
+    with a materialized source the raw data is parsed only the first time, and each technique then decodes only the
+    column it needs (see `iter_column()` and `iter_chunks()`) instead of building a dict for every row.
+
+    Columns whose values are all strings (e.g. every column of a CSV or DAT file) take the size of their UTF-8 text plus
+    16 bytes per row. If `directory` is specified they are written in that directory and memory-mapped rather than
+    kept in memory, so that sources larger than the available memory can be materialized too. Columns with other
+    values (numbers, lists, dicts, ...) are kept in memory as arrays of objects.
+
+    The `ContentAnalyzer` materializes its source by itself when the config reads it more than once, wrapping the
+    source is only needed to memory-map the store or to share it between several configs
+
+    Examples:
+
+        >>> source = MaterializedSource(CSVFile(csv_path), directory='movies_store')
+        >>> source.bytes_read, source.parse_time
+        (1048576, 0.42)
+        >>> next(source.iter_column('title'))
+        'Toy Story (1995)'
+
+    Args:
+        source: Raw source to materialize
+        directory: If specified, directory where string columns are stored and memory-mapped from
+        chunk_size: Number of rows parsed at a time
+    """
+
+    def __init__(self, source: RawInformationSource, directory: str = None, chunk_size: int = 100000):
+        super().__init__(source.encoding)
+        self.__source = source
+        self.__representative_name = source.representative_name
+        self.__directory = directory
+        self.__columns: Dict[str, _MaterializedColumn] = {}
+        self.__length = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        start = time.perf_counter()
+        self.__materialize(chunk_size)
+        self.__parse_time = time.perf_counter() - start
+
+        file_path = getattr(source, 'file_path', None)
+        if file_path is not None:
+            self.__bytes_read = os.path.getsize(file_path)
+        else:
+            # e.g. a database: size of the text received
+            self.__bytes_read = sum(int(column.offsets[0, -1]) for column in self.__columns.values()
+                                    if column.is_text)
+
+    def __materialize(self, chunk_size: int):
+        if type(self.__source).iter_chunks is not RawInformationSource.iter_chunks:
+            # the source reads columns directly, all its rows have the same columns
+            chunks = self.__source.iter_chunks(chunk_size=chunk_size)
+        else:
+            chunks = self.__iter_row_chunks(chunk_size)
+
+        for chunk in chunks:
+            chunk_length = len(next(iter(chunk.values()))) if len(chunk) != 0 else 0
+            for column_name, values in chunk.items():
+                column = self.__columns.get(column_name)
+                if column is None:
+                    path = os.path.join(self.__directory, f'column_{len(self.__columns)}') \
+                        if self.__directory is not None else None
+                    column = self.__columns[column_name] = _MaterializedColumn(path)
+                    if self.__length != 0:
+                        column.append(_object_array([_MISSING] * self.__length))
+
+                column.append(values)
+
+            for column_name, column in self.__columns.items():
+                if column_name not in chunk:
+                    column.append(_object_array([_MISSING] * chunk_length))
+
+            self.__length += chunk_length
+
+        for column in self.__columns.values():
+            column.finish()
+
+    def __iter_row_chunks(self, chunk_size: int) -> Iterator[Dict[str, np.ndarray]]:
+        # rows may not have all the same keys, each chunk has all the keys of its rows
+        rows = iter(self.__source)
+        while True:
+            chunk_rows = list(itertools.islice(rows, chunk_size))
+            if len(chunk_rows) == 0:
+                break
+
+            column_names = dict.fromkeys(itertools.chain.from_iterable(chunk_rows))
+            yield {column: _object_array([row.get(column, _MISSING) for row in chunk_rows])
+                   for column in column_names}
+
+    @property
+    def source(self) -> RawInformationSource:
+        return self.__source
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    @property
+    def bytes_read(self) -> int:
+        """
+        Bytes read from the wrapped source when it was parsed (the size of the file for file sources)
+        """
+        return self.__bytes_read
+
+    @property
+    def parse_time(self) -> float:
+        """
+        Seconds spent parsing the wrapped source and building the store
+        """
+        return self.__parse_time
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size in bytes of the store, memory-mapped files included
+        """
+        return sum(column.nbytes for column in self.__columns.values())
+
+    @property
+    def representative_name(self) -> str:
+        return self.__representative_name
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.__columns.keys())
+
+    def iter_chunks(self, columns: List[str] = None, chunk_size: int = 100000,
+                    dtype: Dict[str, object] = None, as_arrow: bool = False) -> Iterator:
+        """
+        Iter on the stored values in column batches, only the requested columns are decoded. As for the wrapped source,
+        reading a column which some row doesn't have raises a KeyError.
+
+        Check `RawInformationSource.iter_chunks()` for the meaning of the parameters
+        """
+        return self._iter_chunks_range(0, self.__length, columns, chunk_size, dtype, as_arrow)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return self._iter_range(0, self.__length)
+
+    def slice(self, start: int, stop: int) -> RawInformationSource:
+        """
+        The rows from start to stop (excluded) as a raw source of their own. Nothing is copied, the slice reads the
+        values of this store. The Content Analyzer uses slices to produce contents in chunks of rows
+
+        Args:
+            start: First row of the slice
+            stop: Row after the last row of the slice
+
+        Returns:
+            Raw source with the rows of the slice
+        """
+        return _MaterializedSlice(self, max(0, start), min(stop, self.__length))
+
+    def take(self, rows: Sequence[int]) -> RawInformationSource:
+        """
+        Some rows, in the given order, as a raw source of their own. Nothing is copied, the rows are read from this
+        store. The Content Analyzer uses it to process only the rows which changed since the last run
+
+        Args:
+            rows: Positions of the rows to read
+
+        Returns:
+            Raw source with the rows
+        """
+        return _MaterializedRows(self, [int(row) for row in rows])
+
+    def _iter_chunks_range(self, start: int, stop: int, columns: List[str], chunk_size: int,
+                           dtype: Dict[str, object], as_arrow: bool) -> Iterator:
+        columns = columns if columns is not None else self.column_names
+        missing = [column for column in columns if column not in self.__columns]
+        if len(missing) != 0:
+            raise KeyError(missing[0])
+
+        for chunk_start in range(start, stop, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            batch = {column: self.__columns[column].values(chunk_start, chunk_stop) for column in columns}
+            for column in columns:
+                if self.__columns[column].has_missing and any(value is _MISSING for value in batch[column]):
+                    raise KeyError(column)
+
+            yield self._format_chunk(batch, dtype, as_arrow)
+
+    def _iter_range(self, start: int, stop: int) -> Iterator[Dict[str, str]]:
+        chunk_size = 10000
+        for chunk_start in range(start, stop, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            batch = [(column_name, column.values(chunk_start, chunk_stop))
+                     for column_name, column in self.__columns.items()]
+            for i in range(chunk_stop - chunk_start):
+                yield {column_name: values[i] for column_name, values in batch if values[i] is not _MISSING}
+
+    def __len__(self):
+        return self.__length
+
+    def __getstate__(self):
+        # the wrapped source isn't needed once materialized, and it may not be picklable (e.g. database connections)
+        state = self.__dict__.copy()
+        state['_MaterializedSource__source'] = None
+        return state
+
+    def __str__(self):
+        return "MaterializedSource"
+
+    def __repr__(self):
+        return f'MaterializedSource(source={self.__source!r}, directory={self.__directory})'
+
+
+class _MaterializedSlice(RawInformationSource):
+    """
+    Rows from start to stop (excluded) of a MaterializedSource, see `MaterializedSource.slice()`
+    """
+
+    def __init__(self, source: MaterializedSource, start: int, stop: int):
+        super().__init__(source.encoding)
+        self.__source = source
+        self.__start = start
+        self.__stop = max(start, stop)
+
+    @property
+    def start(self) -> int:
+        return self.__start
+
+    @property
+    def representative_name(self) -> str:
+        return self.__source.representative_name
+
+    @property
+    def column_names(self) -> List[str]:
+        return self.__source.column_names
+
+    def iter_chunks(self, columns: List[str] = None, chunk_size: int = 100000,
+                    dtype: Dict[str, object] = None, as_arrow: bool = False) -> Iterator:
+        return self.__source._iter_chunks_range(self.__start, self.__stop, columns, chunk_size, dtype, as_arrow)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return self.__source._iter_range(self.__start, self.__stop)
+
+    def __len__(self):
+        return self.__stop - self.__start
+
+    def __str__(self):
+        return "MaterializedSlice"
+
+    def __repr__(self):
+        return f'MaterializedSlice(source={self.__source!r}, start={self.__start}, stop={self.__stop})'
+
+
+class _MaterializedRows(RawInformationSource):
+    """
+    Some rows of a MaterializedSource, see `MaterializedSource.take()`. Runs of consecutive rows are read together
+    """
+
+    def __init__(self, source: MaterializedSource, rows: List[int]):
+        super().__init__(source.encoding)
+        self.__source = source
+        self.__rows = rows
+
+    @property
+    def representative_name(self) -> str:
+        return self.__source.representative_name
+
+    @property
+    def column_names(self) -> List[str]:
+        return self.__source.column_names
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        rows = self.__rows
+        run_start = 0
+        while run_start < len(rows):
+            run_stop = run_start + 1
+            while run_stop < len(rows) and rows[run_stop] == rows[run_stop - 1] + 1:
+                run_stop += 1
+
+            yield from self.__source._iter_range(rows[run_start], rows[run_start] + run_stop - run_start)
+            run_start = run_stop
+
+    def __len__(self):
+        return len(self.__rows)
+
+    def __str__(self):
+        return "MaterializedRows"
+
+    def __repr__(self):
+        return f'MaterializedRows(source={self.__source!r}, rows={self.__rows})'
@@ -3,6 +3,7 @@ from os import listdir
 from abc import abstractmethod, ABC
 from typing import Set, Iterable
 
+from clayrs.content_analyzer.content_store import ContentStore
 from clayrs.content_analyzer.memory_interfaces.text_interface import SearchIndex
 from clayrs.utils import load_content_instance
 from clayrs.utils.const import logger
@@ -15,13 +16,21 @@ class LoadedContentsInterface(ABC):
 
 
 class LoadedContentsDict(LoadedContentsInterface):
+    """
+    Contents of a directory written by the Content Analyzer, loaded in a dict by id. The directory can be a
+    ContentStore, in which case only the rows of the contents are read, or contain one serialized file per content
+    """
 
     def __init__(self, contents_path: str, contents_to_load: Set[str] = None, only_representations: dict = None):
         self._contents_path = contents_path
 
-        self._available_items_set = {splitext(filename)[0]
-                                     for filename in listdir(contents_path)
-                                     if isfile(join(contents_path, filename)) and splitext(filename)[1] == ".xz"}
+        self._store = ContentStore(contents_path) if ContentStore.is_store(contents_path) else None
+        if self._store is not None:
+            self._available_items_set = set(self._store)
+        else:
+            self._available_items_set = {splitext(filename)[0]
+                                         for filename in listdir(contents_path)
+                                         if isfile(join(contents_path, filename)) and splitext(filename)[1] == ".xz"}
 
         # we load all available items
         if contents_to_load is None:
@@ -35,27 +44,33 @@ class LoadedContentsDict(LoadedContentsInterface):
         self._contents_dict = {}
         if len(contents_to_load_present) != 0:
             logger.info("Loading contents from disk...")
-            self._contents_dict = {item_id: load_content_instance(contents_path, item_id, only_representations)
+            self._contents_dict = {item_id: self._load(item_id, only_representations)
                                    for item_id in contents_to_load_present}
 
             if not any(self._contents_dict.values()):
                 raise FileNotFoundError(f"No contents found in {contents_path}! "
                                         f"Maybe you have misspelled the path folder?")
 
+    def _load(self, content_id: str, only_representations: dict = None):
+        if self._store is not None:
+            return self._store.load(content_id, only_representations)
+
+        return load_content_instance(self._contents_path, content_id, only_representations)
+
     def get_contents_interface(self):
         return self._contents_dict
 
     def get(self, key: str, only_representations: dict = None):
         content = self._contents_dict.get(key)
         if content is None:
-            content = load_content_instance(self._contents_path, key, only_representations)
+            content = self._load(key, only_representations)
             self._contents_dict[key] = content
 
         return content
 
     def get_list(self, key_list: Iterable[str], only_representations: dict = None):
         contents_to_load = set(key_list) - set(self._contents_dict.keys())
-        self._contents_dict.update({content: load_content_instance(self._contents_path, content, only_representations)
+        self._contents_dict.update({content: self._load(content, only_representations)
                                     for content in contents_to_load})
 
         return [self._contents_dict[content_id] for content_id in key_list]
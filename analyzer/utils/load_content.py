@@ -1,4 +1,5 @@
 from __future__ import annotations
+import functools
 import lzma
 import os
 import pickle
@@ -7,18 +8,33 @@ from clayrs.content_analyzer.content_representation.representation_container imp
 from clayrs.content_analyzer.content_representation.content import Content
 
 
+@functools.lru_cache(maxsize=4)
+def _open_store(directory: str, manifest_mtime: int):
+    # imported here, the content store module itself depends on clayrs.utils
+    from clayrs.content_analyzer.content_store import ContentStore
+
+    # the modification time of the manifest is part of the key, so that a directory written again is opened again
+    return ContentStore(directory)
+
+
 def load_content_instance(directory: str, content_id: str, only_field_representations: dict = None) -> Content:
     """
-    Loads a serialized content
+    Loads a serialized content, from a `ContentStore` or from the file of the content
     Args:
         directory: Path to the directory in which the content is stored
-        content_id: ID of the content to load (its filename)
+        content_id: ID of the content to load (its key, the id without punctuation, which is its filename for contents
+            serialized one per file)
         only_field_representations: Specify exactly which representation to load for the content
             (e.g. {'Plot': 0, 'Genres': 1}). Useful for alleviating memory load
 
     Returns:
         content (Content)
     """
+    manifest_path = os.path.join(directory, 'store.json')
+    if os.path.isfile(manifest_path):
+        store = _open_store(os.path.abspath(directory), os.stat(manifest_path).st_mtime_ns)
+        return store.load(content_id, only_field_representations)
+
     try:
         content_filename = os.path.join(directory, '{}.xz'.format(content_id))
         with lzma.open(content_filename, "rb") as content_file:
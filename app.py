@@ -1,64 +1,109 @@
+import os
+import sys
+import threading
+
 import streamlit as st
-from PIL import Image
-import cv2
-import numpy as np
-from keras.models import model_from_json
-from main import *
-from PIL import Image
-
-
-def detect_emotion(img):
-    json_file = open('model/emotion_model.json', 'r')
-    loaded_model_json = json_file.read()
-    json_file.close()
-    
-    emotion_model = model_from_json(loaded_model_json)
-    
-    emotion_model.load_weights('model/emotion_model.h5')
-    
-    frame = cv2.resize(img, (1280, 720))
-    face_detector = cv2.CascadeClassifier('haarcascades/haarcascade_frontalface_default.xml')
-    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    
-    num_faces = face_detector.detectMultiScale(gray_frame, scaleFactor=1.3, minNeighbors=5)
-    
-    for (x,y,w,h) in num_faces:
-        cv2.rectangle(frame, (x,y-50), (x+w, y+h+10), (0,255,0), 4)
-        roi_gray_frame = gray_frame[y:y + h, x:x + w]
-        cropped_img = np.expand_dims(np.expand_dims(cv2.resize(roi_gray_frame, (48, 48)), -1), 0)
-        
-        emotion_prediction = emotion_model.predict(cropped_img)
-        maxindex = int(np.argmax(emotion_prediction))
-        cv2.putText(frame, emotion_dict[maxindex], (x+5, y-20), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2, cv2.LINE_AA)
-        
-        
-    return frame, maxindex
-    
-   
-    
+
+# Only streamlit is imported eagerly. cv2, numpy, the model runtime and the Spotify client are imported where
+# they are first needed, so that the title and the camera widget render before any of them is loaded.
+# Run `python import_profile.py` to see what each import costs.
+
+
+def warm_up():
+    from model_registry import registry
+    registry.warm_up_async()
+
+
 if __name__=='__main__':
 
     st.title("Music Recommender System")
-    
-    emotion_dict = {0: "Angry", 1: "Disgusted", 2: "Fearful", 4: "Happy", 5: "Sad", 6: "Surprised"}
+
     # genres = {"Action":28, "Comedy":35, "Crime":80, "Fantasy":14, "Horror":27, "Thriller":53}
-    
-    try:
 
+    if st.sidebar.checkbox("Live mode (local webcam)"):
+        from stream import FrameStream
+
+        placeholder = st.empty()
+        # runs until the stream ends or the user unchecks the box, which reruns the script and stops the stream
+        with FrameStream(0) as frame_stream:
+            while not frame_stream.finished:
+                output = frame_stream.latest(timeout=1)
+                if output is not None:
+                    frame, faces = output
+                    placeholder.image(frame, channels='BGR')
+        st.stop()
+
+    try:
         img_file_buffer = st.camera_input("Capture")
+
+        # loads the model while the user is still framing the picture. cv2, numpy and the model runtime are
+        # imported by the warm-up thread, so the script thread keeps rendering without waiting for them
+        if not os.environ.get('EMOTION_SERVER_URL') and 'model_registry' not in sys.modules:
+            threading.Thread(target=warm_up, daemon=True).start()
+
         if img_file_buffer is not None:
-            image = Image.open(img_file_buffer)
-            cv2_img = np.array(image)
-            img, id = detect_emotion(cv2_img)
-            
-        st.write("Detected Emotion: "+emotion_dict[id])
-            
-        if st.button('Recommend Music'):
-            tracks = recom_song(emotion_dict[id])
-            for track in tracks:
-                st.write(f'Link to Track" {track}')
-                    
+            from emotion import dominant_face
+            from emotion_labels import emotion_dict
+            from server import SERVER_URL
+
+            # recent emotions of this session, see mood.py
+            if 'mood' not in st.session_state:
+                from mood import MoodTracker
+                st.session_state.mood = MoodTracker()
+            mood = st.session_state.mood
+
+            def detect(image_bytes):
+                if SERVER_URL:
+                    # inference runs in the worker pool of server.py, shared by every session of the app
+                    from server import detect_remote
+                    return detect_remote(image_bytes)
+
+                from emotion import decode_image, detect_emotion
+
+                # decoded straight from the uploaded bytes, in the BGR order the pipeline expects
+                cv2_img = decode_image(image_bytes)
+                img, faces = detect_emotion(cv2_img)
+                return faces
+
+            # every widget interaction reruns the script, the picture is only classified when it changes
+            faces, is_new = mood.faces_for(img_file_buffer.getvalue(), detect)
+            if is_new:
+                mood.update(dominant_face(faces)['probabilities'])
+            id = mood.label
+
+            st.write("Detected Emotion: "+emotion_dict[id])
+
+            if st.button('Recommend Music'):
+                from catalog import start_background_refresh
+                from main import recom_songs
+
+                # keeps the offline track catalog fresh, searches fall back to the remote API until it is built
+                start_background_refresh(emotion_dict.values())
+
+                # the detected emotion first, then the other emotions found in a group photo, all searched
+                # concurrently
+                emotions = [emotion_dict[id]]
+                emotions += sorted({emotion_dict[face['label']] for face in faces if face['label'] in emotion_dict}
+                                   - set(emotions))
+                # searched again only when the smoothed emotion (or the group) changes, or once the TTL expires
+                recommendations = mood.recommendations(lambda: recom_songs(emotions), key=tuple(emotions))
+                if any(isinstance(tracks, Exception) for tracks in recommendations.values()):
+                    mood.invalidate()
+                for emotion, tracks in recommendations.items():
+                    if len(emotions) > 1:
+                        st.subheader(emotion)
+                    if isinstance(tracks, Exception):
+                        st.write("Please try again!")
+                        continue
+                    for track in tracks:
+                        st.write(f'Link to Track" {track}')
+
     except:
         st.write("Please try again!")
-            
-        
+
+    # the stats need the model modules, they are only imported when asked for
+    if st.sidebar.checkbox("Model stats"):
+        from model_registry import registry
+        from emotion import preprocess_stats
+        st.json(registry.stats())
+        st.json(preprocess_stats())
@@ -0,0 +1,114 @@
+import asyncio
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+# the HTTP clients used by the app (requests, spotipy) are blocking: calls run in this pool and are awaited from
+# the event loop, so that many of them are in flight at the same time
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='async_fetch')
+
+
+def is_transient(error):
+    """
+    Whether a failed call may succeed if it is retried: timeouts, connection errors, and HTTP errors with status 429
+    or 5xx (`requests.HTTPError` carries the response, `spotipy.SpotifyException` the `http_status`)
+    """
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError, requests.Timeout,
+                          requests.ConnectionError)):
+        return True
+
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'http_status', None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class AsyncFetcher:
+    """
+    Runs many blocking lookups concurrently from asyncio.
+
+    * at most `max_concurrency` calls are in flight at the same time
+    * every attempt is abandoned after `timeout` seconds
+    * attempts that failed with a transient error (timeout, connection error, HTTP 429 or 5xx) are retried up to
+      `retries` times, waiting `backoff * 2 ** attempt` seconds (plus jitter). Other errors, e.g. a 404, are raised
+      right away
+    * calls with the same key that overlap in time are coalesced: only the first one runs, the others await its
+      result
+
+    A fetcher belongs to the event loop that first uses it
+    """
+
+    def __init__(self, max_concurrency=8, timeout=5.0, retries=3, backoff=0.3, session=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = session or requests.Session()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = {}
+
+    async def fetch(self, key, func, *args, **kwargs):
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_with_retry(func, *args, **kwargs))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # shield: one caller being cancelled must not cancel the call awaited by the others
+        return await asyncio.shield(future)
+
+    async def _fetch_with_retry(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    return await asyncio.wait_for(loop.run_in_executor(_executor, lambda: func(*args, **kwargs)),
+                                                  self.timeout)
+            except Exception as e:
+                if attempt == self.retries or not is_transient(e):
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+
+    async def get_json(self, url, **params):
+        def get():
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+
+        return await self.fetch(('GET', url, tuple(sorted(params.items()))), get)
+
+    async def gather(self, calls, return_exceptions=True):
+        """
+        Runs `{key: (func, *args)}` concurrently and returns `{key: result}`. With return_exceptions, a call that
+        failed after all its retries maps to its exception instead of failing the whole batch
+        """
+        results = await asyncio.gather(*(self.fetch(key, *call) for key, call in calls.items()),
+                                       return_exceptions=return_exceptions)
+        return dict(zip(calls, results))
+
+
+def run_sync(coroutine):
+    """
+    Runs coroutine to completion from synchronous code (e.g. the Streamlit script), even when the calling thread
+    already has a running event loop
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    result = {}
+
+    def run():
+        try:
+            result['value'] = asyncio.run(coroutine)
+        except BaseException as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result['value']
@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+MODEL_JSON_PATH = 'model/emotion_model.json'
+MODEL_WEIGHTS_PATH = 'model/emotion_model.h5'
+ONNX_MODEL_PATH = 'model/emotion_model.onnx'
+TFLITE_MODEL_PATHS = {
+    'float16': 'model/emotion_model_float16.tflite',
+    'int8': 'model/emotion_model_int8.tflite',
+}
+
+
+class InferenceBackend(ABC):
+    """
+    Runs the emotion CNN on a `(n, 48, 48, 1)` float32 batch of raw 0-255 gray pixels and returns the `(n, 7)`
+    softmax probabilities. Heavy runtimes are imported by the constructor of the backend that needs them, so that
+    choosing ONNX Runtime or TFLite never imports TensorFlow
+    """
+
+    name = None
+
+    @abstractmethod
+    def predict(self, batch):
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def nbytes(self):
+        """
+        Size of the model parameters in bytes
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}()'
+
+
+class KerasBackend(InferenceBackend):
+    name = 'keras'
+
+    def __init__(self, json_path=MODEL_JSON_PATH, weights_path=MODEL_WEIGHTS_PATH):
+        from keras.models import model_from_json
+
+        with open(json_path, 'r') as json_file:
+            self.model = model_from_json(json_file.read())
+        self.model.load_weights(weights_path)
+
+    def predict(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+    @property
+    def nbytes(self):
+        return sum(weights.nbytes for weights in self.model.get_weights())
+
+
+class OnnxBackend(InferenceBackend):
+    name = 'onnx'
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, num_threads=None):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("onnxruntime is needed by the onnx backend: pip install onnxruntime") from None
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads is not None:
+            options.intra_op_num_threads = num_threads
+
+        self.model_path = model_path
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+
+    @property
+    def nbytes(self):
+        return os.path.getsize(self.model_path)
+
+    def __repr__(self):
+        return f'OnnxBackend(model_path={self.model_path})'
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    Runs a float16 or int8 quantized TFLite model. Quantized inputs and outputs are converted with the scale and
+    zero point stored in the model, so callers always pass and receive float32
+    """
+
+    name = 'tflite'
+
+    def __init__(self, quantization='int8', model_path=None, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tensorflow.lite import Interpreter
+            except ImportError:
+                raise ImportError("tflite-runtime (or tensorflow) is needed by the tflite backend: "
+                                  "pip install tflite-runtime") from None
+
+        self.model_path = model_path or TFLITE_MODEL_PATHS[quantization]
+        self.interpreter = Interpreter(model_path=self.model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        # a TFLite interpreter can't be invoked from two threads at the same time
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        with self._lock:
+            input_index = self.input_details['index']
+            if tuple(self.input_details['shape']) != batch.shape:
+                self.interpreter.resize_tensor_input(input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+                self.input_details = self.interpreter.get_input_details()[0]
+                self.output_details = self.interpreter.get_output_details()[0]
+
+            self.interpreter.set_tensor(input_index, self._quantize(batch, self.input_details))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_details['index'])
+
+        return self._dequantize(output, self.output_details)
+
+    @staticmethod
+    def _quantize(batch, details):
+        scale, zero_point = details['quantization']
+        dtype = details['dtype']
+        if scale == 0:
+            return batch.astype(dtype, copy=False)
+
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+    @staticmethod
+    def _dequantize(output, details):
+        scale, zero_point = details['quantization']
+        if scale == 0:
+            return output.astype(np.float32, copy=False)
+
+        return (output.astype(np.float32) - zero_point) * scale
+
+    @property
+    def nbytes(self):
+        return os.path.getsize(self.model_path)
+
+    def __repr__(self):
+        return f'TFLiteBackend(model_path={self.model_path})'
+
+
+BACKENDS = {backend.name: backend for backend in (KerasBackend, OnnxBackend, TFLiteBackend)}
+
+
+def get_backend(name='keras', **kwargs):
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Backend {name} not supported! Only {set(BACKENDS)} are supported") from None
+
+    return backend_class(**kwargs)
+
+
+def compare_backends(reference, candidates, batch, repeat=20):
+    """
+    Parity and speed check of candidate backends against a reference backend on the same batch.
+
+    For every backend returns the mean seconds per predict call, and for candidates also the maximum absolute
+    difference of the probabilities and the fraction of faces with the same predicted label as the reference
+    """
+    def timed(backend):
+        backend.predict(batch)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            output = backend.predict(batch)
+        return output, (time.perf_counter() - start) / repeat
+
+    expected, reference_time = timed(reference)
+    report = {repr(reference): {'predict_s': reference_time}}
+
+    for candidate in candidates:
+        output, candidate_time = timed(candidate)
+        report[repr(candidate)] = {
+            'predict_s': candidate_time,
+            'max_abs_diff': float(np.max(np.abs(output - expected))),
+            'label_agreement': float(np.mean(np.argmax(output, axis=1) == np.argmax(expected, axis=1))),
+        }
+
+    return report
@@ -0,0 +1,226 @@
+"""
+Throughput and accuracy benchmark of the emotion recognition pipeline.
+
+Every image goes through the same stages as emotion.detect_emotions, timed separately: decode, resize, grayscale,
+cascade, crop, predict and annotate. The report has per-stage timings, faces/sec, p50/p95/p99 latency per image
+and peak RSS (with --trace-allocations, also the memory allocated while processing each image). Detected faces and
+labels are compared with golden outputs stored by a previous run, so that any backend or preprocessing change can
+be judged on the same inputs:
+
+    python benchmark.py --update-golden                      # record golden outputs with the current pipeline
+    python benchmark.py --backend onnx --synthetic 200       # compare another backend, on more images
+"""
+import argparse
+import collections
+import json
+import os
+import resource
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from emotion import (FRAME_SIZE, annotate_faces, classify_faces, crop_faces, decode_image, detect_faces,
+                     get_face_batch, get_frame_buffers, preprocess_stats)
+from face_tracker import iou
+from model_registry import registry
+
+
+STAGES = ('decode', 'resize', 'grayscale', 'cascade', 'crop', 'predict', 'annotate')
+GOLDEN_PATH = 'benchmarks/golden.json'
+
+
+def load_images(image_dir):
+    """
+    Encoded bytes of every image in image_dir, so that decoding is part of what is measured. Files that can't be
+    decoded are skipped
+    """
+    images = {}
+    for filename in sorted(os.listdir(image_dir)):
+        path = os.path.join(image_dir, filename)
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            if data and decode_image(data) is not None:
+                images[filename] = data
+    return images
+
+
+def synthetic_images(images, n, seed=0):
+    """
+    n deterministic variants of the given images: different resolutions, mirroring and brightness, re-encoded as
+    JPEG. The same seed always produces the same set, so synthetic images can have golden outputs too
+    """
+    rng = np.random.default_rng(seed)
+    sources = [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) for data in images.values()]
+    resolutions = [(640, 480), (1280, 720), (1920, 1080)]
+
+    variants = {}
+    for i in range(n):
+        img = sources[i % len(sources)]
+        img = cv2.resize(img, resolutions[rng.integers(len(resolutions))])
+        if rng.random() < 0.5:
+            img = img[:, ::-1]
+        img = cv2.convertScaleAbs(img, alpha=rng.uniform(0.7, 1.3), beta=rng.uniform(-20, 20))
+        variants[f'synthetic_{i:05d}.jpg'] = cv2.imencode('.jpg', img)[1].tobytes()
+
+    return variants
+
+
+def run_pipeline(data, emotion_model, face_detector, timings, annotate=True, detection_scale=1.0):
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings[stage].append(time.perf_counter() - start)
+        return result
+
+    buffers = get_frame_buffers()
+    img = timed('decode', decode_image, data)
+    # same buffers as emotion.detect_emotions: only the annotated frame, which is an output, is allocated
+    frame = np.empty((FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8) if annotate else None
+    # resize and grayscale run in a single call on the reusable buffers, which times the two steps itself
+    gray_frame = buffers.to_gray(img, frame)
+    for stage, seconds in buffers.last_timings.items():
+        timings[stage].append(seconds)
+    faces = timed('cascade', detect_faces, gray_frame, face_detector, detection_scale)
+    batch = timed('crop', crop_faces, gray_frame, faces, get_face_batch().reserve(len(faces)))
+    predictions = timed('predict', classify_faces, emotion_model, batch)
+
+    results = [{'bbox': [int(v) for v in bbox], 'label': int(np.argmax(probabilities)),
+                'probabilities': probabilities}
+               for bbox, probabilities in zip(faces, predictions)]
+    if annotate:
+        timed('annotate', annotate_faces, frame, results)
+
+    return results
+
+
+def compare_with_golden(outputs, golden, iou_threshold=0.5):
+    """
+    Faces of the golden outputs are matched with the current ones by box overlap. Returns how many golden faces
+    were found again, how many of those kept their label, and the images that differ
+    """
+    golden_faces = matched = same_label = 0
+    differing = []
+    for name, expected in golden.items():
+        if name not in outputs:
+            continue
+
+        actual = outputs[name]
+        image_ok = len(actual) == len(expected)
+        for expected_face in expected:
+            golden_faces += 1
+            candidates = [face for face in actual if iou(face['bbox'], expected_face['bbox']) >= iou_threshold]
+            if not candidates:
+                image_ok = False
+                continue
+            matched += 1
+            best = max(candidates, key=lambda face: iou(face['bbox'], expected_face['bbox']))
+            if best['label'] == expected_face['label']:
+                same_label += 1
+            else:
+                image_ok = False
+
+        if not image_ok:
+            differing.append(name)
+
+    return {
+        'golden_faces': golden_faces,
+        'face_recall': matched / golden_faces if golden_faces else None,
+        'label_agreement': same_label / matched if matched else None,
+        'differing_images': differing,
+    }
+
+
+def run_benchmark(images, backend=None, annotate=True, repeat=1, detection_scale=1.0, trace_allocations=False):
+    emotion_model = registry.get_emotion_model(backend)
+    face_detector = registry.get_face_detector()
+    # first call outside of the measures: graph building and lazy allocations are not what is benchmarked
+    classify_faces(emotion_model, np.zeros((1, 48, 48, 1), dtype=np.float32))
+
+    timings = collections.defaultdict(list)
+    latencies = []
+    allocated = []
+    outputs = {}
+    n_faces = 0
+
+    if trace_allocations:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name, data in images.items():
+            if trace_allocations:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            image_start = time.perf_counter()
+            results = run_pipeline(data, emotion_model, face_detector, timings, annotate, detection_scale)
+            latencies.append(time.perf_counter() - image_start)
+            if trace_allocations:
+                allocated.append(tracemalloc.get_traced_memory()[1] - before)
+            n_faces += len(results)
+            outputs[name] = [{'bbox': result['bbox'], 'label': result['label']} for result in results]
+    elapsed = time.perf_counter() - start
+    if trace_allocations:
+        tracemalloc.stop()
+
+    report = {
+        'backend': repr(emotion_model),
+        'detection_scale': detection_scale,
+        'images': len(latencies),
+        'faces': n_faces,
+        'images_per_s': len(latencies) / elapsed,
+        'faces_per_s': n_faces / elapsed,
+        'latency_ms': {f'p{q}': float(np.percentile(latencies, q)) * 1000 for q in (50, 95, 99)},
+        'stage_mean_ms': {stage: float(np.mean(timings[stage])) * 1000 for stage in STAGES if timings[stage]},
+        # ru_maxrss is expressed in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'preprocess': preprocess_stats(),
+    }
+    if trace_allocations:
+        # numpy and OpenCV arrays are allocated through numpy, so tracemalloc sees them. Timings are slower when tracing
+        report['allocated_kb_per_image'] = float(np.mean(allocated)) / 1024
+
+    return report, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the emotion recognition pipeline")
+    parser.add_argument('--images', default='images')
+    parser.add_argument('--synthetic', type=int, default=0, help="number of synthetic variants added to the images")
+    parser.add_argument('--backend', default=None, help="keras, onnx or tflite (default: EMOTION_BACKEND)")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--detection-scale', type=float, default=1.0)
+    parser.add_argument('--no-annotate', action='store_true')
+    parser.add_argument('--trace-allocations', action='store_true', help="measure the memory allocated per image")
+    parser.add_argument('--golden', default=GOLDEN_PATH)
+    parser.add_argument('--update-golden', action='store_true', help="store this run as the golden outputs")
+    parser.add_argument('--output', help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        parser.error(f"no decodable image found in {args.images}")
+    if args.synthetic:
+        images.update(synthetic_images(images, args.synthetic))
+
+    report, outputs = run_benchmark(images, args.backend, not args.no_annotate, args.repeat, args.detection_scale,
+                                    args.trace_allocations)
+
+    if args.update_golden:
+        os.makedirs(os.path.dirname(args.golden) or '.', exist_ok=True)
+        with open(args.golden, 'w') as f:
+            json.dump(outputs, f, indent=1, sort_keys=True)
+    elif os.path.exists(args.golden):
+        with open(args.golden) as f:
+            report['golden'] = compare_with_golden(outputs, json.load(f))
+
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Offline emotion -> track catalog. The builder snapshots candidate tracks for every emotion label into a small
+SQLite file; serving loads the file once into memory and samples from it, so recommendations never wait on the
+remote search API.
+
+    python catalog.py build --pages 5
+    python catalog.py sample Happy
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+
+CATALOG_PATH = os.environ.get('TRACK_CATALOG_PATH', 'data/track_catalog.sqlite')
+
+logger = logging.getLogger(__name__)
+
+
+def build_catalog(emotions, path=CATALOG_PATH, pages=5, page_size=50, client=None):
+    """
+    Searches every emotion label and stores up to `pages * page_size` candidate tracks for each one.
+
+    The catalog is written to a temporary file that replaces the old one only once complete, so readers never see a
+    half-built catalog. Returns the number of tracks stored
+    """
+    if client is None:
+        from main import get_spotify_client
+        client = get_spotify_client()
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute('CREATE TABLE tracks (emotion TEXT, rank INTEGER, url TEXT, name TEXT, artist TEXT, '
+                     'popularity INTEGER, PRIMARY KEY (emotion, url))')
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+
+        n_tracks = 0
+        for emotion in emotions:
+            rank = 0
+            for page in range(pages):
+                results = client.search(q=emotion, type='track', limit=page_size, offset=page * page_size)
+                items = results['tracks']['items']
+                rows = []
+                for item in items:
+                    artists = item.get('artists') or [{}]
+                    rows.append((emotion, rank, item['external_urls']['spotify'], item.get('name'),
+                                 artists[0].get('name'), item.get('popularity', 0)))
+                    rank += 1
+                n_tracks += conn.executemany('INSERT OR IGNORE INTO tracks VALUES (?, ?, ?, ?, ?, ?)',
+                                             rows).rowcount
+                if len(items) < page_size:
+                    break
+
+        conn.execute("INSERT INTO meta VALUES ('built_at', ?)", (str(time.time()),))
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, path)
+    return n_tracks
+
+
+class TrackCatalog:
+    """
+    In-memory view of the catalog file: one tuple of track links per emotion, ordered by search rank.
+    The file is reloaded when it changes on disk (e.g. after a background refresh)
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self._tracks = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+
+        if mtime == self._mtime:
+            return False
+
+        with self._lock:
+            tracks = {}
+            conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            try:
+                for emotion, url in conn.execute('SELECT emotion, url FROM tracks ORDER BY emotion, rank'):
+                    tracks.setdefault(emotion, []).append(url)
+            finally:
+                conn.close()
+
+            self._tracks = {emotion: tuple(urls) for emotion, urls in tracks.items()}
+            self._mtime = mtime
+
+        return True
+
+    def __contains__(self, emotion):
+        return emotion in self._tracks
+
+    def __len__(self):
+        return sum(len(urls) for urls in self._tracks.values())
+
+    def top(self, emotion, k=10):
+        return list(self._tracks.get(emotion, ())[:k])
+
+    def sample(self, emotion, k=10, rng=random):
+        """
+        k tracks drawn at random among the candidates of emotion, so that repeated requests don't always get the
+        same list
+        """
+        urls = self._tracks.get(emotion, ())
+        return rng.sample(urls, min(k, len(urls)))
+
+
+_catalog = None
+_refresh_thread = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(path=CATALOG_PATH):
+    """
+    The catalog shared by the process, or None when no catalog file has been built yet
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None and os.path.exists(path):
+                _catalog = TrackCatalog(path)
+    return _catalog
+
+
+def start_background_refresh(emotions, interval=24 * 60 * 60, path=CATALOG_PATH, retry_delay=60,
+                             max_retry_delay=60 * 60, **build_kwargs):
+    """
+    Rebuilds the catalog every `interval` seconds in a daemon thread (once per process) and reloads it in place.
+    A failed rebuild is logged and keeps serving the previous catalog; it is tried again after `retry_delay`
+    seconds, doubled after each new failure up to `max_retry_delay`, rather than after a whole interval
+    """
+    global _refresh_thread
+
+    def refresh():
+        delay = retry_delay
+        while True:
+            try:
+                if not os.path.exists(path) or time.time() - os.path.getmtime(path) >= interval:
+                    build_catalog(emotions, path, **build_kwargs)
+                catalog = get_catalog(path)
+                if catalog is not None:
+                    catalog.reload()
+            except Exception:
+                logger.exception("Track catalog refresh failed, retrying in %ss", delay)
+                time.sleep(delay)
+                delay = min(2 * delay, max_retry_delay)
+                continue
+
+            delay = retry_delay
+            time.sleep(interval)
+
+    with _catalog_lock:
+        if _refresh_thread is None:
+            _refresh_thread = threading.Thread(target=refresh, daemon=True, name='catalog_refresh')
+            _refresh_thread.start()
+
+    return _refresh_thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the offline emotion -> track catalog")
+    parser.add_argument('--path', default=CATALOG_PATH)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build')
+    build.add_argument('--pages', type=int, default=5)
+    build.add_argument('--page-size', type=int, default=50)
+    sample = subparsers.add_parser('sample')
+    sample.add_argument('emotion')
+    sample.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        from emotion_labels import emotion_dict
+
+        start = time.perf_counter()
+        n_tracks = build_catalog(emotion_dict.values(), args.path, args.pages, args.page_size)
+        print(f'{n_tracks} tracks stored in {args.path} in {time.perf_counter() - start:.1f}s')
+    else:
+        catalog = TrackCatalog(args.path)
+        start = time.perf_counter()
+        tracks = catalog.sample(args.emotion, args.k)
+        elapsed = time.perf_counter() - start
+        print('\n'.join(tracks))
+        print(f'sampled in {elapsed * 1e6:.1f} us')
+
+
+if __name__ == '__main__':
+    main()
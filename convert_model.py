@@ -0,0 +1,104 @@
+"""
+Offline conversion of the Keras emotion model (model/emotion_model.json + model/emotion_model.h5) to ONNX and to
+float16 / int8 quantized TFLite, followed by a parity and speed check of every backend against Keras.
+
+    python convert_model.py --images images/
+    python convert_model.py --check-only --images images/
+
+Needs tensorflow and tf2onnx at conversion time only; the converted models are then served by onnxruntime or
+tflite-runtime without importing TensorFlow.
+"""
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+from backends import (MODEL_JSON_PATH, MODEL_WEIGHTS_PATH, ONNX_MODEL_PATH, TFLITE_MODEL_PATHS, KerasBackend,
+                      OnnxBackend, TFLiteBackend, compare_backends)
+from face_tracker import detect_faces_downscaled
+from model_registry import CASCADE_PATH
+
+
+def load_sample_faces(image_dir, limit=256):
+    """
+    Face crops found in the images of image_dir, as a `(n, 48, 48, 1)` float32 batch. Images where the cascade finds
+    no face contribute their whole gray frame, so that the check still has inputs on non-face images
+    """
+    face_detector = cv2.CascadeClassifier(CASCADE_PATH)
+    crops = []
+    for filename in sorted(os.listdir(image_dir)):
+        img = cv2.imread(os.path.join(image_dir, filename))
+        if img is None:
+            continue
+
+        gray_frame = cv2.cvtColor(cv2.resize(img, (1280, 720)), cv2.COLOR_BGR2GRAY)
+        faces = detect_faces_downscaled(gray_frame, face_detector, scale=1.0)
+        if len(faces) == 0:
+            crops.append(cv2.resize(gray_frame, (48, 48)))
+        for x, y, w, h in faces:
+            crops.append(cv2.resize(gray_frame[y:y + h, x:x + w], (48, 48)))
+
+    if not crops:
+        raise FileNotFoundError(f"No images found in {image_dir}")
+
+    return np.stack(crops[:limit]).astype(np.float32)[..., np.newaxis]
+
+
+def convert_to_onnx(keras_model, output_path=ONNX_MODEL_PATH, opset=13):
+    import tensorflow as tf
+    import tf2onnx
+
+    input_signature = [tf.TensorSpec((None, 48, 48, 1), tf.float32, name='input')]
+    tf2onnx.convert.from_keras(keras_model, input_signature=input_signature, opset=opset, output_path=output_path)
+
+
+def convert_to_tflite(keras_model, quantization, sample_faces, output_path=None):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        def representative_dataset():
+            for face in sample_faces:
+                yield [face[np.newaxis]]
+
+        # full integer model: raw 0-255 pixels map exactly onto uint8, so the input needs no rescaling
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.uint8
+        converter.inference_output_type = tf.uint8
+    else:
+        raise ValueError(f"Quantization {quantization} not supported! Only {set(TFLITE_MODEL_PATHS)} are supported")
+
+    with open(output_path or TFLITE_MODEL_PATHS[quantization], 'wb') as f:
+        f.write(converter.convert())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the Keras emotion model and check backend parity")
+    parser.add_argument('--json', default=MODEL_JSON_PATH)
+    parser.add_argument('--weights', default=MODEL_WEIGHTS_PATH)
+    parser.add_argument('--images', default='images', help="images used for calibration and parity check")
+    parser.add_argument('--check-only', action='store_true', help="skip conversion, only run the parity check")
+    args = parser.parse_args()
+
+    sample_faces = load_sample_faces(args.images)
+    reference = KerasBackend(args.json, args.weights)
+
+    if not args.check_only:
+        convert_to_onnx(reference.model)
+        for quantization in TFLITE_MODEL_PATHS:
+            convert_to_tflite(reference.model, quantization, sample_faces)
+
+    candidates = [OnnxBackend()] + [TFLiteBackend(quantization) for quantization in TFLITE_MODEL_PATHS]
+    report = compare_backends(reference, candidates, sample_faces)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == '__main__':
+    main()
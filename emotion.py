@@ -0,0 +1,233 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from emotion_labels import emotion_dict
+from face_tracker import detect_faces_downscaled
+from model_registry import registry
+
+
+FRAME_SIZE = (1280, 720)
+FACE_SIZE = (48, 48)
+
+_buffers_lock = threading.Lock()
+_all_buffers = []
+
+
+class FaceBatch:
+    """
+    Preallocated `(capacity, 48, 48, 1)` model input. Face crops are resized straight into it, and the buffer only
+    grows (doubling) when a frame has more faces than ever seen before.
+    """
+
+    def __init__(self, capacity=8):
+        self.buffer = np.empty((capacity, *FACE_SIZE, 1), dtype=np.float32)
+        self.allocations = 1
+
+    def reserve(self, n_faces, keep=0):
+        """
+        View of the first n_faces rows. When the buffer has to grow, its first `keep` rows are carried over
+        """
+        if n_faces > len(self.buffer):
+            capacity = len(self.buffer)
+            while capacity < n_faces:
+                capacity *= 2
+            buffer = np.empty((capacity, *FACE_SIZE, 1), dtype=np.float32)
+            buffer[:keep] = self.buffer[:keep]
+            self.buffer = buffer
+            self.allocations += 1
+
+        return self.buffer[:n_faces]
+
+
+class FrameBuffers:
+    """
+    Reusable buffers for one frame at FRAME_SIZE: the resized colour frame and its grayscale version. A frame is
+    resized into `frame` and converted to grayscale once, at that resolution, into `gray`, so preprocessing doesn't
+    allocate anything once the buffers exist. `allocations` counts the buffers created, `frames` and `seconds` the
+    frames converted and the time spent on them. `last_timings` has the seconds spent by the resize and grayscale
+    steps of the last frame
+    """
+
+    def __init__(self, size=FRAME_SIZE):
+        self.size = size
+        self.frame = None
+        self.gray = np.empty((size[1], size[0]), dtype=np.uint8)
+        self.allocations = 1
+        self.frames = 0
+        self.seconds = 0.0
+        self.last_timings = {'resize': 0.0, 'grayscale': 0.0}
+
+    def resize(self, img, out=None):
+        """
+        img resized to FRAME_SIZE into out, or into the reusable `frame` buffer when out is None
+        """
+        if out is None:
+            if self.frame is None:
+                self.frame = np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+                self.allocations += 1
+            out = self.frame
+        return cv2.resize(img, self.size, dst=out)
+
+    def to_gray(self, img, frame=None):
+        """
+        Grayscale version of img at FRAME_SIZE, written to `gray`. A colour image is first resized into frame (see
+        `resize`), a gray one (e.g. from `decode_image(data, gray=True)`) is resized straight into `gray`
+        """
+        start = time.perf_counter()
+        if img.ndim == 2:
+            cv2.resize(img, self.size, dst=self.gray)
+            resized = time.perf_counter()
+            if frame is not None:
+                cv2.cvtColor(self.gray, cv2.COLOR_GRAY2BGR, dst=frame)
+        else:
+            resized_img = self.resize(img, frame)
+            resized = time.perf_counter()
+            cv2.cvtColor(resized_img, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        end = time.perf_counter()
+
+        self.last_timings['resize'] = resized - start
+        self.last_timings['grayscale'] = end - resized
+        self.frames += 1
+        self.seconds += end - start
+        return self.gray
+
+
+# one batch buffer per thread, so that concurrent callers never overwrite each other's crops
+_face_batches = threading.local()
+
+
+def get_face_batch():
+    batch = getattr(_face_batches, 'batch', None)
+    if batch is None:
+        batch = _face_batches.batch = FaceBatch()
+        with _buffers_lock:
+            _all_buffers.append(batch)
+    return batch
+
+
+def get_frame_buffers():
+    buffers = getattr(_face_batches, 'frame_buffers', None)
+    if buffers is None:
+        buffers = _face_batches.frame_buffers = FrameBuffers()
+        with _buffers_lock:
+            _all_buffers.append(buffers)
+    return buffers
+
+
+def preprocess_stats():
+    """
+    Buffers allocated by the preprocessing of every thread so far, and the mean preprocessing time per frame. The
+    number of allocations should stay flat while frames are processed
+    """
+    with _buffers_lock:
+        frame_buffers = [buffers for buffers in _all_buffers if isinstance(buffers, FrameBuffers)]
+        frames = sum(buffers.frames for buffers in frame_buffers)
+        return {
+            'frames': frames,
+            'buffer_allocations': sum(buffers.allocations for buffers in _all_buffers),
+            'preprocess_ms_per_frame': sum(buffers.seconds for buffers in frame_buffers) / frames * 1000
+                                       if frames else None,
+        }
+
+
+def decode_image(data, gray=False):
+    """
+    Decodes encoded image bytes (JPEG, PNG...) read through a view of data, without copying it first. With gray=True
+    the decoder outputs grayscale directly, skipping the colour conversion. Returns None when data isn't an image
+    """
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR)
+
+
+def detect_faces(gray_frame, face_detector, scale=1.0):
+    return detect_faces_downscaled(gray_frame, face_detector, scale)
+
+
+def crop_faces(gray_frame, faces, out):
+    for i, (x, y, w, h) in enumerate(faces):
+        out[i, :, :, 0] = cv2.resize(gray_frame[y:y + h, x:x + w], FACE_SIZE)
+
+    return out
+
+
+def classify_faces(emotion_model, batch):
+    if len(batch) == 0:
+        return np.empty((0, 0), dtype=np.float32)
+
+    return emotion_model.predict(batch)
+
+
+def annotate_faces(frame, results):
+    for result in results:
+        x, y, w, h = result['bbox']
+        cv2.rectangle(frame, (x,y-50), (x+w, y+h+10), (0,255,0), 4)
+        cv2.putText(frame, emotion_dict.get(result['label'], ''), (x+5, y-20), cv2.FONT_HERSHEY_SIMPLEX, 1,
+                    (255, 0, 0), 2, cv2.LINE_AA)
+
+    return frame
+
+
+def detect_emotions(imgs, annotate=True, detection_scale=1.0, backend=None):
+    """
+    Runs detection on every image and classifies all faces found, across all images, with a single predict call,
+    made by the given inference backend (default: DEFAULT_BACKEND).
+
+    Returns a list with one `(frame, results)` tuple for each image, where results is a list of
+    `{'bbox': (x, y, w, h), 'label': index in emotion_dict, 'probabilities': array}` with one dict per face.
+    The frame is the annotated copy of the image resized to FRAME_SIZE, or the image itself when annotate is False
+    """
+    start = time.perf_counter()
+    emotion_model = registry.get_emotion_model(backend)
+    face_detector = registry.get_face_detector()
+    buffers = get_frame_buffers()
+    face_batch = get_face_batch()
+
+    # every frame is converted into the same gray buffer, so its faces are cropped before the next one is converted
+    frames = []
+    faces_per_frame = []
+    n_faces = 0
+    for img in imgs:
+        # the annotated frame is returned, so it can't be the reusable buffer
+        frame = np.empty((FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8) if annotate else None
+        gray_frame = buffers.to_gray(img, frame)
+        faces = detect_faces(gray_frame, face_detector, detection_scale)
+
+        batch = face_batch.reserve(n_faces + len(faces), keep=n_faces)
+        crop_faces(gray_frame, faces, batch[n_faces:])
+        n_faces += len(faces)
+
+        frames.append(frame if annotate else img)
+        faces_per_frame.append(faces)
+
+    predictions = classify_faces(emotion_model, face_batch.reserve(n_faces))
+
+    output = []
+    offset = 0
+    for frame, faces in zip(frames, faces_per_frame):
+        results = []
+        for (x, y, w, h), probabilities in zip(faces, predictions[offset:offset + len(faces)]):
+            results.append({'bbox': (int(x), int(y), int(w), int(h)),
+                            'label': int(np.argmax(probabilities)),
+                            'probabilities': probabilities})
+        offset += len(faces)
+
+        if annotate:
+            annotate_faces(frame, results)
+        output.append((frame, results))
+
+    elapsed = time.perf_counter() - start
+    for _ in imgs:
+        registry.record_frame(elapsed / len(imgs))
+
+    return output
+
+
+def detect_emotion(img):
+    return detect_emotions([img])[0]
+
+
+def dominant_face(results):
+    # the largest face is the one closest to the camera, i.e. the user taking the picture
+    return max(results, key=lambda result: result['bbox'][2] * result['bbox'][3])
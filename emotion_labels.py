@@ -0,0 +1,6 @@
+"""
+Labels of the emotion model outputs, kept apart from emotion.py (which imports cv2 and numpy) so that the app can
+show a label without loading either.
+"""
+
+emotion_dict = {0: "Angry", 1: "Disgusted", 2: "Fearful", 4: "Happy", 5: "Sad", 6: "Surprised"}
@@ -0,0 +1,154 @@
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+
+def iou(box_a, box_b):
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / (aw * ah + bw * bh - inter)
+
+
+def detect_faces_downscaled(gray_frame, face_detector, scale=0.5, scaleFactor=1.3, minNeighbors=5,
+                            minSize=None, maxSize=None):
+    """
+    Runs the cascade on a downscaled copy of the frame and maps the boxes found back to full resolution.
+
+    With `scale=0.5` the cascade scans a quarter of the pixels, at the price of missing faces smaller than
+    twice the cascade window (48 pixels for the frontal face cascade), which are too small for the emotion model
+    anyway. minSize and maxSize are expressed in full resolution pixels
+    """
+    if scale != 1:
+        small = cv2.resize(gray_frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    else:
+        small = gray_frame
+
+    kwargs = {}
+    if minSize is not None:
+        kwargs['minSize'] = (int(minSize[0] * scale), int(minSize[1] * scale))
+    if maxSize is not None:
+        kwargs['maxSize'] = (int(maxSize[0] * scale), int(maxSize[1] * scale))
+
+    faces = face_detector.detectMultiScale(small, scaleFactor=scaleFactor, minNeighbors=minNeighbors, **kwargs)
+    if len(faces) == 0:
+        return np.empty((0, 4), dtype=np.int32)
+
+    return np.round(np.asarray(faces) / scale).astype(np.int32)
+
+
+class FaceTracker:
+    """
+    Face detection for video. Every `detect_every` frames (or when no face is being tracked) the whole frame is
+    scanned on a downscaled pyramid level; in between, each known face is only searched in a small window around
+    its last box and only at sizes close to its last size. A face that is not found in its window is dropped until
+    the next full detection picks it up again.
+
+    Args:
+        face_detector: cv2.CascadeClassifier used for both full and windowed detections
+        detect_every: number of frames between two full detections
+        scale: downscaling applied to the frame (or window) before running the cascade
+        search_margin: how much the last box is enlarged, on each side and relative to its size, to build the
+            search window
+    """
+
+    def __init__(self, face_detector, detect_every=10, scale=0.5, search_margin=0.5):
+        self.face_detector = face_detector
+        self.detect_every = detect_every
+        self.scale = scale
+        self.search_margin = search_margin
+
+        self._boxes = []
+        self._frames_since_detection = 0
+
+    def reset(self):
+        self._boxes = []
+        self._frames_since_detection = 0
+
+    def detect(self, gray_frame):
+        if not self._boxes or self._frames_since_detection >= self.detect_every:
+            self._boxes = [tuple(box) for box in detect_faces_downscaled(gray_frame, self.face_detector, self.scale)]
+            self._frames_since_detection = 0
+        else:
+            self._boxes = [box for box in (self._track(gray_frame, box) for box in self._boxes) if box is not None]
+            self._frames_since_detection += 1
+
+        if not self._boxes:
+            return np.empty((0, 4), dtype=np.int32)
+
+        return np.array(self._boxes, dtype=np.int32)
+
+    def _track(self, gray_frame, box):
+        x, y, w, h = box
+        frame_h, frame_w = gray_frame.shape[:2]
+        margin_x, margin_y = int(w * self.search_margin), int(h * self.search_margin)
+
+        x0, y0 = max(x - margin_x, 0), max(y - margin_y, 0)
+        x1, y1 = min(x + w + margin_x, frame_w), min(y + h + margin_y, frame_h)
+
+        # minNeighbors is lowered since the window is known to contain the face and only
+        # sizes within ~30% of the previous one are scanned
+        faces = detect_faces_downscaled(gray_frame[y0:y1, x0:x1], self.face_detector, self.scale,
+                                        scaleFactor=1.1, minNeighbors=3,
+                                        minSize=(int(w * 0.7), int(h * 0.7)), maxSize=(int(w * 1.3), int(h * 1.3)))
+        if len(faces) == 0:
+            return None
+
+        candidates = [(fx + x0, fy + y0, fw, fh) for fx, fy, fw, fh in faces]
+        return max(candidates, key=lambda candidate: iou(candidate, box))
+
+
+def measure_recall(image_dir, cascade_path, scale=0.5, iou_threshold=0.5):
+    """
+    Compares downscaled detection against the original full resolution detection on every image of image_dir.
+    Faces found by the original detector are the reference: recall is the fraction of them that the downscaled
+    detector also finds (with an overlap of at least iou_threshold)
+    """
+    face_detector = cv2.CascadeClassifier(cascade_path)
+
+    reference_faces = found = 0
+    full_time = downscaled_time = 0.0
+    for filename in sorted(os.listdir(image_dir)):
+        img = cv2.imread(os.path.join(image_dir, filename))
+        if img is None:
+            continue
+
+        gray_frame = cv2.cvtColor(cv2.resize(img, (1280, 720)), cv2.COLOR_BGR2GRAY)
+
+        start = time.perf_counter()
+        reference = face_detector.detectMultiScale(gray_frame, scaleFactor=1.3, minNeighbors=5)
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        downscaled = detect_faces_downscaled(gray_frame, face_detector, scale)
+        downscaled_time += time.perf_counter() - start
+
+        reference_faces += len(reference)
+        found += sum(1 for ref_box in reference
+                     if any(iou(ref_box, box) >= iou_threshold for box in downscaled))
+
+    return {
+        'reference_faces': reference_faces,
+        'recall': found / reference_faces if reference_faces else None,
+        'full_detection_s': full_time,
+        'downscaled_detection_s': downscaled_time,
+        'speedup': full_time / downscaled_time if downscaled_time else None,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recall and speed of downscaled detection against full resolution")
+    parser.add_argument('image_dir')
+    parser.add_argument('--cascade', default='haarcascades/haarcascade_frontalface_default.xml')
+    parser.add_argument('--scale', type=float, default=0.5)
+    args = parser.parse_args()
+
+    for key, value in measure_recall(args.image_dir, args.cascade, args.scale).items():
+        print(f'{key}: {value}')
@@ -0,0 +1,124 @@
+"""
+Local stand-in for the Spotify token and search endpoints, serving the canned search result in response.json.
+It allows testing and benchmarking recom_song without network access or credentials:
+
+    python fake_spotify_server.py --port 8765 --delay 0.2      # serve only
+    python fake_spotify_server.py --bench --requests 200       # serve and benchmark recom_song against it
+"""
+import argparse
+import copy
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeSpotifyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, Nagle would delay every keep-alive response by ~40ms
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/api/token':
+            self.server.stats['token'] += 1
+            self._reply({'access_token': 'fake-token', 'token_type': 'Bearer', 'expires_in': 3600})
+        else:
+            self._reply({'error': 'not found'}, status=404)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/v1/search':
+            self.server.stats['search'] += 1
+            time.sleep(self.server.delay)
+
+            query = parse_qs(url.query).get('q', [''])[0]
+            results = copy.deepcopy(self.server.search_response)
+            # make every query return distinct links, so that cache mix-ups would show
+            for item in results['tracks']['items']:
+                item['external_urls']['spotify'] += f'?q={query}'
+            self._reply(results)
+        else:
+            self._reply({'error': 'not found'}, status=404)
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0, delay=0.0, response_path='response.json'):
+    """
+    Starts the fake server in a daemon thread and returns it; `server.server_address` holds the port actually used
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeSpotifyHandler)
+    with open(response_path) as response_file:
+        server.search_response = json.load(response_file)
+    server.delay = delay
+    server.stats = {'token': 0, 'search': 0}
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def benchmark(server, n_requests, emotions=("Angry", "Disgusted", "Fearful", "Happy", "Sad", "Surprised")):
+    import main
+
+    host, port = server.server_address
+    main.SPOTIFY_API_URL = f'http://{host}:{port}/v1/'
+    main.SPOTIFY_TOKEN_URL = f'http://{host}:{port}/api/token'
+    main.reset_spotify_client()
+
+    # plain emotion searches are answered by the offline catalog when one has been built, which would measure
+    # sampling from the catalog instead of the searches against the fake server
+    get_catalog = main.get_catalog
+    main.get_catalog = lambda: None
+    try:
+        for emotion in emotions:
+            main.recom_song(emotion)
+
+        start = time.perf_counter()
+        for i in range(n_requests):
+            main.recom_song(emotions[i % len(emotions)])
+        cached_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(n_requests):
+            main.search_cache.clear()
+            main.recom_song(emotions[i % len(emotions)])
+        uncached_elapsed = time.perf_counter() - start
+    finally:
+        main.get_catalog = get_catalog
+
+    return {
+        'requests': n_requests,
+        'cached_ms_per_request': cached_elapsed / n_requests * 1000,
+        'uncached_ms_per_request': uncached_elapsed / n_requests * 1000,
+        'token_fetches': server.stats['token'],
+        'search_calls': server.stats['search'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake Spotify search server")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds added to every search")
+    parser.add_argument('--bench', action='store_true', help="benchmark recom_song against the server and exit")
+    parser.add_argument('--requests', type=int, default=100)
+    args = parser.parse_args()
+
+    fake_server = start_server(args.port, args.delay)
+    if args.bench:
+        for key, value in benchmark(fake_server, args.requests).items():
+            print(f'{key}: {value}')
+    else:
+        print(f'Serving on http://127.0.0.1:{args.port}, set SPOTIFY_API_URL=http://127.0.0.1:{args.port}/v1/ '
+              f'and SPOTIFY_TOKEN_URL=http://127.0.0.1:{args.port}/api/token')
+        threading.Event().wait()
@@ -0,0 +1,109 @@
+"""
+Import-time profile of the app modules, based on `python -X importtime`.
+
+Each module is imported in a fresh interpreter, so the numbers are cold-start costs. For every module the total
+import time is printed together with the top-level packages that account for most of it:
+
+    python import_profile.py
+    python import_profile.py app emotion main --top 15
+
+Importing app.py only runs its imports, not the script. `--render` also times the first render of app.py (run
+through streamlit's AppTest, before any picture is captured) and lists the heavy packages it imported:
+
+    python import_profile.py --render
+"""
+import argparse
+import collections
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+HEAVY_PACKAGES = ('cv2', 'numpy', 'keras', 'tensorflow', 'onnxruntime', 'spotipy', 'PIL')
+
+# run in a fresh interpreter: streamlit is imported first, so that only the render itself is timed
+RENDER_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=60)
+start = time.perf_counter()
+app.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'errors': [block.value for block in app.exception],
+                  'imported': [name for name in json.loads(sys.argv[2]) if name in sys.modules]}))
+"""
+
+
+def profile_import(module):
+    """
+    Returns the total import time of module and the self time of every imported top-level package, in seconds
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise ImportError(f"Importing {module} failed:\n{completed.stderr.splitlines()[-1]}")
+
+    total = 0.0
+    per_package = collections.Counter()
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+
+        self_us, cumulative_us, indent, name = match.groups()
+        per_package[name.split('.')[0]] += int(self_us) / 1e6
+        # the module asked for is the only one at the outermost nesting level
+        if name == module and len(indent) == 1:
+            total = int(cumulative_us) / 1e6
+
+    return total, per_package
+
+
+def profile_render(script='app.py', runs=5):
+    """
+    Median time of the first render of script over `runs` fresh interpreters, and the heavy packages imported by
+    it. The model warm-up thread is not started (EMOTION_SERVER_URL is set), so only the script thread is measured
+    """
+    env = dict(os.environ, EMOTION_SERVER_URL='http://127.0.0.1:0')
+    results = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-c', RENDER_SCRIPT, os.path.abspath(script),
+                                    json.dumps(HEAVY_PACKAGES)], capture_output=True, text=True, env=env)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Rendering {script} failed:\n{completed.stderr}")
+        results.append(json.loads(completed.stdout.splitlines()[-1]))
+
+    return {
+        'first_render_ms': statistics.median(result['seconds'] for result in results) * 1000,
+        'imported': results[0]['imported'],
+        'errors': results[0]['errors'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import time of the app modules")
+    parser.add_argument('modules', nargs='*', default=['app', 'emotion', 'model_registry', 'main'])
+    parser.add_argument('--top', type=int, default=10, help="number of packages listed for each module")
+    parser.add_argument('--render', action='store_true', help="also time the first render of app.py")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        total, per_package = profile_import(module)
+        print(f'{module}: {total * 1000:.1f} ms')
+        for package, seconds in per_package.most_common(args.top):
+            print(f'    {package:<30} {seconds * 1000:8.1f} ms')
+
+    if args.render:
+        render = profile_render()
+        print(f"first render of app.py: {render['first_render_ms']:.1f} ms, "
+              f"heavy packages imported: {', '.join(render['imported']) or 'none'}")
+        for error in render['errors']:
+            print(f'    exception: {error}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""
+Offline emotion labeling of photo archives (a directory tree or a tar file, possibly compressed).
+
+Images are streamed from the archive and decoded, resized and searched for faces in a thread pool (OpenCV releases
+the GIL). The crops of many images are classified together in large predict calls, and one row per face
+(file, face, bbox, label, probabilities) is appended to a CSV file or to a directory of Parquet parts as batches
+complete. Processed files are logged to `<output>.done`, so an interrupted run started again resumes where it
+stopped:
+
+    python label_archive.py photos.tar.gz labels.csv
+    python label_archive.py photos/ labels.parquet --format parquet --workers 8 --batch-size 1024
+"""
+import argparse
+import collections
+import concurrent.futures
+import csv
+import os
+import tarfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from emotion import (FACE_SIZE, FRAME_SIZE, annotate_faces, classify_faces, crop_faces, decode_image, detect_faces,
+                     emotion_dict, get_face_batch, get_frame_buffers)
+from model_registry import CASCADE_PATH, registry
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+COLUMNS = ['file', 'face', 'x', 'y', 'w', 'h', 'label', 'emotion'] + [f'p{i}' for i in range(7)]
+
+
+def iter_images(source):
+    """
+    `(name, encoded bytes)` of every image of a directory (walked in sorted order) or of a tar file (in archive
+    order, read as a stream so that it is never extracted)
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    with open(path, 'rb') as f:
+                        yield os.path.relpath(path, source), f.read()
+    else:
+        with tarfile.open(source, 'r|*') as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield member.name, archive.extractfile(member).read()
+
+
+def annotated_path(annotate_dir, name):
+    """
+    Path of the annotated copy of the image `name` in annotate_dir. Archive names that would leave annotate_dir
+    (absolute, or going up with `..`) are flattened to their file name
+    """
+    path = os.path.normpath(name)
+    if os.path.isabs(path) or path == os.pardir or path.startswith(os.pardir + os.sep):
+        path = os.path.basename(path)
+    return os.path.join(annotate_dir, path)
+
+
+class LabelWriter:
+    """
+    Appends face rows to a CSV file or to a directory of Parquet parts (one part per flush), and logs the files
+    whose rows have been written so that a new run can skip them
+    """
+
+    def __init__(self, output, output_format='csv'):
+        self.output = output
+        self.output_format = output_format
+        self.checkpoint_path = f'{output.rstrip(os.sep)}.done'
+
+        if output_format == 'parquet':
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError("pyarrow is needed to write Parquet: pip install pyarrow") from None
+            self._pa, self._pq = pyarrow, pyarrow.parquet
+            os.makedirs(output, exist_ok=True)
+            self._part = len([name for name in os.listdir(output) if name.endswith('.parquet')])
+        elif output_format == 'csv':
+            os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+            is_new = not os.path.exists(output) or os.path.getsize(output) == 0
+            self._csv_file = open(output, 'a', newline='')
+            self._csv = csv.writer(self._csv_file)
+            if is_new:
+                self._csv.writerow(COLUMNS)
+        else:
+            raise ValueError(f"Unknown output format {output_format!r}, use csv or parquet")
+
+        self._checkpoint = open(self.checkpoint_path, 'a')
+
+    def processed(self):
+        if not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path) as f:
+            return set(line.rstrip('\n') for line in f)
+
+    def write(self, rows, names):
+        """
+        Writes rows, then marks names as done. A crash between the two only means those files are labeled again
+        """
+        if rows:
+            if self.output_format == 'csv':
+                self._csv.writerows(rows)
+                self._csv_file.flush()
+            else:
+                table = self._pa.Table.from_pylist([dict(zip(COLUMNS, row)) for row in rows])
+                self._pq.write_table(table, os.path.join(self.output, f'part-{self._part:05d}.parquet'))
+                self._part += 1
+
+        self._checkpoint.writelines(f'{name}\n' for name in names)
+        self._checkpoint.flush()
+
+    def close(self):
+        if self.output_format == 'csv':
+            self._csv_file.close()
+        self._checkpoint.close()
+
+
+# the cascade is loaded once per decoding thread rather than shared between threads
+_detectors = threading.local()
+
+
+def _prepare(name, data, detection_scale, annotate):
+    detector = getattr(_detectors, 'detector', None)
+    if detector is None:
+        detector = _detectors.detector = cv2.CascadeClassifier(CASCADE_PATH)
+
+    # without annotation only the grayscale image is needed, and the decoder produces it directly
+    img = decode_image(data, gray=not annotate)
+    if img is None:
+        return name, None, None, None
+
+    frame = np.empty((FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8) if annotate else None
+    gray_frame = get_frame_buffers().to_gray(img, frame)
+    faces = detect_faces(gray_frame, detector, detection_scale)
+    crops = crop_faces(gray_frame, faces, np.empty((len(faces), *FACE_SIZE, 1), dtype=np.float32))
+    return name, faces, crops, frame
+
+
+def label_archive(source, output, output_format='csv', batch_size=256, workers=None, detection_scale=1.0,
+                  annotate_dir=None, backend=None):
+    """
+    Labels every image of source not labeled yet in output. Crops are classified once at least batch_size faces
+    are waiting. With annotate_dir, annotated frames are also written there (this is slower).
+
+    Returns counts of the images and faces processed in this run, of the images skipped (already done) or not
+    decodable, and the throughput
+    """
+    emotion_model = registry.get_emotion_model(backend)
+    writer = LabelWriter(output, output_format)
+    done = writer.processed()
+    annotate = annotate_dir is not None
+    counts = collections.Counter()
+    workers = workers or os.cpu_count() or 1
+
+    pending = []
+    n_pending_faces = 0
+
+    def flush():
+        nonlocal pending, n_pending_faces
+        batch = get_face_batch().reserve(n_pending_faces)
+        offset = 0
+        for _, faces, crops, _ in pending:
+            batch[offset:offset + len(faces)] = crops
+            offset += len(faces)
+        predictions = classify_faces(emotion_model, batch)
+
+        rows = []
+        offset = 0
+        for name, faces, _, frame in pending:
+            results = []
+            for i, ((x, y, w, h), probabilities) in enumerate(zip(faces, predictions[offset:offset + len(faces)])):
+                label = int(np.argmax(probabilities))
+                rows.append([name, i, int(x), int(y), int(w), int(h), label, emotion_dict.get(label, '')]
+                            + [float(p) for p in probabilities])
+                results.append({'bbox': (int(x), int(y), int(w), int(h)), 'label': label})
+            offset += len(faces)
+
+            if annotate:
+                path = annotated_path(annotate_dir, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                cv2.imwrite(path, annotate_faces(frame, results))
+
+        writer.write(rows, [name for name, _, _, _ in pending])
+        counts['images'] += len(pending)
+        counts['faces'] += len(rows)
+        pending, n_pending_faces = [], 0
+
+    start = time.perf_counter()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            # a bounded window of images is decoded ahead, in order, so memory doesn't grow with the archive
+            in_flight = collections.deque()
+            images = iter_images(source)
+            exhausted = False
+            while not exhausted or in_flight:
+                while not exhausted and len(in_flight) < 4 * workers:
+                    item = next(images, None)
+                    if item is None:
+                        exhausted = True
+                    elif item[0] in done:
+                        counts['skipped'] += 1
+                    else:
+                        in_flight.append(pool.submit(_prepare, *item, detection_scale, annotate))
+
+                if not in_flight:
+                    continue
+
+                name, faces, crops, frame = in_flight.popleft().result()
+                if faces is None:
+                    counts['undecodable'] += 1
+                    writer.write([], [name])
+                    continue
+
+                pending.append((name, faces, crops, frame))
+                n_pending_faces += len(faces)
+                if n_pending_faces >= batch_size:
+                    flush()
+
+            if pending:
+                flush()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return dict(counts, seconds=elapsed, images_per_s=counts['images'] / elapsed if elapsed else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Label the faces of a photo archive with their emotion")
+    parser.add_argument('source', help="directory or tar file (.tar, .tar.gz, ...)")
+    parser.add_argument('output', help="CSV file, or directory of Parquet parts with --format parquet")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--batch-size', type=int, default=256, help="faces per predict call")
+    parser.add_argument('--workers', type=int, default=None, help="decoding threads (default: one per core)")
+    parser.add_argument('--detection-scale', type=float, default=1.0)
+    parser.add_argument('--annotate-dir', help="also write annotated images to this directory")
+    parser.add_argument('--backend', default=None, help="keras, onnx or tflite (default: EMOTION_BACKEND)")
+    args = parser.parse_args()
+
+    print(label_archive(args.source, args.output, args.format, args.batch_size, args.workers,
+                        args.detection_scale, args.annotate_dir, args.backend))
+
+
+if __name__ == '__main__':
+    main()
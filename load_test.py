@@ -0,0 +1,117 @@
+"""
+Load test of server.py: concurrent clients post images for a fixed duration, for each number of workers given,
+and the throughput and latency of every run are printed side by side to check that the server scales with cores.
+
+    python load_test.py --workers 1 2 4 --clients 16 --duration 20
+    python load_test.py --url http://127.0.0.1:8600          # against a server that is already running
+"""
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+import requests
+
+from benchmark import load_images
+from server import serve
+
+
+def wait_until_healthy(url, timeout=120):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if requests.get(f'{url}/health', timeout=1).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} is not healthy after {timeout}s")
+
+
+def run_load(url, images, clients=8, duration=10.0):
+    payloads = list(images.values())
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(i):
+        session = requests.Session()
+        n = i
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = session.post(f'{url}/detect', data=payloads[n % len(payloads)], timeout=30)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+            n += clients
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_s': len(latencies) / elapsed,
+        'latency_ms': {f'p{q}': float(np.percentile(latencies, q)) * 1000 if latencies else None
+                       for q in (50, 95, 99)},
+        'server': requests.get(f'{url}/metrics', timeout=5).json(),
+    }
+
+
+def _cell(value, width, precision):
+    # values are None when no request succeeded, i.e. exactly when the table is needed to see what went wrong
+    return f'{value:>{width}.{precision}f}' if value is not None else f'{"-":>{width}}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the emotion recognition server")
+    parser.add_argument('--images', default='images')
+    parser.add_argument('--url', help="existing server to test, otherwise one is started for each --workers value")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--max-batch', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    parser.add_argument('--backend', default=None)
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+
+    if args.url:
+        wait_until_healthy(args.url)
+        print(json.dumps(run_load(args.url, images, args.clients, args.duration), indent=4))
+        return
+
+    reports = {}
+    for workers in args.workers:
+        http_server = serve(0, workers=workers, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000,
+                            backend=args.backend)
+        url = f'http://127.0.0.1:{http_server.server_address[1]}'
+        try:
+            wait_until_healthy(url)
+            reports[workers] = run_load(url, images, args.clients, args.duration)
+        finally:
+            http_server.shutdown()
+            http_server.inference.stop()
+
+    print(json.dumps(reports, indent=4))
+    print('workers  req/s    p50 ms   p95 ms   mean batch')
+    for workers, report in reports.items():
+        print(f"{workers:>7}  {_cell(report['requests_per_s'], 7, 1)}  {_cell(report['latency_ms']['p50'], 7, 1)}  "
+              f"{_cell(report['latency_ms']['p95'], 7, 1)}  {_cell(report['server']['mean_batch_size'], 10, 2)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,95 @@
+import os
 import random
 import requests
 import json
+import threading
 
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
+from cachetools import TTLCache
+
+from async_fetch import AsyncFetcher, run_sync
+from catalog import get_catalog
 
 # Replace the values below with your own credentials
 client_id = '159ebc178c6c47edacedca15239cfd9b'
 client_secret = 'aa615c28f70b4c488f5b3365f70a2c32'
 
-# Authenticate with the Spotify API using the client credentials flow
-def recom_song(emotion_inp):
-    auth_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
-    sp = spotipy.Spotify(auth_manager=auth_manager)
+# endpoints can be redirected, e.g. to fake_spotify_server.py for offline tests and benchmarks
+SPOTIFY_API_URL = os.environ.get('SPOTIFY_API_URL', 'https://api.spotify.com/v1/')
+SPOTIFY_TOKEN_URL = os.environ.get('SPOTIFY_TOKEN_URL', 'https://accounts.spotify.com/api/token')
+
+# there are only a handful of emotion labels, so a small cache serves almost every request from memory
+search_cache = TTLCache(maxsize=256, ttl=60 * 60)
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_spotify_client():
+    """
+    Returns the Spotify client shared by every call. It keeps a pooled HTTP session (so connections are reused) and
+    its access token in memory, fetching a new one only when the current one expires
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                # spotipy is only imported when a recommendation is asked for, it is not needed to render the app
+                import spotipy
+                from requests.adapters import HTTPAdapter
+                from spotipy.cache_handler import MemoryCacheHandler
+                from spotipy.oauth2 import SpotifyClientCredentials
+                from urllib3.util.retry import Retry
+
+                session = requests.Session()
+                retry = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+                              allowed_methods=frozenset(['GET', 'POST']))
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+
+                auth_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret,
+                                                        requests_session=session,
+                                                        cache_handler=MemoryCacheHandler())
+                auth_manager.OAUTH_TOKEN_URL = SPOTIFY_TOKEN_URL
+                # fetched here, under the lock, so that concurrent first searches don't each ask for a token
+                auth_manager.get_access_token(as_dict=False)
+
+                client = spotipy.Spotify(auth_manager=auth_manager, requests_session=session)
+                client.prefix = SPOTIFY_API_URL
+                _client = client
+
+    return _client
+
 
+def reset_spotify_client():
+    """
+    Drops the shared client and the cached searches, e.g. after changing SPOTIFY_API_URL or SPOTIFY_TOKEN_URL
+    """
+    global _client
+    with _lock:
+        _client = None
+        search_cache.clear()
+
+
+# Authenticate with the Spotify API using the client credentials flow
+def recom_song(emotion_inp, query=None):
     # Search for playlists or tracks based on an emotion
     emotion = emotion_inp # Replace with the desired emotion
-    results = sp.search(q=emotion, type='track')
+    query = query or emotion
+
+    # plain emotion searches are served from the offline catalog (see catalog.py) when one has been built
+    if query == emotion:
+        catalog = get_catalog()
+        if catalog is not None and emotion in catalog:
+            return catalog.sample(emotion)
+
+    key = (emotion, query)
+    with _lock:
+        tracks = search_cache.get(key)
+    if tracks is not None:
+        return list(tracks)
+
+    results = get_spotify_client().search(q=query, type='track')
     # with open('response.json', 'w') as json_file:
     #     json.dump(results, json_file)
 
@@ -28,5 +101,22 @@ def recom_song(emotion_inp):
     # for playlist in results['playlists']['items']:
     #     tracks += sp.playlist_tracks(playlist['id'], fields='items(track(name,artists(name),album(name),preview_url))')['items']
 
+    with _lock:
+        search_cache[key] = tuple(tracks)
+
     # Print the details of each track
-    return tracks
\ No newline at end of file
+    return tracks
+
+
+def recom_songs(emotions, max_concurrency=8, timeout=10.0):
+    """
+    Track links for several emotions (e.g. one per face in a group photo) as `{emotion: tracks}`. The searches run
+    concurrently, so the whole call takes about as long as the slowest search. An emotion whose search keeps
+    failing maps to the exception raised
+    """
+    async def search_all():
+        # no retries here: the session of the Spotify client already retries transient errors
+        fetcher = AsyncFetcher(max_concurrency=max_concurrency, timeout=timeout, retries=0)
+        return await fetcher.gather({emotion: (recom_song, emotion) for emotion in emotions})
+
+    return run_sync(search_all())
@@ -0,0 +1,124 @@
+import os
+import resource
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from backends import get_backend
+
+
+# inference backend used when none is requested explicitly: keras, onnx or tflite
+DEFAULT_BACKEND = os.environ.get('EMOTION_BACKEND', 'keras')
+CASCADE_PATH = 'haarcascades/haarcascade_frontalface_default.xml'
+
+
+class ModelRegistry:
+    """
+    Keeps one instance of every model and face cascade per process.
+
+    Streamlit re-executes the app script on each rerun but imports other modules only once, so the module level
+    `registry` below is shared by every session served by the same process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._detectors = {}
+        self._load_times = {}
+        self._warm_up_time = None
+        self._warm_up_thread = None
+        self._first_frame_latency = None
+        self._frame_latencies = []
+
+    def get_emotion_model(self, backend=None, **backend_kwargs):
+        """
+        Returns the `InferenceBackend` running the emotion CNN, loading it on first use. backend_kwargs are passed
+        to the backend constructor (e.g. `quantization='float16'` for the tflite backend)
+        """
+        backend = backend or DEFAULT_BACKEND
+        key = (backend, tuple(sorted(backend_kwargs.items())))
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    start = time.perf_counter()
+                    model = get_backend(backend, **backend_kwargs)
+                    self._load_times[f'emotion_model[{backend}]'] = time.perf_counter() - start
+                    self._models[key] = model
+
+        return model
+
+    def get_face_detector(self, cascade_path=CASCADE_PATH):
+        detector = self._detectors.get(cascade_path)
+        if detector is None:
+            with self._lock:
+                detector = self._detectors.get(cascade_path)
+                if detector is None:
+                    start = time.perf_counter()
+                    detector = cv2.CascadeClassifier(cascade_path)
+                    if detector.empty():
+                        raise FileNotFoundError(f"Could not load face cascade from {cascade_path}")
+                    self._load_times['face_detector'] = time.perf_counter() - start
+                    self._detectors[cascade_path] = detector
+
+        return detector
+
+    def warm_up(self, backend=None):
+        """
+        Loads the model of the given backend (default: DEFAULT_BACKEND) and the cascade and runs one dummy
+        prediction, so that graph building is not paid by the first user frame. Calling it again is a no-op.
+        Returns the seconds spent warming up.
+        """
+        if self._warm_up_time is None:
+            start = time.perf_counter()
+            model = self.get_emotion_model(backend)
+            self.get_face_detector()
+            model.predict(np.zeros((1, 48, 48, 1), dtype=np.float32))
+            self._warm_up_time = time.perf_counter() - start
+
+        return self._warm_up_time
+
+    def warm_up_async(self):
+        """
+        Starts `warm_up` in a background thread, once per process, so that the caller can keep rendering
+        """
+        with self._lock:
+            if self._warm_up_thread is None:
+                self._warm_up_thread = threading.Thread(target=self.warm_up, daemon=True)
+                self._warm_up_thread.start()
+
+        return self._warm_up_thread
+
+    def record_frame(self, seconds):
+        with self._lock:
+            if self._first_frame_latency is None:
+                self._first_frame_latency = seconds
+            else:
+                self._frame_latencies.append(seconds)
+                # keep only the most recent frames so that stats reflect the current load
+                del self._frame_latencies[:-1000]
+
+    def stats(self):
+        latencies = sorted(self._frame_latencies)
+        model_bytes = sum(model.nbytes for model in self._models.values())
+
+        stats = {
+            'backends': [repr(model) for model in self._models.values()],
+            'load_times_s': dict(self._load_times),
+            'warm_up_s': self._warm_up_time,
+            'first_frame_latency_s': self._first_frame_latency,
+            'frames': len(latencies),
+            'frame_latency_mean_s': sum(latencies) / len(latencies) if latencies else None,
+            'frame_latency_p95_s': latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+            'model_weights_mb': model_bytes / 2 ** 20,
+            # ru_maxrss is expressed in kilobytes on Linux
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+
+        return stats
+
+
+registry = ModelRegistry()
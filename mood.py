@@ -0,0 +1,98 @@
+"""
+Per-user memory of recent emotions, so that a stable mood doesn't cost a model call for every rerun of the app and
+a search for every click on 'Recommend Music'.
+"""
+import hashlib
+import time
+
+import numpy as np
+
+
+class MoodTracker:
+    """
+    Ring buffer of the last `window` emotion probability vectors of one user, with their exponential moving average
+    (`alpha` is the weight of the newest capture).
+
+    Recommendations are kept with the smoothed emotion they were made for, and only fetched again when the smoothed
+    emotion changes or after `ttl` seconds. The last captured image is remembered by digest, so that the script
+    reruns Streamlit does on every widget interaction don't classify the same picture again
+    """
+
+    def __init__(self, window=10, alpha=0.5, ttl=10 * 60, n_classes=7, clock=time.monotonic):
+        self.alpha = alpha
+        self.ttl = ttl
+        self.clock = clock
+        self.history = np.zeros((window, n_classes), dtype=np.float32)
+        self.timestamps = np.zeros(window)
+        self.count = 0
+        self.smoothed = None
+
+        self._image_digest = None
+        self._image_faces = None
+        self._recommendations = None
+        self._recommended_key = None
+        self._recommended_at = None
+
+    def update(self, probabilities):
+        """
+        Adds the probabilities of a new capture and returns the smoothed label
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        self.history[self.count % len(self.history)] = probabilities
+        self.timestamps[self.count % len(self.history)] = self.clock()
+        self.count += 1
+
+        if self.smoothed is None:
+            self.smoothed = probabilities.copy()
+        else:
+            self.smoothed += self.alpha * (probabilities - self.smoothed)
+
+        return self.label
+
+    @property
+    def label(self):
+        return int(np.argmax(self.smoothed)) if self.smoothed is not None else None
+
+    def recent(self):
+        """
+        Probabilities kept in the ring buffer, oldest first
+        """
+        n = min(self.count, len(self.history))
+        order = np.arange(self.count - n, self.count) % len(self.history)
+        return self.history[order]
+
+    def faces_for(self, image_bytes, detect):
+        """
+        `(faces, is_new)`, the faces detected in image_bytes by `detect(image_bytes)`. The same image as the previous
+        call returns the previous faces, with is_new False, without calling detect. An image without faces is not
+        remembered, so that the faces of the previous image are never returned for it
+        """
+        digest = hashlib.blake2b(image_bytes, digest_size=16).digest()
+        if digest != self._image_digest:
+            faces = detect(image_bytes)
+            if len(faces) != 0:
+                self._image_faces = faces
+                self._image_digest = digest
+            return faces, True
+
+        return self._image_faces, False
+
+    def recommendations(self, fetch, key=None):
+        """
+        Result of `fetch()` for the current smoothed emotion, reused until that emotion changes or the TTL expires.
+        key replaces the smoothed emotion when the recommendations depend on more than it (e.g. a group photo)
+        """
+        key = self.label if key is None else key
+        now = self.clock()
+        if self._recommendations is None or self._recommended_key != key or now - self._recommended_at >= self.ttl:
+            self._recommendations = fetch()
+            self._recommended_key = key
+            self._recommended_at = now
+
+        return self._recommendations
+
+    def invalidate(self):
+        """
+        Forgets the current recommendations, e.g. when some of them failed
+        """
+        self._recommendations = None
@@ -0,0 +1,284 @@
+"""
+Standalone emotion recognition server, so that inference doesn't run in the Streamlit script thread and
+concurrent users are spread over all cores.
+
+A pool of worker processes each holds one loaded model. HTTP requests are grouped by a batcher: a batch is sent to
+the workers as soon as it has `max_batch` images or its oldest image has waited `max_wait` seconds, and the worker
+classifies all the faces of the batch with a single predict call.
+
+    python server.py --workers 4 --port 8600
+
+Endpoints (all on 127.0.0.1):
+
+* `POST /detect`: body is an encoded image (JPEG, PNG...), answer is `{"faces": [{"bbox", "label", "probabilities"}]}`
+* `GET /health`: 200 once every worker has loaded its model
+* `GET /metrics`: request, batch and latency counters
+"""
+import argparse
+import collections
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+
+SERVER_URL = os.environ.get('EMOTION_SERVER_URL')
+
+
+def _worker_main(task_queue, result_queue, backend):
+    from emotion import decode_image, detect_emotions
+    from model_registry import registry
+
+    registry.warm_up(backend)
+    result_queue.put(('ready', os.getpid(), None))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        batch_id, payloads = task
+        try:
+            # nothing is drawn on the frames, so they are decoded to grayscale directly
+            imgs = [decode_image(payload, gray=True) for payload in payloads]
+            valid = [i for i, img in enumerate(imgs) if img is not None]
+            outputs = detect_emotions([imgs[i] for i in valid], annotate=False, backend=backend) if valid else []
+
+            results = [{'error': 'invalid image'} for _ in payloads]
+            for i, (_, faces) in zip(valid, outputs):
+                results[i] = {'faces': [dict(face, probabilities=face['probabilities'].tolist()) for face in faces]}
+        except Exception as e:
+            results = [{'error': repr(e)} for _ in payloads]
+
+        result_queue.put((batch_id, os.getpid(), results))
+
+
+class _Request:
+    __slots__ = ('payload', 'received_at', 'done', 'result')
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.received_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+
+
+class InferenceServer:
+    """
+    Worker pool plus dynamic batcher. `submit` is thread safe and blocks until the result of its image is ready.
+    `worker` is the function run by each worker process, called with `(task_queue, result_queue, backend)`
+    """
+
+    def __init__(self, workers=None, max_batch=16, max_wait=0.01, backend=None, worker=_worker_main):
+        self.n_workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.backend = backend
+
+        context = multiprocessing.get_context('spawn')
+        self._task_queue = context.Queue()
+        self._result_queue = context.Queue()
+        self._workers = [context.Process(target=worker, args=(self._task_queue, self._result_queue, backend),
+                                         daemon=True)
+                         for _ in range(self.n_workers)]
+
+        self._pending = queue.Queue()
+        self._in_flight = {}
+        # at most two batches per worker are queued, the rest waits in _pending where it can still be batched
+        self._slots = threading.Semaphore(2 * self.n_workers)
+        self._batch_ids = itertools.count()
+        self._ready = set()
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._batches = 0
+        self._batched_images = 0
+        self._per_worker = collections.Counter()
+        self._latencies = collections.deque(maxlen=10000)
+        self._started_at = time.perf_counter()
+
+    def start(self):
+        for worker in self._workers:
+            worker.start()
+        threading.Thread(target=self._batch_loop, daemon=True, name='batcher').start()
+        threading.Thread(target=self._result_loop, daemon=True, name='results').start()
+        return self
+
+    def stop(self):
+        for _ in self._workers:
+            self._task_queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+
+    @property
+    def healthy(self):
+        return len(self._ready) == self.n_workers and all(worker.is_alive() for worker in self._workers)
+
+    def submit(self, payload, timeout=30):
+        request = _Request(payload)
+        self._pending.put(request)
+        if not request.done.wait(timeout):
+            raise TimeoutError("No answer from the inference workers")
+        return request.result
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._pending.get()]
+            deadline = batch[0].received_at + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._slots.acquire()
+            batch_id = next(self._batch_ids)
+            with self._lock:
+                self._in_flight[batch_id] = batch
+                self._batches += 1
+                self._batched_images += len(batch)
+            self._task_queue.put((batch_id, [request.payload for request in batch]))
+
+    def _result_loop(self):
+        while True:
+            batch_id, pid, results = self._result_queue.get()
+            if batch_id == 'ready':
+                self._ready.add(pid)
+                continue
+
+            self._slots.release()
+            now = time.perf_counter()
+            with self._lock:
+                batch = self._in_flight.pop(batch_id)
+                self._per_worker[pid] += len(batch)
+                for request, result in zip(batch, results):
+                    self._requests += 1
+                    self._errors += 'error' in result
+                    self._latencies.append(now - request.received_at)
+
+            for request, result in zip(batch, results):
+                request.result = result
+                request.done.set()
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+            def percentile(q):
+                return latencies[int(q * (len(latencies) - 1))] * 1000 if latencies else None
+
+            return {
+                'workers': self.n_workers,
+                'workers_ready': len(self._ready),
+                'requests': self._requests,
+                'errors': self._errors,
+                'requests_per_s': self._requests / (time.perf_counter() - self._started_at),
+                'batches': self._batches,
+                'mean_batch_size': self._batched_images / self._batches if self._batches else None,
+                'queued': self._pending.qsize(),
+                'latency_p50_ms': percentile(0.5),
+                'latency_p95_ms': percentile(0.95),
+                'latency_p99_ms': percentile(0.99),
+                'images_per_worker': {str(pid): count for pid, count in self._per_worker.items()},
+            }
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        if self.path != '/detect':
+            return self._reply({'error': 'not found'}, 404)
+
+        payload = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            result = self.server.inference.submit(payload)
+        except TimeoutError as e:
+            return self._reply({'error': str(e)}, 503)
+
+        self._reply(result, 400 if 'error' in result else 200)
+
+    def do_GET(self):
+        if self.path == '/health':
+            healthy = self.server.inference.healthy
+            self._reply({'status': 'ok' if healthy else 'starting'}, 200 if healthy else 503)
+        elif self.path == '/metrics':
+            self._reply(self.server.inference.metrics())
+        else:
+            self._reply({'error': 'not found'}, 404)
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8600, **server_kwargs):
+    """
+    Starts the worker pool and the HTTP front end on 127.0.0.1:port in a daemon thread and returns the HTTP server
+    (its `inference` attribute is the InferenceServer)
+    """
+    http_server = ThreadingHTTPServer(('127.0.0.1', port), InferenceRequestHandler)
+    http_server.daemon_threads = True
+    http_server.inference = InferenceServer(**server_kwargs).start()
+    threading.Thread(target=http_server.serve_forever, daemon=True, name='http').start()
+    return http_server
+
+
+_session = None
+
+
+def detect_remote(image_bytes, url=None, timeout=30):
+    """
+    Client side of POST /detect, used by the app when EMOTION_SERVER_URL is set. Returns the list of faces, with
+    probabilities as lists
+    """
+    global _session
+    if _session is None:
+        _session = requests.Session()
+
+    response = _session.post(f'{(url or SERVER_URL).rstrip("/")}/detect', data=image_bytes, timeout=timeout)
+    result = response.json()
+    if 'error' in result:
+        raise ValueError(result['error'])
+    return result['faces']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emotion recognition inference server")
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--workers', type=int, default=None, help="default: one per core")
+    parser.add_argument('--max-batch', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    parser.add_argument('--backend', default=None, help="keras, onnx or tflite (default: EMOTION_BACKEND)")
+    args = parser.parse_args()
+
+    http_server = serve(args.port, workers=args.workers, max_batch=args.max_batch,
+                        max_wait=args.max_wait_ms / 1000, backend=args.backend)
+    print(f'Serving {http_server.inference.n_workers} workers on http://127.0.0.1:{args.port}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        http_server.shutdown()
+        http_server.inference.stop()
+
+
+if __name__ == '__main__':
+    main()
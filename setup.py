@@ -1,3 +1,4 @@
+import asyncio
 import setuptools
 from setuptools import setup
 import requests
@@ -43,26 +44,69 @@ def set_up():
 
         )
     
-def get_watch_providers(movie_id):
+TMDB_API_KEY = '15e383204c1b8a09dbfaaa4c01ed7e17'
+TMDB_MOVIE_URL = "https://api.themoviedb.org/3/movie/{}"
+TMDB_WATCH_PROVIDERS_URL = "https://api.themoviedb.org/3/movie/{}/watch/providers"
+
+
+def parse_watch_providers(wp_data):
     try:
-        wp_url = "https://api.themoviedb.org/3/movie/{}/watch/providers?api_key=15e383204c1b8a09dbfaaa4c01ed7e17".format(movie_id)
-        wp_data = requests.get(wp_url).json()['results']
         link = wp_data['US']['link']
         logo_path = "https://image.tmdb.org/t/p/w500"+wp_data['US']['flatrate'][0]['logo_path']
         provider_name = wp_data['US']['flatrate'][0]['provider_name']
         return link, logo_path, provider_name
-    
+
     except:
         link = ''
         logo_path = "https://image.tmdb.org/t/p/w500"+"/9A1JSVmSxsyaBK4SUFsYVqbAYfW.jpg"
         provider_name = "Netflix"
         return link, logo_path, provider_name
-    
-def fetch_poster(movie_id):
-    url = "https://api.themoviedb.org/3/movie/{}?api_key=15e383204c1b8a09dbfaaa4c01ed7e17&language=en-US".format(movie_id)
-    data = requests.get(url).json()
-    poster_path = data["poster_path"]
+
+
+def parse_poster(data):
+    poster_path = data.get("poster_path")
+    if not poster_path:
+        # TMDB answers with a null poster_path for movies without a poster
+        return None
     full_path = "https://image.tmdb.org/t/p/w500/" + poster_path
     return full_path
-        
 
+
+def get_watch_providers(movie_id):
+    try:
+        wp_data = requests.get(TMDB_WATCH_PROVIDERS_URL.format(movie_id), params={'api_key': TMDB_API_KEY}).json()['results']
+    except:
+        wp_data = {}
+    return parse_watch_providers(wp_data)
+    
+def fetch_poster(movie_id):
+    data = requests.get(TMDB_MOVIE_URL.format(movie_id), params={'api_key': TMDB_API_KEY, 'language': 'en-US'}).json()
+    return parse_poster(data)
+
+
+def fetch_movie_details(movie_ids, max_concurrency=8, timeout=5.0):
+    """
+    Poster and watch providers of every movie as `{movie_id: (poster, (link, logo_path, provider_name))}`.
+    All lookups run concurrently, so a page of movies takes about as long as its slowest lookup. A poster that
+    can't be fetched is None, missing providers fall back to the same default as get_watch_providers
+    """
+    from async_fetch import AsyncFetcher, run_sync
+
+    async def fetch_all():
+        fetcher = AsyncFetcher(max_concurrency=max_concurrency, timeout=timeout)
+
+        async def details(movie_id):
+            poster, providers = await asyncio.gather(
+                fetcher.get_json(TMDB_MOVIE_URL.format(movie_id), api_key=TMDB_API_KEY, language='en-US'),
+                fetcher.get_json(TMDB_WATCH_PROVIDERS_URL.format(movie_id), api_key=TMDB_API_KEY),
+                return_exceptions=True)
+
+            poster = None if isinstance(poster, Exception) else parse_poster(poster)
+            providers = parse_watch_providers({} if isinstance(providers, Exception) else providers.get('results', {}))
+            return poster, providers
+
+        # duplicated ids are coalesced by the fetcher, the same movie is never requested twice
+        results = await asyncio.gather(*(details(movie_id) for movie_id in movie_ids))
+        return dict(zip(movie_ids, results))
+
+    return run_sync(fetch_all())
@@ -0,0 +1,288 @@
+import argparse
+import collections
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from emotion import (FACE_SIZE, FRAME_SIZE, annotate_faces, classify_faces, crop_faces, emotion_dict,
+                     get_face_batch, get_frame_buffers)
+from face_tracker import FaceTracker, iou
+from model_registry import registry
+
+
+def put_latest(q, item):
+    """
+    Puts item in a bounded queue, discarding the oldest item when the queue is full so that consumers always work
+    on the most recent frames. Returns the number of items dropped (0 or 1)
+    """
+    try:
+        q.put_nowait(item)
+        return 0
+    except queue.Full:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        q.put_nowait(item)
+        return 1
+
+
+class EmotionSmoother:
+    """
+    Keeps the probabilities of the last `window` frames for every face and averages them, so that a single noisy
+    frame doesn't flip the emotion shown. Faces are matched between frames by bounding box overlap
+    """
+
+    def __init__(self, window=10, iou_threshold=0.3, max_missed=15):
+        self.window = window
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self._tracks = {}
+        self._next_id = 0
+
+    def update(self, results):
+        unmatched = set(self._tracks)
+        for result in results:
+            best_id, best_iou = None, self.iou_threshold
+            for track_id in unmatched:
+                overlap = iou(self._tracks[track_id]['bbox'], result['bbox'])
+                if overlap >= best_iou:
+                    best_id, best_iou = track_id, overlap
+
+            if best_id is None:
+                best_id = self._next_id
+                self._next_id += 1
+                self._tracks[best_id] = {'history': collections.deque(maxlen=self.window)}
+            else:
+                unmatched.discard(best_id)
+
+            track = self._tracks[best_id]
+            track['bbox'] = result['bbox']
+            track['missed'] = 0
+            track['history'].append(result['probabilities'])
+
+            smoothed = np.mean(track['history'], axis=0)
+            result['face_id'] = best_id
+            result['smoothed_probabilities'] = smoothed
+            result['smoothed_label'] = int(np.argmax(smoothed))
+
+        for track_id in unmatched:
+            self._tracks[track_id]['missed'] += 1
+            if self._tracks[track_id]['missed'] > self.max_missed:
+                del self._tracks[track_id]
+
+        return results
+
+
+class FrameStream:
+    """
+    Continuous emotion recognition on a video source (webcam index or video file path).
+
+    Three threads are connected by bounded queues:
+
+    * capture: reads frames from the source
+    * detection: resizes, converts to grayscale, finds faces with a `FaceTracker` and crops them
+    * classification: stacks the crops of every frame waiting in its queue into one batch and runs the model once
+
+    When a stage can't keep up, the oldest frame waiting for it is dropped instead of letting latency grow.
+    Annotated frames and per-face results (with smoothed emotions) are available through `latest()`
+    """
+
+    def __init__(self, source=0, queue_size=2, max_batch_frames=8, window=10, annotate=True,
+                 detect_every=10, detection_scale=0.5):
+        self.source = source
+        self.detect_every = detect_every
+        self.detection_scale = detection_scale
+        self.max_batch_frames = max_batch_frames
+        self.annotate = annotate
+        self.smoother = EmotionSmoother(window=window)
+
+        self._frames = queue.Queue(maxsize=queue_size)
+        self._detections = queue.Queue(maxsize=queue_size)
+        self._results = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+        self._threads = []
+
+        self._lock = threading.Lock()
+        self._dropped = 0
+        self._captured = 0
+        self._processed = 0
+        self._latencies = collections.deque(maxlen=1000)
+        self._started_at = None
+
+    def start(self):
+        registry.warm_up()
+        self._stop.clear()
+        self._finished.clear()
+        self._started_at = time.perf_counter()
+        self._threads = [threading.Thread(target=target, daemon=True)
+                         for target in (self._capture, self._detect, self._classify)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def latest(self, timeout=None):
+        """
+        Returns the next `(frame, results)` produced by the pipeline, or None if nothing arrives within timeout
+        """
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _get(self, q):
+        # poll so that stop() is noticed even when the upstream stage has nothing to give
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def _drop(self, q, item):
+        dropped = put_latest(q, item)
+        if dropped:
+            with self._lock:
+                self._dropped += dropped
+
+    def _capture(self):
+        capture = cv2.VideoCapture(self.source)
+        try:
+            while not self._stop.is_set():
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                self._captured += 1
+                self._drop(self._frames, (time.perf_counter(), frame))
+        finally:
+            capture.release()
+            put_latest(self._frames, None)
+
+    def _detect(self):
+        tracker = FaceTracker(registry.get_face_detector(), self.detect_every, self.detection_scale)
+        buffers = get_frame_buffers()
+        while True:
+            item = self._get(self._frames)
+            if item is None:
+                put_latest(self._detections, None)
+                break
+
+            captured_at, img = item
+            # frame and crops are handed to the classification thread, only the gray frame is a reused buffer
+            frame = np.empty((FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8)
+            gray_frame = buffers.to_gray(img, frame)
+            faces = tracker.detect(gray_frame)
+            crops = crop_faces(gray_frame, faces, np.empty((len(faces), *FACE_SIZE, 1), dtype=np.float32))
+
+            self._drop(self._detections, (captured_at, frame, faces, crops))
+
+    def _classify(self):
+        emotion_model = registry.get_emotion_model()
+        finished = False
+        while not finished:
+            pending = [self._get(self._detections)]
+            # whatever else is already waiting is classified together with the first frame
+            while len(pending) < self.max_batch_frames:
+                try:
+                    pending.append(self._detections.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in pending:
+                finished = True
+                pending = pending[:pending.index(None)]
+
+            batch = get_face_batch().reserve(sum(len(crops) for _, _, _, crops in pending))
+            offset = 0
+            for _, _, _, crops in pending:
+                batch[offset:offset + len(crops)] = crops
+                offset += len(crops)
+
+            predictions = classify_faces(emotion_model, batch)
+
+            offset = 0
+            for captured_at, frame, faces, _ in pending:
+                results = [{'bbox': (int(x), int(y), int(w), int(h)),
+                            'label': int(np.argmax(probabilities)),
+                            'probabilities': probabilities}
+                           for (x, y, w, h), probabilities in zip(faces, predictions[offset:offset + len(faces)])]
+                offset += len(faces)
+
+                results = self.smoother.update(results)
+                if self.annotate:
+                    annotate_faces(frame, [dict(result, label=result['smoothed_label']) for result in results])
+
+                with self._lock:
+                    self._processed += 1
+                    self._latencies.append(time.perf_counter() - captured_at)
+                self._drop(self._results, (frame, results))
+
+        self._finished.set()
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            elapsed = time.perf_counter() - self._started_at if self._started_at is not None else 0
+
+            return {
+                'captured': self._captured,
+                'processed': self._processed,
+                'dropped': self._dropped,
+                'fps': self._processed / elapsed if elapsed else 0.0,
+                'latency_p50_s': latencies[len(latencies) // 2] if latencies else None,
+                'latency_p95_s': latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure sustained FPS and end-to-end latency of the frame stream")
+    parser.add_argument('--source', default='0', help="webcam index or path of a video file")
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--queue-size', type=int, default=2)
+    parser.add_argument('--max-batch-frames', type=int, default=8)
+    parser.add_argument('--detect-every', type=int, default=10)
+    parser.add_argument('--detection-scale', type=float, default=0.5)
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    stream = FrameStream(source, queue_size=args.queue_size, max_batch_frames=args.max_batch_frames,
+                         annotate=False, detect_every=args.detect_every, detection_scale=args.detection_scale)
+
+    with stream:
+        deadline = time.perf_counter() + args.seconds
+        while time.perf_counter() < deadline:
+            output = stream.latest(timeout=1)
+            if output is None and stream.finished:
+                break
+            if output is not None:
+                _, results = output
+                print(', '.join(f"face {result['face_id']}: {emotion_dict.get(result['smoothed_label'], '?')}"
+                                for result in results), end='\r')
+
+    print()
+    for key, value in stream.stats().items():
+        print(f'{key}: {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+import os
+from unittest import TestCase, mock
+
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'app.py')
+
+
+class TestApp(TestCase):
+
+    def test_first_render(self):
+        # with a server url the model isn't warmed up in this process
+        with mock.patch.dict(os.environ, {'EMOTION_SERVER_URL': 'http://127.0.0.1:0'}):
+            app = AppTest.from_file(APP_PATH, default_timeout=30).run()
+
+        # nothing is detected before a picture is captured, and nothing fails either
+        self.assertEqual([], [block.value for block in app.exception])
+        self.assertEqual([], [block.value for block in app.markdown])
+        self.assertEqual(0, len(app.button))
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase, mock
+
+import requests
+
+import async_fetch
+from async_fetch import AsyncFetcher, is_transient, run_sync
+from setup import fetch_movie_details
+
+
+class StubResponse:
+
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+    def json(self):
+        return self.payload
+
+
+class StubSession:
+    """
+    Answers the GET requests of every url with the next response of its list, the last one being repeated
+    """
+
+    def __init__(self, responses, delay=0.0):
+        self.responses = responses
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        with self._lock:
+            self.calls.append(url)
+            n_calls = self.calls.count(url)
+        time.sleep(self.delay)
+
+        response = self.responses[url][min(n_calls, len(self.responses[url])) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class TestAsyncFetcher(TestCase):
+
+    def get_json(self, session, *urls, **fetcher_kwargs):
+        async def fetch_all():
+            fetcher = AsyncFetcher(session=session, backoff=0, **fetcher_kwargs)
+            return await asyncio.gather(*(fetcher.get_json(url) for url in urls), return_exceptions=True)
+
+        return run_sync(fetch_all())
+
+    def test_retry_transient(self):
+        session = StubSession({'a': [StubResponse(503), requests.ConnectionError(), StubResponse(200, {'id': 1})],
+                               'b': [StubResponse(429), StubResponse(200, {'id': 2})]})
+
+        self.assertEqual([{'id': 1}, {'id': 2}], self.get_json(session, 'a', 'b'))
+        self.assertEqual(['a'] * 3, [url for url in session.calls if url == 'a'])
+        self.assertEqual(['b'] * 2, [url for url in session.calls if url == 'b'])
+
+    def test_no_retry_client_error(self):
+        session = StubSession({'a': [StubResponse(404), StubResponse(200, {'id': 1})]})
+
+        result, = self.get_json(session, 'a')
+
+        self.assertIsInstance(result, requests.HTTPError)
+        self.assertEqual(['a'], session.calls)
+
+    def test_retries_exhausted(self):
+        session = StubSession({'a': [StubResponse(500)]})
+
+        result, = self.get_json(session, 'a', retries=2)
+
+        self.assertIsInstance(result, requests.HTTPError)
+        self.assertEqual(3, len(session.calls))
+
+    def test_timeout(self):
+        session = StubSession({'a': [StubResponse(200, {'id': 1})]}, delay=0.2)
+
+        result, = self.get_json(session, 'a', timeout=0.05, retries=1)
+
+        self.assertIsInstance(result, asyncio.TimeoutError)
+        self.assertEqual(2, len(session.calls))
+
+    def test_coalescing(self):
+        session = StubSession({'a': [StubResponse(200, {'id': 1})], 'b': [StubResponse(200, {'id': 2})]}, delay=0.05)
+
+        results = self.get_json(session, 'a', 'b', 'a', 'a')
+
+        self.assertEqual([{'id': 1}, {'id': 2}, {'id': 1}, {'id': 1}], results)
+        self.assertEqual(['a', 'b'], sorted(session.calls))
+
+    def test_gather(self):
+        calls = {'ok': (lambda: 1,), 'failing': (lambda: 1 / 0,)}
+
+        results = run_sync(AsyncFetcher(backoff=0).gather(calls))
+
+        self.assertEqual(1, results['ok'])
+        self.assertIsInstance(results['failing'], ZeroDivisionError)
+
+    def test_is_transient(self):
+        self.assertTrue(is_transient(asyncio.TimeoutError()))
+        self.assertTrue(is_transient(requests.Timeout()))
+        self.assertTrue(is_transient(requests.HTTPError(response=StubResponse(502))))
+        self.assertFalse(is_transient(requests.HTTPError(response=StubResponse(401))))
+        self.assertFalse(is_transient(ValueError()))
+
+
+class TestFetchMovieDetails(TestCase):
+
+    def test_missing_poster(self):
+        async def get_json(fetcher, url, **params):
+            if url.endswith('/providers'):
+                return {'results': {}}
+            return {'poster_path': None if url.endswith('/1') else '/poster.jpg'}
+
+        with mock.patch.object(async_fetch.AsyncFetcher, 'get_json', get_json):
+            details = fetch_movie_details([1, 2])
+
+        self.assertIsNone(details[1][0])
+        self.assertEqual('https://image.tmdb.org/t/p/w500//poster.jpg', details[2][0])
+        self.assertEqual('Netflix', details[1][1][2])
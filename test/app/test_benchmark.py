@@ -0,0 +1,41 @@
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import cv2
+import numpy as np
+
+import benchmark
+from benchmark import load_images, synthetic_images
+
+
+class TestLoadImages(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, data):
+        with open(os.path.join(self.tmp_dir.name, name), 'wb') as f:
+            f.write(data)
+
+    def test_undecodable_skipped(self):
+        image = cv2.imencode('.png', np.full((20, 30, 3), 128, dtype=np.uint8))[1].tobytes()
+        self.write('face.png', image)
+        self.write('notes.txt', b'not an image')
+        self.write('empty.jpg', b'')
+        os.mkdir(os.path.join(self.tmp_dir.name, 'subdir'))
+
+        images = load_images(self.tmp_dir.name)
+
+        self.assertEqual({'face.png': image}, images)
+        self.assertEqual(3, len(synthetic_images(images, 3)))
+
+    def test_no_image(self):
+        self.write('notes.txt', b'not an image')
+
+        with mock.patch('sys.argv', ['benchmark.py', '--images', self.tmp_dir.name, '--synthetic', '5']), \
+                mock.patch('sys.stderr'), self.assertRaises(SystemExit):
+            benchmark.main()
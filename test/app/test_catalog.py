@@ -0,0 +1,124 @@
+import os
+import random
+import tempfile
+import time
+from unittest import TestCase, mock
+
+import catalog
+from catalog import TrackCatalog, build_catalog, start_background_refresh
+
+
+class StubClient:
+    """
+    Search results of `n_tracks` tracks per query, served by pages like the Spotify search API
+    """
+
+    def __init__(self, n_tracks=7, failing=()):
+        self.n_tracks = n_tracks
+        self.failing = set(failing)
+        self.searches = []
+
+    def search(self, q, type, limit, offset):
+        self.searches.append((q, offset))
+        if q in self.failing:
+            raise ConnectionError("search failed")
+
+        items = [{'external_urls': {'spotify': f'https://open.spotify.com/track/{q}{i}'}, 'name': f'{q} {i}',
+                  'artists': [{'name': 'artist'}], 'popularity': i}
+                 for i in range(offset, min(offset + limit, self.n_tracks))]
+        return {'tracks': {'items': items}}
+
+
+class TestTrackCatalog(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'catalog', 'tracks.sqlite')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build(self):
+        client = StubClient(n_tracks=7)
+
+        self.assertEqual(14, build_catalog(['Happy', 'Sad'], self.path, pages=5, page_size=3, client=client))
+        # the third page is not full, so it is the last one searched
+        self.assertEqual([('Happy', 0), ('Happy', 3), ('Happy', 6), ('Sad', 0), ('Sad', 3), ('Sad', 6)],
+                         client.searches)
+        self.assertEqual([self.path.split(os.sep)[-1]], os.listdir(os.path.dirname(self.path)))
+
+    def test_pages(self):
+        build_catalog(['Happy'], self.path, pages=2, page_size=3, client=StubClient(n_tracks=10))
+
+        self.assertEqual(6, len(TrackCatalog(self.path)))
+
+    def test_sample(self):
+        build_catalog(['Happy', 'Sad'], self.path, page_size=50, client=StubClient(n_tracks=20))
+        track_catalog = TrackCatalog(self.path)
+
+        self.assertIn('Happy', track_catalog)
+        self.assertNotIn('Angry', track_catalog)
+        self.assertEqual(40, len(track_catalog))
+        self.assertEqual([f'https://open.spotify.com/track/Happy{i}' for i in range(3)], track_catalog.top('Happy', 3))
+
+        sample = track_catalog.sample('Sad', 5, rng=random.Random(0))
+        self.assertEqual(5, len(set(sample)))
+        self.assertTrue(all(url.startswith('https://open.spotify.com/track/Sad') for url in sample))
+        self.assertEqual(sample, track_catalog.sample('Sad', 5, rng=random.Random(0)))
+        self.assertEqual([], track_catalog.sample('Angry'))
+
+    def test_failed_build(self):
+        build_catalog(['Happy'], self.path, client=StubClient())
+
+        with self.assertRaises(ConnectionError):
+            build_catalog(['Happy', 'Sad'], self.path, client=StubClient(failing=['Sad']))
+
+        # the previous catalog is kept as it was
+        self.assertEqual(7, len(TrackCatalog(self.path)))
+        self.assertNotIn('Sad', TrackCatalog(self.path))
+
+    def test_reload(self):
+        build_catalog(['Happy'], self.path, client=StubClient())
+        track_catalog = TrackCatalog(self.path)
+        self.assertFalse(track_catalog.reload())
+
+        build_catalog(['Happy', 'Sad'], self.path, client=StubClient())
+        os.utime(self.path, (time.time() + 10, time.time() + 10))
+
+        self.assertTrue(track_catalog.reload())
+        self.assertIn('Sad', track_catalog)
+
+    def test_missing_file(self):
+        self.assertEqual(0, len(TrackCatalog(self.path)))
+
+
+class TestBackgroundRefresh(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'tracks.sqlite')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_retry_after_failure(self):
+        client = StubClient(failing=['Happy'])
+
+        def build(emotions, path, **kwargs):
+            try:
+                return build_catalog(emotions, path, client=client)
+            finally:
+                # the first search fails, the following ones succeed
+                client.failing.clear()
+
+        with mock.patch.object(catalog, '_refresh_thread', None), mock.patch.object(catalog, '_catalog', None), \
+                mock.patch.object(catalog, 'build_catalog', build), self.assertLogs(catalog.logger) as logs:
+            start_background_refresh(['Happy'], path=self.path, retry_delay=0.01)
+
+            deadline = time.monotonic() + 5
+            while catalog.get_catalog(self.path) is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            self.assertEqual(7, len(catalog.get_catalog(self.path)))
+
+        self.assertIn('refresh failed', logs.output[0])
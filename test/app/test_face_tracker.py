@@ -0,0 +1,105 @@
+from unittest import TestCase
+
+import numpy as np
+
+from face_tracker import FaceTracker, detect_faces_downscaled, iou
+
+
+class FakeDetector:
+    """
+    Stand-in for cv2.CascadeClassifier that finds the bounding box of the white pixels of the image it is given
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def detectMultiScale(self, img, scaleFactor=1.3, minNeighbors=5, minSize=None, maxSize=None):
+        self.calls.append({'shape': img.shape, 'minSize': minSize, 'maxSize': maxSize})
+        ys, xs = np.nonzero(img == 255)
+        if len(xs) == 0:
+            return ()
+        return np.array([[xs.min(), ys.min(), xs.max() - xs.min() + 1, ys.max() - ys.min() + 1]])
+
+
+def frame_with_faces(*boxes, size=(1280, 720)):
+    frame = np.zeros((size[1], size[0]), dtype=np.uint8)
+    for x, y, w, h in boxes:
+        frame[y:y + h, x:x + w] = 255
+    return frame
+
+
+class TestIoU(TestCase):
+
+    def test_iou(self):
+        self.assertEqual(1.0, iou((10, 10, 20, 20), (10, 10, 20, 20)))
+        self.assertEqual(0.0, iou((0, 0, 10, 10), (10, 0, 10, 10)))
+        self.assertAlmostEqual(50 / 150, iou((0, 0, 10, 10), (5, 0, 10, 10)))
+
+
+class TestDetectFacesDownscaled(TestCase):
+
+    def test_boxes_mapped_to_full_resolution(self):
+        detector = FakeDetector()
+
+        faces = detect_faces_downscaled(frame_with_faces((400, 200, 100, 100)), detector, scale=0.5,
+                                        minSize=(100, 60), maxSize=(300, 200))
+
+        np.testing.assert_array_equal([[400, 200, 100, 100]], faces)
+        # the cascade scans a quarter of the pixels, with sizes expressed at that resolution
+        self.assertEqual([{'shape': (360, 640), 'minSize': (50, 30), 'maxSize': (150, 100)}], detector.calls)
+
+    def test_full_scale(self):
+        detector = FakeDetector()
+
+        faces = detect_faces_downscaled(frame_with_faces((401, 201, 99, 99)), detector, scale=1)
+
+        np.testing.assert_array_equal([[401, 201, 99, 99]], faces)
+        self.assertEqual((720, 1280), detector.calls[0]['shape'])
+
+    def test_no_face(self):
+        faces = detect_faces_downscaled(frame_with_faces(), FakeDetector())
+
+        self.assertEqual((0, 4), faces.shape)
+
+
+class TestFaceTracker(TestCase):
+
+    def setUp(self):
+        self.detector = FakeDetector()
+        self.tracker = FaceTracker(self.detector, detect_every=3, scale=0.5, search_margin=0.5)
+
+    def test_tracking_window(self):
+        np.testing.assert_array_equal([[400, 200, 100, 100]],
+                                      self.tracker.detect(frame_with_faces((400, 200, 100, 100))))
+        self.assertEqual((360, 640), self.detector.calls[-1]['shape'])
+
+        # the face moved: it is searched in a window of twice its size around the last box, at close sizes only
+        np.testing.assert_array_equal([[420, 210, 100, 100]],
+                                      self.tracker.detect(frame_with_faces((420, 210, 100, 100))))
+        self.assertEqual({'shape': (100, 100), 'minSize': (35, 35), 'maxSize': (65, 65)}, self.detector.calls[-1])
+
+    def test_full_detection_every_n_frames(self):
+        frame = frame_with_faces((400, 200, 100, 100))
+
+        for _ in range(9):
+            self.tracker.detect(frame)
+
+        full_detections = [call for call in self.detector.calls if call['shape'] == (360, 640)]
+        self.assertEqual(3, len(full_detections))
+
+    def test_lost_face(self):
+        self.tracker.detect(frame_with_faces((400, 200, 100, 100)))
+
+        # the face left its window: it is dropped, and the next frame is scanned entirely
+        self.assertEqual((0, 4), self.tracker.detect(frame_with_faces((1000, 500, 100, 100))).shape)
+        np.testing.assert_array_equal([[1000, 500, 100, 100]],
+                                      self.tracker.detect(frame_with_faces((1000, 500, 100, 100))))
+        self.assertEqual((360, 640), self.detector.calls[-1]['shape'])
+
+    def test_reset(self):
+        self.tracker.detect(frame_with_faces((400, 200, 100, 100)))
+        self.tracker.reset()
+
+        self.tracker.detect(frame_with_faces((400, 200, 100, 100)))
+
+        self.assertEqual([(360, 640), (360, 640)], [call['shape'] for call in self.detector.calls])
@@ -0,0 +1,92 @@
+import csv
+import io
+import os
+import tarfile
+import tempfile
+from unittest import TestCase
+
+from label_archive import COLUMNS, LabelWriter, annotated_path, iter_images
+
+
+def face_row(name, face=0):
+    return [name, face, 1, 2, 3, 4, 4, 'Happy'] + [0.0] * 7
+
+
+class TestLabelWriter(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp_dir.name, 'labels.csv')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_rows(self):
+        with open(self.output, newline='') as f:
+            return list(csv.reader(f))
+
+    def test_write(self):
+        writer = LabelWriter(self.output)
+        writer.write([face_row('a.jpg'), face_row('a.jpg', 1)], ['a.jpg', 'no_face.jpg'])
+        writer.close()
+
+        rows = self.read_rows()
+        self.assertEqual(COLUMNS, rows[0])
+        self.assertEqual([['a.jpg', '0'], ['a.jpg', '1']], [row[:2] for row in rows[1:]])
+        self.assertEqual(self.output + '.done', writer.checkpoint_path)
+
+    def test_resume(self):
+        writer = LabelWriter(self.output)
+        writer.write([face_row('a.jpg')], ['a.jpg'])
+        writer.close()
+
+        # a new run skips the files already done and appends to the same file, without a second header
+        writer = LabelWriter(self.output)
+        self.assertEqual({'a.jpg'}, writer.processed())
+        writer.write([face_row('b.jpg')], ['b.jpg'])
+        writer.close()
+
+        writer = LabelWriter(self.output)
+        self.assertEqual({'a.jpg', 'b.jpg'}, writer.processed())
+        writer.close()
+        self.assertEqual(['file', 'a.jpg', 'b.jpg'], [row[0] for row in self.read_rows()])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            LabelWriter(self.output, 'xlsx')
+
+
+class TestIterImages(TestCase):
+
+    def test_tar(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tar_path = os.path.join(tmp_dir, 'photos.tar.gz')
+            with tarfile.open(tar_path, 'w:gz') as archive:
+                for name, data in [('photos/a.jpg', b'a'), ('notes.txt', b'n'), ('photos/b.PNG', b'b')]:
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    archive.addfile(info, io.BytesIO(data))
+
+            self.assertEqual([('photos/a.jpg', b'a'), ('photos/b.PNG', b'b')], list(iter_images(tar_path)))
+
+    def test_directory(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, 'b'))
+            for name in ['b/c.jpg', 'a.jpg', 'notes.txt']:
+                with open(os.path.join(tmp_dir, name), 'wb') as f:
+                    f.write(name.encode())
+
+            self.assertEqual([('a.jpg', b'a.jpg'), (os.path.join('b', 'c.jpg'), b'b/c.jpg')],
+                             list(iter_images(tmp_dir)))
+
+
+class TestAnnotatedPath(TestCase):
+
+    def test_inside(self):
+        self.assertEqual(os.path.join('out', 'photos', 'a.jpg'), annotated_path('out', 'photos/a.jpg'))
+        self.assertEqual(os.path.join('out', 'a.jpg'), annotated_path('out', 'photos/../a.jpg'))
+
+    def test_outside(self):
+        self.assertEqual(os.path.join('out', 'x.jpg'), annotated_path('out', '../../x.jpg'))
+        self.assertEqual(os.path.join('out', 'x.jpg'), annotated_path('out', 'photos/../../x.jpg'))
+        self.assertEqual(os.path.join('out', 'x.jpg'), annotated_path('out', '/abs/x.jpg'))
@@ -0,0 +1,108 @@
+from unittest import TestCase
+
+import numpy as np
+
+from mood import MoodTracker
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def one_hot(label, n_classes=7):
+    probabilities = np.zeros(n_classes, dtype=np.float32)
+    probabilities[label] = 1
+    return probabilities
+
+
+class TestMoodTracker(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.mood = MoodTracker(window=3, alpha=0.5, ttl=60, clock=self.clock)
+
+    def test_update(self):
+        self.assertIsNone(self.mood.label)
+
+        self.assertEqual(4, self.mood.update(one_hot(4)))
+        np.testing.assert_array_almost_equal(one_hot(4), self.mood.smoothed)
+
+        # a single different capture halves the weight of the previous mood, but doesn't replace it yet
+        self.assertEqual(4, self.mood.update(0.4 * one_hot(5) + 0.6 * one_hot(4)))
+        np.testing.assert_array_almost_equal(0.2 * one_hot(5) + 0.8 * one_hot(4), self.mood.smoothed)
+
+        self.assertEqual(5, self.mood.update(one_hot(5)))
+        np.testing.assert_array_almost_equal(0.6 * one_hot(5) + 0.4 * one_hot(4), self.mood.smoothed)
+
+    def test_recent(self):
+        for label in range(5):
+            self.mood.update(one_hot(label))
+
+        # only the last `window` captures are kept, oldest first
+        np.testing.assert_array_equal([one_hot(2), one_hot(3), one_hot(4)], self.mood.recent())
+
+    def test_faces_for(self):
+        detected = []
+
+        def detect(image_bytes):
+            detected.append(image_bytes)
+            return [] if image_bytes == b'no face' else [{'label': len(detected)}]
+
+        self.assertEqual(([{'label': 1}], True), self.mood.faces_for(b'first', detect))
+        self.assertEqual(([{'label': 1}], False), self.mood.faces_for(b'first', detect))
+        self.assertEqual(([{'label': 2}], True), self.mood.faces_for(b'second', detect))
+        self.assertEqual([b'first', b'second'], detected)
+
+    def test_faces_for_no_face(self):
+        def detect(image_bytes):
+            return [] if image_bytes == b'no face' else [{'label': 4}]
+
+        self.mood.faces_for(b'first', detect)
+
+        # an image without faces is detected again on every call, never answered with the previous faces
+        self.assertEqual(([], True), self.mood.faces_for(b'no face', detect))
+        self.assertEqual(([], True), self.mood.faces_for(b'no face', detect))
+
+    def test_recommendations_ttl(self):
+        fetched = []
+
+        def fetch():
+            fetched.append(self.mood.label)
+            return [f'track {len(fetched)}']
+
+        self.mood.update(one_hot(4))
+        self.assertEqual(['track 1'], self.mood.recommendations(fetch))
+
+        self.clock.now = 59
+        self.assertEqual(['track 1'], self.mood.recommendations(fetch))
+
+        self.clock.now = 60
+        self.assertEqual(['track 2'], self.mood.recommendations(fetch))
+
+    def test_recommendations_mood_change(self):
+        fetch = lambda: [self.mood.label]
+
+        self.mood.update(one_hot(4))
+        self.assertEqual([4], self.mood.recommendations(fetch))
+
+        self.mood.update(one_hot(5))
+        self.mood.update(one_hot(5))
+        self.assertEqual([5], self.mood.recommendations(fetch))
+
+        # an explicit key, e.g. the emotions of a group photo, replaces the smoothed emotion
+        self.assertEqual(['group'], self.mood.recommendations(lambda: ['group'], key=('Sad', 'Happy')))
+        self.assertEqual(['group'], self.mood.recommendations(lambda: ['other'], key=('Sad', 'Happy')))
+        self.assertEqual(['other'], self.mood.recommendations(lambda: ['other'], key=('Sad',)))
+
+    def test_invalidate(self):
+        self.mood.update(one_hot(4))
+        self.mood.recommendations(lambda: ['old'])
+
+        self.mood.invalidate()
+
+        self.assertEqual(['new'], self.mood.recommendations(lambda: ['new']))
@@ -0,0 +1,118 @@
+import os
+import queue
+import threading
+from unittest import TestCase, mock
+
+import cv2
+import numpy as np
+
+import emotion
+import model_registry
+from server import InferenceServer, _worker_main
+
+
+class FakeBackend:
+    # every backend predicts a different emotion, so the results tell which one was used
+    labels = {'keras': 0, 'onnx': 4, 'tflite': 5}
+
+    def __init__(self, name):
+        self.name = name
+        self.batches = 0
+
+    def predict(self, batch):
+        self.batches += 1
+        probabilities = np.zeros((len(batch), 7), dtype=np.float32)
+        probabilities[:, self.labels[self.name]] = 1
+        return probabilities
+
+
+def _echo_worker(task_queue, result_queue, backend):
+    result_queue.put(('ready', os.getpid(), None))
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        batch_id, payloads = task
+        results = [{'payload': payload.decode(), 'backend': backend, 'batch_size': len(payloads)}
+                   for payload in payloads]
+        result_queue.put((batch_id, os.getpid(), results))
+
+
+class TestWorker(TestCase):
+
+    def test_worker_uses_backend(self):
+        backends = {}
+
+        def get_backend(name, **kwargs):
+            return backends.setdefault(name, FakeBackend(name))
+
+        registry = model_registry.ModelRegistry()
+        image = cv2.imencode('.png', np.zeros((100, 100), dtype=np.uint8))[1].tobytes()
+        task_queue = queue.Queue()
+        result_queue = queue.Queue()
+        task_queue.put((0, [image, b'not an image']))
+        task_queue.put(None)
+
+        with mock.patch.object(model_registry, 'registry', registry), \
+                mock.patch.object(emotion, 'registry', registry), \
+                mock.patch.object(model_registry, 'get_backend', get_backend), \
+                mock.patch.object(registry, 'get_face_detector'), \
+                mock.patch.object(emotion, 'detect_faces', return_value=np.array([[10, 10, 48, 48]])):
+            _worker_main(task_queue, result_queue, 'onnx')
+
+        self.assertEqual('ready', result_queue.get_nowait()[0])
+        batch_id, _, results = result_queue.get_nowait()
+        self.assertEqual(0, batch_id)
+        self.assertEqual(FakeBackend.labels['onnx'], results[0]['faces'][0]['label'])
+        self.assertEqual({'error': 'invalid image'}, results[1])
+
+        # the default backend is never loaded: warm up and batch both ran on onnx
+        self.assertEqual(['onnx'], list(backends))
+        self.assertEqual(2, backends['onnx'].batches)
+
+
+class TestInferenceServer(TestCase):
+
+    def setUp(self):
+        self.server = InferenceServer(workers=1, max_batch=4, max_wait=1, backend='onnx',
+                                      worker=_echo_worker).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_backend(self):
+        self.assertEqual('onnx', self.server.submit(b'image')['backend'])
+        self.assertTrue(self.server.healthy)
+
+    def test_batching(self):
+        results = {}
+
+        def submit(i):
+            results[i] = self.server.submit(str(i).encode())
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # every request gets the result of its own image, and all of them were sent in a single batch
+        self.assertEqual({i: str(i) for i in range(4)}, {i: result['payload'] for i, result in results.items()})
+        self.assertEqual({4}, {result['batch_size'] for result in results.values()})
+
+        metrics = self.server.metrics()
+        self.assertEqual(4, metrics['requests'])
+        self.assertEqual(1, metrics['batches'])
+        self.assertEqual(4, metrics['mean_batch_size'])
+
+    def test_max_batch(self):
+        threads = [threading.Thread(target=self.server.submit, args=(str(i).encode(),)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        metrics = self.server.metrics()
+        self.assertEqual(6, metrics['requests'])
+        self.assertGreaterEqual(metrics['batches'], 2)
@@ -1,4 +1,4 @@
-from unittest import TestCase
+from unittest import TestCase, mock
 import os
 
 from clayrs.content_analyzer.content_representation.content import SimpleField
@@ -23,6 +23,18 @@ class TestOriginalData(TestCase):
         self.assertEqual(len(data_list), 20)
         self.assertIsInstance(data_list[0], SimpleField)
 
+    def test_produce_content_shards(self):
+        technique = OriginalData()
+        source = JSONFile(file_path)
+
+        sequential = technique.produce_content("Title", [], source)
+        # the test source is too small to be split among processes otherwise
+        with mock.patch('clayrs.content_analyzer.field_content_production_techniques.'
+                        'field_content_production_technique._MIN_CONTENTS_PER_CPU', 1):
+            sharded = technique.produce_content("Title", [], source, num_cpus=2)
+
+        self.assertEqual([field.value for field in sequential], [field.value for field in sharded])
+
     def test_produce_content_dtype_specified(self):
         technique = OriginalData(dtype=int)
 
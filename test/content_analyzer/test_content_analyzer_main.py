@@ -1,13 +1,17 @@
+import json
 import os
+import shutil
+import tempfile
 import unittest
-from unittest import TestCase
-import lzma
-import pickle
+from unittest import TestCase, mock
 import numpy as np
 import scipy.sparse
 
 from clayrs.content_analyzer.exogenous_properties_retrieval import PropertiesFromDataset
 from clayrs.content_analyzer import ContentAnalyzer, FieldConfig, ExogenousConfig, ItemAnalyzerConfig
+from clayrs.content_analyzer.content_analyzer_main import ContentsProducer
+from clayrs.content_analyzer.content_store import ContentStore
+from clayrs.content_analyzer.json_exporter import iter_json_lines
 from clayrs.content_analyzer.content_representation.content import SimpleField, FeaturesBagField, \
     EmbeddingField, IndexField, PropertiesDict
 from clayrs.content_analyzer.field_content_production_techniques import OriginalData
@@ -18,6 +22,7 @@ from clayrs.content_analyzer.field_content_production_techniques.tf_idf import S
 from clayrs.content_analyzer.information_processor import NLTK
 from clayrs.content_analyzer.memory_interfaces import SearchIndex, KeywordIndex
 from clayrs.content_analyzer.raw_information_source import JSONFile
+from clayrs.utils.load_content import load_content_instance
 from test import dir_test_files
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -42,12 +47,11 @@ class TestContentsProducer(TestCase):
             if os.path.isdir(os.path.join(THIS_DIR, name)) \
                     and 'movielens_test' in str(name):
 
-                with lzma.open(os.path.join(THIS_DIR, name, 'tt0113497.xz'), 'r') as file:
-                    content = pickle.load(file)
+                content = load_content_instance(os.path.join(THIS_DIR, name), 'tt0113497')
 
-                    self.assertIsInstance(content.get_exogenous_representation(0), PropertiesDict)
-                    self.assertIsInstance(content.get_exogenous_representation(0).value, dict)
-                    break
+                self.assertIsInstance(content.get_exogenous_representation(0), PropertiesDict)
+                self.assertIsInstance(content.get_exogenous_representation(0).value, dict)
+                break
 
     def test_field_exceptions(self):
         # test to make sure that the method that checks the field configs ids for each field name in the field_dict
@@ -116,12 +120,66 @@ class TestContentsProducer(TestCase):
             if os.path.isdir(os.path.join(THIS_DIR, name)) \
                     and 'movielens_test_tfidf' in str(name):
 
-                with lzma.open(os.path.join(THIS_DIR, name, 'tt0113497.xz'), 'r') as file:
-                    content = pickle.load(file)
+                content = load_content_instance(os.path.join(THIS_DIR, name), 'tt0113497')
 
-                    self.assertIsInstance(content.get_field("Title")[0], FeaturesBagField)
-                    self.assertIsInstance(content.get_field("Title")[0].value, scipy.sparse.csc_matrix)
-                    break
+                self.assertIsInstance(content.get_field("Title")[0], FeaturesBagField)
+                self.assertIsInstance(content.get_field("Title")[0].value, scipy.sparse.csc_matrix)
+                break
+
+    def test_create_contents_parallel(self):
+        movies_ca_config = ItemAnalyzerConfig(JSONFile(movies_info_reduced), 'imdbID', "movielens_test_parallel")
+        movies_ca_config.add_single_config('Title', FieldConfig(OriginalData()))
+        movies_ca_config.add_single_config('Plot', FieldConfig(SkLearnTfIdf()))
+        movies_ca_config.add_single_config('Plot', FieldConfig(OriginalData(), id='original'))
+        movies_ca_config.add_single_exogenous(ExogenousConfig(PropertiesFromDataset(field_name_list=['Year'])))
+
+        contents_producer = ContentsProducer.get_instance()
+        contents_producer.set_config(movies_ca_config)
+        sequential_contents = contents_producer.create_contents(num_cpus=1)
+        parallel_contents = contents_producer.create_contents(num_cpus=2)
+
+        self.assertEqual([content.content_id for content in sequential_contents],
+                         [content.content_id for content in parallel_contents])
+        for sequential, parallel in zip(sequential_contents, parallel_contents):
+            self.assertEqual(sequential.get_field_representation('Title', 0).value,
+                             parallel.get_field_representation('Title', 0).value)
+            self.assertEqual(0, (sequential.get_field_representation('Plot', 0).value !=
+                                 parallel.get_field_representation('Plot', 0).value).nnz)
+            self.assertEqual(sequential.get_field_representation('Plot', 'original').value,
+                             parallel.get_field_representation('Plot', 'original').value)
+            self.assertEqual(sequential.get_exogenous_representation(0).value,
+                             parallel.get_exogenous_representation(0).value)
+
+    def test_iter_contents(self):
+        movies_ca_config = ItemAnalyzerConfig(JSONFile(movies_info_reduced), 'imdbID', "movielens_test_streaming")
+        # the same technique object in two configs
+        tfidf = SkLearnTfIdf()
+        movies_ca_config.add_single_config('Title', FieldConfig(tfidf))
+        movies_ca_config.add_single_config('Plot', FieldConfig(tfidf))
+        movies_ca_config.add_single_config('Plot', FieldConfig(OriginalData(), id='original'))
+        movies_ca_config.add_single_exogenous(ExogenousConfig(PropertiesFromDataset(field_name_list=['Year'])))
+
+        contents_producer = ContentsProducer.get_instance()
+        contents_producer.set_config(movies_ca_config)
+        expected_contents = contents_producer.create_contents()
+        chunks = list(contents_producer.iter_contents(chunk_size=7))
+
+        self.assertEqual([7, 7, 6], [len(chunk) for chunk in chunks])
+        streamed_contents = [content for chunk in chunks for content in chunk]
+
+        self.assertEqual([content.content_id for content in expected_contents],
+                         [content.content_id for content in streamed_contents])
+        for expected, streamed in zip(expected_contents, streamed_contents):
+            # tf-idf is computed on the whole collection, not on the chunk
+            for field_name in ['Title', 'Plot']:
+                self.assertEqual(0, (expected.get_field_representation(field_name, 0).value !=
+                                     streamed.get_field_representation(field_name, 0).value).nnz)
+                self.assertEqual(expected.get_field_representation(field_name, 0).pos_feature_tuples,
+                                 streamed.get_field_representation(field_name, 0).pos_feature_tuples)
+            self.assertEqual(expected.get_field_representation('Plot', 'original').value,
+                             streamed.get_field_representation('Plot', 'original').value)
+            self.assertEqual(expected.get_exogenous_representation(0).value,
+                             streamed.get_exogenous_representation(0).value)
 
     def test_create_content_embedding(self):
         movies_ca_config = ItemAnalyzerConfig(
@@ -143,12 +201,11 @@ class TestContentsProducer(TestCase):
             if os.path.isdir(os.path.join(THIS_DIR, name)) \
                     and 'movielens_test_embedding' in str(name):
 
-                with lzma.open(os.path.join(THIS_DIR, name, 'tt0113497.xz'), 'r') as file:
-                    content = pickle.load(file)
+                content = load_content_instance(os.path.join(THIS_DIR, name), 'tt0113497')
 
-                    self.assertIsInstance(content.get_field("Title")[0], EmbeddingField)
-                    self.assertIsInstance(content.get_field("Title")[0].value, np.ndarray)
-                    break
+                self.assertIsInstance(content.get_field("Title")[0], EmbeddingField)
+                self.assertIsInstance(content.get_field("Title")[0].value, np.ndarray)
+                break
 
     def test_create_contents_in_index(self):
         output_dir = os.path.join(THIS_DIR, "movielens_test_original_index")
@@ -178,14 +235,13 @@ class TestContentsProducer(TestCase):
             if os.path.isdir(os.path.join(THIS_DIR, name)) \
                     and 'movielens_test_original_index' in str(name):
 
-                with lzma.open(os.path.join(THIS_DIR, name, 'tt0113497.xz'), 'r') as file:
-                    content = pickle.load(file)
+                content = load_content_instance(os.path.join(THIS_DIR, name), 'tt0113497')
 
-                    self.assertIsInstance(content.get_field("Title")[0], IndexField)
-                    self.assertIsInstance(content.get_field("Title")[0].value, str)
-                    self.assertIsInstance(content.get_field("Title")[1], IndexField)
-                    self.assertIsInstance(content.get_field("Title")[1].value, str)
-                    break
+                self.assertIsInstance(content.get_field("Title")[0], IndexField)
+                self.assertIsInstance(content.get_field("Title")[0].value, str)
+                self.assertIsInstance(content.get_field("Title")[1], IndexField)
+                self.assertIsInstance(content.get_field("Title")[1].value, str)
+                break
 
     # Functionality to decode NOT IMPLEMENTED
     #
@@ -279,8 +335,8 @@ class TestContentAnalyzer(TestCase):
 
         ContentAnalyzer(movies_ca_config).fit()
 
-        self.assertTrue(os.path.isfile(os.path.join(self.out_dir, 'contents.json')))
-        processed_source = list(JSONFile(os.path.join(self.out_dir, 'contents.json')))
+        self.assertTrue(os.path.isfile(os.path.join(self.out_dir, 'contents.jsonl')))
+        processed_source = list(iter_json_lines(os.path.join(self.out_dir, 'contents.jsonl')))
 
         self.assertEqual(len(processed_source), 20)
         for processed_content in processed_source:
@@ -288,6 +344,83 @@ class TestContentAnalyzer(TestCase):
             self.assertIn('Plot#1', processed_content)
             self.assertIn('imdbRating#0', processed_content)
 
+    def test_fit_chunks(self):
+        movies_ca_config = ItemAnalyzerConfig(
+            source=JSONFile(movies_info_reduced),
+            id=['imdbID'],
+            output_directory=self.out_dir,
+            export_json=True
+        )
+
+        movies_ca_config.add_single_config('Plot', FieldConfig(OriginalData()))
+        movies_ca_config.add_single_config('Plot', FieldConfig(SkLearnTfIdf()))
+
+        ContentAnalyzer(movies_ca_config).fit()
+        with open(os.path.join(self.out_dir, 'contents.jsonl')) as f:
+            expected_json = f.read()
+        expected_content = load_content_instance(self.out_dir, 'tt0113497')
+
+        ContentAnalyzer(movies_ca_config).fit(chunk_size=7)
+        with open(os.path.join(self.out_dir, 'contents.jsonl')) as f:
+            self.assertEqual(expected_json, f.read())
+
+        content = load_content_instance(self.out_dir, 'tt0113497')
+        self.assertEqual(expected_content.get_field_representation('Plot', 0).value,
+                         content.get_field_representation('Plot', 0).value)
+        self.assertEqual(0, (expected_content.get_field_representation('Plot', 1).value !=
+                             content.get_field_representation('Plot', 1).value).nnz)
+
+    def test_fit_incremental(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            with open(movies_info_reduced) as f:
+                movies = json.load(f)
+            source_path = os.path.join(tmp_dir, 'movies.json')
+            output_dir = os.path.join(tmp_dir, 'out')
+
+            def fit(movies_list, **kwargs):
+                with open(source_path, 'w') as f:
+                    json.dump(movies_list, f)
+
+                config = ItemAnalyzerConfig(JSONFile(source_path), ['imdbID'], output_dir)
+                config.add_single_config('Title', FieldConfig(OriginalData()))
+                config.add_single_config('Plot', FieldConfig(SkLearnTfIdf()))
+                config.add_single_exogenous(ExogenousConfig(PropertiesFromDataset(field_name_list=['Year'])))
+                ContentAnalyzer(config).fit(**kwargs)
+
+            fit(movies, incremental=True)
+            self.assertTrue(os.path.isfile(os.path.join(output_dir, 'fingerprints.json')))
+
+            # a title changes, the last movie is removed and a new one is added
+            movies[0] = dict(movies[0], Title='Changed title')
+            removed_id = movies[-1]['imdbID']
+            movies = movies[:-1] + [dict(movies[1], imdbID='tt_new')]
+
+            with mock.patch.object(OriginalData, 'produce_content', autospec=True,
+                                   side_effect=OriginalData.produce_content) as produce_content:
+                fit(movies, incremental=True)
+
+            # only the changed and the new movie are processed again by a technique which works row by row
+            self.assertEqual(2, len(produce_content.call_args.args[3]))
+
+            updated = ContentStore(output_dir)
+            self.assertEqual([movie['imdbID'] for movie in movies], updated.content_ids)
+            self.assertNotIn(removed_id, updated)
+            self.assertEqual('Changed title', updated.load(movies[0]['imdbID']).get_field('Title')[0].value)
+            self.assertEqual(movies[1]['Title'], updated.load('tt_new').get_field('Title')[0].value)
+            self.assertEqual({'Year': movies[1]['Year']}, updated.load('tt_new').get_exogenous_representation(0).value)
+
+            # tf-idf depends on the whole collection and is computed again for every movie
+            fit(movies)
+            expected = ContentStore(output_dir)
+            for movie in movies:
+                self.assertEqual(0, (expected.load(movie['imdbID']).get_field('Plot')[0].value !=
+                                     updated.load(movie['imdbID']).get_field('Plot')[0].value).nnz)
+                self.assertEqual(expected.load(movie['imdbID']).get_field('Title')[0].value,
+                                 updated.load(movie['imdbID']).get_field('Title')[0].value)
+        finally:
+            shutil.rmtree(tmp_dir)
+
     # def doCleanups(self) -> None:
     #     if os.path.isdir(self.out_dir):
     #         shutil.rmtree(self.out_dir)
@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from scipy import sparse
+
+from clayrs.content_analyzer.content_representation.content import Content, SimpleField, FeaturesBagField, \
+    EmbeddingField, PropertiesDict
+from clayrs.content_analyzer.content_store import ContentStore
+from clayrs.recsys.content_based_algorithm.contents_loader import LoadedContentsDict
+from clayrs.utils.load_content import load_content_instance
+
+
+class NotJsonField(SimpleField):
+    pass
+
+
+def create_contents():
+    contents = []
+    for i, content_id in enumerate(['tt.1', 'tt.2', 'tt.3']):
+        content = Content(content_id)
+        content.append_field_representation('Title', SimpleField(f'title {i}'), 'original')
+        content.append_field_representation('Title', SimpleField(i))
+        content.append_field_representation('Plot', FeaturesBagField(sparse.csc_matrix(([0.5, 0.25], ([0, 0], [i, 4])),
+                                                                                       shape=(1, 5)),
+                                                                     [(i, f'word{i}'), (4, 'word4')]), 'tfidf')
+        content.append_field_representation('Plot', EmbeddingField(np.full(3, i, dtype=np.float32)), 'doc')
+        # sentence embeddings, as many rows as the sentences of the plot
+        content.append_field_representation('Plot', EmbeddingField(np.ones((i + 1, 2))), 'sentences')
+        content.append_field_representation('Genres', NotJsonField(('Drama', i)))
+        content.append_exogenous_representation(PropertiesDict({'Year': str(1990 + i)}), 'year')
+        contents.append(content)
+
+    return contents
+
+
+class TestContentStore(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.contents = create_contents()
+        ContentStore.write(self.contents, self.tmp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_load(self):
+        store = ContentStore(self.tmp_dir)
+
+        self.assertTrue(ContentStore.is_store(self.tmp_dir))
+        self.assertEqual(3, len(store))
+        self.assertEqual(['tt1', 'tt2', 'tt3'], list(store))
+        self.assertEqual(1, store.row('tt.2'))
+        self.assertEqual(1, store.row('tt2'))
+        self.assertIsNone(store.load('not_existent'))
+
+        for expected in self.contents:
+            content = store.load(expected.content_id)
+            self.assertEqual(expected.content_id, content.content_id)
+
+            self.assertEqual(expected.get_field('Title'), content.get_field('Title'))
+            self.assertEqual(expected.get_field_representation('Genres', 0).value,
+                             content.get_field_representation('Genres', 0).value)
+
+            tfidf = content.get_field_representation('Plot', 'tfidf')
+            self.assertIsInstance(tfidf.value, sparse.csc_matrix)
+            self.assertEqual(0, (tfidf.value != expected.get_field_representation('Plot', 'tfidf').value).nnz)
+            self.assertEqual(expected.get_field_representation('Plot', 'tfidf').pos_feature_tuples,
+                             tfidf.pos_feature_tuples)
+
+            for repr_id in ['doc', 'sentences']:
+                embedding = content.get_field_representation('Plot', repr_id).value
+                np.testing.assert_array_equal(expected.get_field_representation('Plot', repr_id).value, embedding)
+                self.assertEqual(expected.get_field_representation('Plot', repr_id).value.dtype, embedding.dtype)
+
+            self.assertEqual(expected.get_exogenous_representation('year').value,
+                             content.get_exogenous_representation('year').value)
+
+    def test_layout(self):
+        store = ContentStore(self.tmp_dir)
+
+        # embeddings of the same shape are rows of a single array
+        doc_embeddings = np.load(os.path.join(self.tmp_dir, 'field1_1_b0.npy'))
+        self.assertEqual((3, 3), doc_embeddings.shape)
+
+        # loaded arrays can be modified without modifying the store
+        embedding = store.load('tt1').get_field_representation('Plot', 'doc').value
+        embedding += 1
+        np.testing.assert_array_equal(np.zeros(3), store.load('tt1').get_field_representation('Plot', 'doc').value)
+
+    def test_load_representation(self):
+        store = ContentStore(self.tmp_dir)
+
+        self.assertEqual(1, store.load_representation('tt.2', 'Title', 1).value)
+        np.testing.assert_array_equal(np.ones((2, 2)), store.load_representation('tt2', 'Plot', 'sentences').value)
+        self.assertEqual({'Year': '1991'}, store.load_representation('tt2', None, 'year').value)
+
+        with self.assertRaises(KeyError):
+            store.load_representation('tt2', 'not_existent', 0)
+
+    def test_delete(self):
+        other_file = os.path.join(self.tmp_dir, 'other.txt')
+        with open(other_file, 'w') as f:
+            f.write('not a column')
+
+        ContentStore.delete(self.tmp_dir)
+
+        self.assertFalse(ContentStore.is_store(self.tmp_dir))
+        self.assertEqual(['other.txt'], os.listdir(self.tmp_dir))
+
+    def test_only_field_representations(self):
+        content = load_content_instance(self.tmp_dir, 'tt2', {'Plot': ['doc', 0]})
+
+        self.assertEqual(['Plot'], list(content.field_dict.keys()))
+        self.assertEqual(2, len(content.get_field('Plot')))
+        self.assertIsInstance(content.get_field_representation('Plot', 'doc'), EmbeddingField)
+        self.assertIsInstance(content.get_field_representation('Plot', 1), FeaturesBagField)
+
+    def test_loaded_contents_dict(self):
+        interface_dict = LoadedContentsDict(self.tmp_dir, {'tt1', 'tt3'})
+
+        self.assertEqual({'tt1', 'tt2', 'tt3'}, set(interface_dict))
+        self.assertEqual(2, len(interface_dict))
+        self.assertEqual('tt.3', interface_dict['tt3'].content_id)
+        self.assertEqual('tt.2', interface_dict.get('tt2').content_id)
+        self.assertIsNone(interface_dict.get('should be None'))
+
+    def test_codecs(self):
+        for codec in ['lz4', 'zstd', 'lzma']:
+            codec_dir = os.path.join(self.tmp_dir, codec)
+            stats = ContentStore.write(self.contents, codec_dir, codec, num_workers=2)
+
+            self.assertEqual(3, stats['n_contents'])
+            self.assertGreater(stats['raw_mb'], 0)
+            self.assertGreater(stats['contents_per_s'], 0)
+
+            # the codec is read from the manifest
+            store = ContentStore(codec_dir)
+            self.assertEqual(codec, store.codec)
+            for expected in self.contents:
+                content = store.load(expected.content_id)
+                self.assertEqual(expected.get_field('Title'), content.get_field('Title'))
+                np.testing.assert_array_equal(expected.get_field_representation('Plot', 'sentences').value,
+                                              content.get_field_representation('Plot', 'sentences').value)
+                self.assertEqual(0, (expected.get_field_representation('Plot', 'tfidf').value !=
+                                     content.get_field_representation('Plot', 'tfidf').value).nnz)
+                self.assertEqual(expected.get_exogenous_representation('year').value,
+                                 content.get_exogenous_representation('year').value)
+
+        with self.assertRaises(ValueError):
+            ContentStore.write(self.contents, os.path.join(self.tmp_dir, 'other'), 'not_existent')
+
+    def test_different_contents(self):
+        other_dir = os.path.join(self.tmp_dir, 'other')
+
+        with self.assertRaises(ValueError):
+            ContentStore.write(self.contents + [Content('tt4')], other_dir)
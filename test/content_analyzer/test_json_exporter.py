@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from scipy import sparse
+
+from clayrs.content_analyzer.content_representation.content import Content, SimpleField, FeaturesBagField, \
+    EmbeddingField, PropertiesDict
+from clayrs.content_analyzer.json_exporter import JsonLinesExporter, iter_json_lines
+
+
+def create_contents(n_contents: int):
+    for i in range(n_contents):
+        content = Content(f'tt{i}')
+        content.append_field_representation('Title', SimpleField(f'title {i}'))
+        position = i % 4
+        content.append_field_representation('Plot', FeaturesBagField(sparse.csc_matrix(([0.5, 0.25],
+                                                                                        ([0, 0], [position, 4])),
+                                                                                       shape=(1, 5)),
+                                                                     [(position, f'word{i}'), (4, 'word4')]))
+        content.append_field_representation('Plot', EmbeddingField(np.arange(300, dtype=np.float32) * i))
+        content.append_exogenous_representation(PropertiesDict({'Year': str(1990 + i)}))
+        yield content
+
+
+class TestJsonLinesExporter(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmp_dir, 'contents.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_write(self):
+        with JsonLinesExporter(self.file_path) as exporter:
+            # contents are consumed from a generator
+            self.assertEqual(3, exporter.write(create_contents(3)))
+            self.assertEqual(1, exporter.write([Content('tt_empty')]))
+            self.assertEqual(4, exporter.n_contents)
+
+        with open(self.file_path) as f:
+            lines = f.readlines()
+        self.assertEqual(4, len(lines))
+        self.assertEqual({'content_id': 'tt_empty'}, json.loads(lines[3]))
+
+        exported = list(iter_json_lines(self.file_path))
+        for i, (expected, content) in enumerate(zip(create_contents(3), exported)):
+            self.assertEqual(['content_id', 'Exo#0', 'Title#0', 'Plot#0', 'Plot#1'], list(content.keys()))
+            self.assertEqual(expected.content_id, content['content_id'])
+            self.assertEqual(f'title {i}', content['Title#0'])
+            self.assertEqual({'Year': str(1990 + i)}, content['Exo#0'])
+
+            scores = content['Plot#0']['scores']
+            self.assertIsInstance(scores, sparse.csc_matrix)
+            self.assertEqual(0, (expected.get_field_representation('Plot', 0).value != scores).nnz)
+            self.assertEqual([[i, f'word{i}'], [4, 'word4']], content['Plot#0']['pos_feature_tuples'])
+
+            embedding = content['Plot#1']
+            np.testing.assert_array_equal(expected.get_field_representation('Plot', 1).value, embedding)
+            self.assertEqual(np.float32, embedding.dtype)
+
+    def test_size(self):
+        content = Content('tt0')
+        content.append_field_representation('Plot', EmbeddingField(np.random.rand(100, 300)))
+        with JsonLinesExporter(self.file_path) as exporter:
+            exporter.write([content])
+
+        # the embedding takes 4/3 of its size in base64
+        self.assertLess(os.path.getsize(self.file_path), 100 * 300 * 8 * 4 / 3 + 200)
+
+    def test_indent(self):
+        # with indent=0 the nested objects (arrays, sparse matrices) close at the start of a line, like documents
+        for indent in [0, 2, 4]:
+            with JsonLinesExporter(self.file_path, indent=indent) as exporter:
+                exporter.write(create_contents(3))
+                exporter.write([Content('tt_empty')])
+
+            with open(self.file_path) as f:
+                self.assertGreater(len(f.readlines()), 4)
+
+            exported = list(iter_json_lines(self.file_path))
+            self.assertEqual(['tt0', 'tt1', 'tt2', 'tt_empty'], [content['content_id'] for content in exported])
+            np.testing.assert_array_equal(np.arange(300, dtype=np.float32) * 2, exported[2]['Plot#1'])
+            self.assertEqual(0, (next(create_contents(1)).get_field_representation('Plot', 0).value !=
+                                 exported[0]['Plot#0']['scores']).nnz)
+
+    def test_truncated(self):
+        with JsonLinesExporter(self.file_path, indent=0) as exporter:
+            exporter.write(create_contents(2))
+
+        with open(self.file_path) as f:
+            text = f.read()
+        with open(self.file_path, 'w') as f:
+            f.write(text[:-10])
+
+        exported = iter_json_lines(self.file_path)
+        self.assertEqual('tt0', next(exported)['content_id'])
+        with self.assertRaises(json.JSONDecodeError):
+            next(exported)
@@ -1,10 +1,16 @@
 import os
+import shutil
+import sqlite3
+import tempfile
 from unittest import TestCase
 
-from clayrs.content_analyzer.raw_information_source import SQLDatabase, CSVFile, JSONFile, DATFile
+import numpy as np
+
+from clayrs.content_analyzer.raw_information_source import SQLDatabase, CSVFile, JSONFile, DATFile, MaterializedSource
 from test import dir_test_files
 
 json_file = os.path.join(dir_test_files, "movies_info_reduced.json")
+jsonl_file = os.path.join(dir_test_files, "movies_info_reduced.jsonl")
 csv_w_header = os.path.join(dir_test_files, 'movies_info_reduced.csv')
 csv_no_header = os.path.join(dir_test_files, 'test_ratings', 'ratings_1591277020.csv')
 dat_file = os.path.join(dir_test_files, 'users_70.dat')
@@ -25,6 +31,164 @@ class TestSQLDatabase(TestCase):
         self.assertDictEqual(next(my_iter), d3)
 
 
+class TestSQLDatabaseSQLite(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmp_dir.name, 'movies.db')
+
+        conn = sqlite3.connect(cls.db_path)
+        conn.execute("CREATE TABLE movies (id TEXT, title TEXT, year INTEGER)")
+        conn.executemany("INSERT INTO movies VALUES (?, ?, ?)",
+                         [('1', 'Jumanji', 1995), ('2', 'Toy Story', 1995), ('3', 'Heat', 1995),
+                          ('4', 'The Matrix', 1999), ('5', 'Memento', 2000)])
+        conn.commit()
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.tmp_dir.cleanup()
+
+    def sql_source(self, **kwargs):
+        return SQLDatabase(None, None, None, None, 'movies',
+                           connection_factory=lambda: sqlite3.connect(self.db_path), **kwargs)
+
+    def test_iter(self):
+        sql = self.sql_source(batch_size=2)
+
+        rows = list(sql)
+
+        self.assertEqual(5, len(rows))
+        self.assertDictEqual({'id': '1', 'title': 'Jumanji', 'year': 1995}, rows[0])
+        self.assertDictEqual({'id': '5', 'title': 'Memento', 'year': 2000}, rows[-1])
+
+    def test_projection_where_order(self):
+        sql = self.sql_source(columns=['title'], where="year < 2000", order_by="title DESC")
+
+        self.assertEqual([{'title': 'Toy Story'}, {'title': 'The Matrix'}, {'title': 'Jumanji'}, {'title': 'Heat'}],
+                         list(sql))
+        self.assertEqual(4, len(sql))
+        self.assertEqual(['title'], sql.column_names)
+
+    def test_len(self):
+        self.assertEqual(5, len(self.sql_source()))
+        self.assertEqual(2, len(self.sql_source(where="year >= 1999")))
+
+    def test_column_names(self):
+        self.assertEqual(['id', 'title', 'year'], self.sql_source().column_names)
+
+    def test_qualified_table_name(self):
+        sql = SQLDatabase(None, None, None, None, 'main.movies',
+                          connection_factory=lambda: sqlite3.connect(self.db_path))
+
+        self.assertEqual(5, len(sql))
+        self.assertEqual(['id', 'title', 'year'], sql.column_names)
+
+    def test_iter_chunks(self):
+        sql = self.sql_source()
+
+        chunks = list(sql.iter_chunks(columns=['id', 'year'], chunk_size=3))
+
+        self.assertEqual(2, len(chunks))
+        self.assertEqual(['id', 'year'], list(chunks[0].keys()))
+        np.testing.assert_array_equal(['1', '2', '3'], chunks[0]['id'])
+        np.testing.assert_array_equal([1999, 2000], chunks[1]['year'])
+
+    def test_connections_reused(self):
+        n_connections = 0
+
+        def connection_factory():
+            nonlocal n_connections
+            n_connections += 1
+            return sqlite3.connect(self.db_path)
+
+        sql = SQLDatabase(None, None, None, None, 'movies', connection_factory=connection_factory, pool_size=2)
+        for _ in range(3):
+            list(sql)
+            len(sql)
+
+        self.assertEqual(1, n_connections)
+
+        # two iterations at the same time need two connections
+        for _ in zip(sql, sql):
+            pass
+        self.assertEqual(2, n_connections)
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = [('id',), ('title',)]
+        self.rows = []
+
+    def execute(self, query):
+        if self.connection.broken:
+            raise ConnectionError("lost connection")
+        self.connection.queries.append(query)
+        self.rows = [(str(i), f'title {i}') for i in range(10)]
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def fetchall(self):
+        return self.fetchmany(len(self.rows))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.queries = []
+        self.broken = False
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+class TestSQLDatabasePool(TestCase):
+
+    def setUp(self):
+        self.connections = []
+
+        def connection_factory():
+            self.connections.append(FakeConnection())
+            return self.connections[-1]
+
+        self.sql = SQLDatabase(None, None, None, None, 'movies', connection_factory=connection_factory,
+                               batch_size=2)
+
+    def test_interrupted_iteration(self):
+        for row in self.sql:
+            break
+        for chunk in self.sql.iter_chunks(chunk_size=2):
+            break
+
+        # the connection went back to the pool and is used again by the next query
+        self.assertEqual(10, len(list(self.sql)))
+        self.assertEqual(1, len(self.connections))
+        self.assertFalse(self.connections[0].closed)
+        self.assertEqual(3, len(self.connections[0].queries))
+
+    def test_failed_query(self):
+        self.connections[0].broken = True
+        with self.assertRaises(ConnectionError):
+            list(self.sql)
+
+        # a connection in an unknown state is closed, and a new one is created for the next query
+        self.assertTrue(self.connections[0].closed)
+        self.assertEqual(10, len(list(self.sql)))
+        self.assertEqual(2, len(self.connections))
+
+
 class TestCSVFile(TestCase):
 
     def test_iter(self):
@@ -113,6 +277,35 @@ class TestCSVFile(TestCase):
 
         self.assertEqual(6, len(csv))
 
+    def test_column_names(self):
+        self.assertEqual(['0', '1', '2', '3', '4', '5', '6'], CSVFile(csv_no_header, has_header=False).column_names)
+        self.assertEqual('Title', CSVFile(csv_w_header).column_names[0])
+
+    def test_iter_chunks(self):
+        csv = CSVFile(csv_w_header)
+
+        chunks = list(csv.iter_chunks(columns=['Title', 'Year'], chunk_size=2, dtype={'Year': int}))
+
+        self.assertEqual(2, len(chunks))
+        self.assertEqual(['Title', 'Year'], list(chunks[0].keys()))
+        np.testing.assert_array_equal(['Jumanji', 'Grumpier Old Men'], chunks[0]['Title'])
+        np.testing.assert_array_equal([1995, 1995], chunks[0]['Year'])
+        self.assertTrue(np.issubdtype(chunks[0]['Year'].dtype, np.integer))
+        np.testing.assert_array_equal(['Toy Story'], chunks[1]['Title'])
+
+        with self.assertRaises(KeyError):
+            next(csv.iter_chunks(columns=['not_existent']))
+
+    def test_iter_chunks_same_as_iter(self):
+        csv = CSVFile(csv_no_header, has_header=False)
+
+        chunk = next(csv.iter_chunks())
+        rows = list(csv)
+
+        self.assertEqual(list(rows[0].keys()), list(chunk.keys()))
+        for column, values in chunk.items():
+            self.assertEqual([row[column] for row in rows], list(values))
+
     def test_iter_tsv(self):
 
         tsv = CSVFile(tsv_file, has_header=False, separator='\t')
@@ -201,6 +394,72 @@ class TestJSONFile(TestCase):
         dat = JSONFile(json_file)
         self.assertEqual(20, len(dat))
 
+    def test_iter_json_lines(self):
+        jsl = JSONFile(jsonl_file)
+
+        self.assertTrue(jsl.json_lines)
+        self.assertEqual(list(JSONFile(json_file)), list(jsl))
+
+    def test_iter_small_blocks(self):
+        js = JSONFile(json_file)
+
+        # rows spanning several blocks are parsed the same way
+        rows = [row for _, row in js._iter_json_list(block_size=16)]
+        self.assertEqual(list(js), rows)
+
+    def test_random_access(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for file_path in [json_file, jsonl_file]:
+                copied_file = shutil.copy(file_path, tmp_dir)
+                js = JSONFile(copied_file)
+                rows = list(js)
+
+                self.assertEqual(rows[0], js[0])
+                self.assertEqual(rows[7], js[7])
+                self.assertEqual(rows[-1], js[-1])
+                with self.assertRaises(IndexError):
+                    js[20]
+
+                # by default the offsets are only kept in memory, nothing is written next to the data
+                self.assertIsNone(js.index_path)
+                self.assertEqual([os.path.basename(copied_file)], os.listdir(tmp_dir))
+                os.remove(copied_file)
+
+    def test_persisted_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = os.path.join(tmp_dir, 'movies.idx.npz')
+            js = JSONFile(json_file, index_path=index_path)
+            rows = list(js)
+            self.assertEqual(20, len(js))
+
+            # offsets are stored in the index file and reused by new instances
+            self.assertTrue(os.path.isfile(index_path))
+            self.assertEqual(20, len(JSONFile(json_file, index_path=index_path)))
+            self.assertEqual(rows[3], JSONFile(json_file, index_path=index_path)[3])
+
+    def test_index_rebuilt_on_change(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            copied_file = shutil.copy(jsonl_file, tmp_dir)
+            index_path = os.path.join(tmp_dir, 'movies.idx.npz')
+            js = JSONFile(copied_file, index_path=index_path)
+            self.assertEqual(20, len(js))
+
+            with open(copied_file, 'a') as f:
+                f.write('{"Title": "New"}\n')
+
+            self.assertEqual(21, len(js))
+            js = JSONFile(copied_file, index_path=index_path)
+            self.assertEqual(21, len(js))
+            self.assertEqual({"Title": "New"}, js[20])
+
+    def test_iter_chunks(self):
+        js = JSONFile(json_file)
+
+        chunks = list(js.iter_chunks(columns=['Title', 'Year'], chunk_size=8))
+
+        self.assertEqual([8, 8, 4], [len(chunk['Title']) for chunk in chunks])
+        self.assertEqual([row['Title'] for row in js], [title for chunk in chunks for title in chunk['Title']])
+
 
 class TestDATFile(TestCase):
     def test_iter(self):
@@ -221,3 +480,105 @@ class TestDATFile(TestCase):
 
         dat = DATFile(dat_file)
         self.assertEqual(70, len(dat))
+        # the row count is cached
+        self.assertEqual(70, len(dat))
+
+    def test_iter_chunks(self):
+        dat = DATFile(dat_file)
+
+        chunks = list(dat.iter_chunks(columns=['0', '4'], chunk_size=50))
+
+        self.assertEqual([50, 20], [len(chunk['0']) for chunk in chunks])
+        np.testing.assert_array_equal(['1', '2', '3'], chunks[0]['0'][:3])
+        np.testing.assert_array_equal(['48067', '70072', '55117'], chunks[0]['4'][:3])
+
+        all_columns = next(dat.iter_chunks())
+        self.assertEqual(['0', '1', '2', '3', '4'], list(all_columns.keys()))
+        self.assertEqual(dat.column_names, list(all_columns.keys()))
+
+        with self.assertRaises(KeyError):
+            next(dat.iter_chunks(columns=['10']))
+
+
+class TestMaterializedSource(TestCase):
+
+    def test_iter_csv(self):
+        csv = CSVFile(csv_w_header)
+        source = MaterializedSource(csv, chunk_size=2)
+
+        self.assertEqual(list(csv), list(source))
+        self.assertEqual(len(csv), len(source))
+        self.assertEqual(csv.column_names, source.column_names)
+        self.assertEqual(os.path.getsize(csv_w_header), source.bytes_read)
+        self.assertGreater(source.parse_time, 0)
+
+    def test_iter_column(self):
+        csv = CSVFile(csv_w_header)
+        source = MaterializedSource(csv)
+
+        self.assertEqual([row['Plot'] for row in csv], list(source.iter_column('Plot')))
+
+        chunks = list(source.iter_chunks(columns=['Title', 'Year'], chunk_size=2))
+        self.assertEqual([2, 1], [len(chunk['Title']) for chunk in chunks])
+        self.assertEqual(['Title', 'Year'], list(chunks[0].keys()))
+
+        with self.assertRaises(KeyError):
+            next(source.iter_column('not_existent'))
+
+    def test_json_rows_not_strings(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            jsonl_path = os.path.join(tmp_dir, 'rows.jsonl')
+            with open(jsonl_path, 'w', encoding='utf-8') as f:
+                f.write('{"id": "1", "title": "Città", "genres": ["Drama"]}\n')
+                f.write('{"id": "2", "title": "Heat", "genres": ["Crime", "Thriller"], "year": 1995}\n')
+
+            source = MaterializedSource(JSONFile(jsonl_path), chunk_size=1)
+
+            self.assertEqual(list(JSONFile(jsonl_path)), list(source))
+            self.assertEqual(['Città', 'Heat'], list(source.iter_column('title')))
+            self.assertEqual(['Crime', 'Thriller'], next(source.iter_chunks(columns=['genres']))['genres'][1])
+
+            # the first row has no year
+            with self.assertRaises(KeyError):
+                list(source.iter_column('year'))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_memory_mapped(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            dat = DATFile(dat_file)
+            source = MaterializedSource(dat, directory=tmp_dir, chunk_size=32)
+
+            self.assertEqual(list(dat), list(source))
+            self.assertEqual(70, len(source))
+            self.assertTrue(len(os.listdir(tmp_dir)) != 0)
+            self.assertEqual(os.path.getsize(dat_file), source.bytes_read)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_slice(self):
+        dat = DATFile(dat_file)
+        source = MaterializedSource(dat, chunk_size=32)
+        rows = list(dat)
+
+        source_slice = source.slice(30, 45)
+        self.assertEqual(15, len(source_slice))
+        self.assertEqual(rows[30:45], list(source_slice))
+        self.assertEqual([row['0'] for row in rows[30:45]], list(source_slice.iter_column('0')))
+        self.assertEqual([4, 4, 4, 3], [len(chunk['0']) for chunk in source_slice.iter_chunks(columns=['0'],
+                                                                                              chunk_size=4)])
+
+        self.assertEqual(rows[60:], list(source.slice(60, 100)))
+
+    def test_take(self):
+        dat = DATFile(dat_file)
+        source = MaterializedSource(dat, chunk_size=32)
+        rows = list(dat)
+
+        taken = source.take([3, 4, 5, 40, 2])
+        self.assertEqual(5, len(taken))
+        self.assertEqual([rows[i] for i in [3, 4, 5, 40, 2]], list(taken))
+        self.assertEqual([rows[i]['1'] for i in [3, 4, 5, 40, 2]], list(taken.iter_column('1')))
+        self.assertEqual(0, len(list(source.take([]))))